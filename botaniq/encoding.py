@@ -0,0 +1,14 @@
+"""Content-Encoding negotiation shared by the pre-rendered pages and the catalogue export"""
+
+
+def accepted_encoding(request, available):
+    """The first of `available` (in server preference order) the client accepts, or None
+
+    An encoding listed with q=0 is refused, as RFC 9110 requires.
+    """
+    accepted = {
+        part.split(';')[0].strip()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+        if not part.replace(' ', '').endswith(';q=0')
+    }
+    return next((encoding for encoding in available if encoding in accepted), None)
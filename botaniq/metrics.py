@@ -0,0 +1,210 @@
+"""Prometheus text-format metrics, aggregated across worker processes
+
+Each process accumulates counters and histograms in memory. When METRICS_DIR
+is set it also writes them to METRICS_DIR/metrics-<pid>.json, at most every
+METRICS_FLUSH_SECONDS and at exit, and the /metrics view sums every file in
+the directory so all gunicorn workers appear in one scrape. This is the same
+model as prometheus_client's multiprocess mode, without the dependency.
+Clear the directory when deploying.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+_last_flush = 0.0
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            _check_fork()
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+
+class Histogram(Metric):
+    """Per-bucket (non-cumulative) counts plus +Inf, sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            _check_fork()
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+        _maybe_flush()
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+
+def _check_fork():
+    """Forked workers start from zero rather than re-reporting the parent's values"""
+    global _pid
+    if os.getpid() != _pid:
+        _pid = os.getpid()
+        for metric in _registry.values():
+            metric.values.clear()
+
+
+def _snapshot():
+    with _lock:
+        _check_fork()
+        return {name: dict(metric.values) for name, metric in _registry.items() if metric.values}
+
+
+def _maybe_flush():
+    if settings.METRICS_DIR and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def flush():
+    """Write this process's values to its file in METRICS_DIR"""
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not settings.METRICS_DIR:
+        return
+    path = os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+    try:
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(f'{path}.tmp', path)
+    except OSError:
+        logger.exception("Could not write metrics to %s", path)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def collect():
+    """{metric name: {label key: value}} summed over every process"""
+    if not settings.METRICS_DIR:
+        return _snapshot()
+    flush()
+    totals = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue  # a worker mid-write; it will be complete next scrape
+        for name, values in snapshot.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            merged = totals.setdefault(name, {})
+            for key, value in values.items():
+                merged[key] = metric.merge(merged[key], value) if key in merged else value
+    return totals
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """The Prometheus text exposition format (version 0.0.4)"""
+    totals = collect()
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(totals.get(name, {}).items()):
+            label_values = json.loads(key)
+            if metric.kind == 'counter':
+                lines.append(f'{name}{_labels(metric.labelnames, label_values)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), value):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{name}_bucket{_labels(metric.labelnames, label_values, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(metric.labelnames, label_values)} {_number(float(value[-2]))}')
+            lines.append(f'{name}_count{_labels(metric.labelnames, label_values)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram('botaniq_request_duration_seconds', 'Request latency by URL name', ['view', 'method'])
+REQUESTS = Counter('botaniq_requests_total', 'Requests by URL name and status class', ['view', 'status'])
+DB_QUERIES = Histogram(
+    'botaniq_db_queries_per_request', 'Database queries per request by URL name', ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+SEARCHES = Counter('botaniq_searches_total', 'Plant searches by mode', ['mode'])
+ENCODER_BATCH = Histogram(
+    'botaniq_encoder_batch_size', 'Texts per sentence-encoder call', ['caller'],
+    buckets=(1, 8, 32, 128, 512, 2048, 8192),
+)
+MODEL_LOAD = Histogram('botaniq_model_load_seconds', 'Sentence model load time', buckets=(1, 5, 10, 30, 60, 120))
+LLM_LATENCY = Histogram('botaniq_llm_request_duration_seconds', 'LLM API latency', ['provider'])
+LLM_REQUESTS = Counter('botaniq_llm_requests_total', 'LLM API calls by outcome (ok, http_error, error)',
+                       ['provider', 'outcome'])
+CACHE_REQUESTS = Counter('botaniq_cache_requests_total', 'Cache lookups by cache and result (hit, miss)',
+                         ['cache', 'result'])
+CATALOGUE_BUILD = Histogram(
+    'botaniq_catalogue_build_seconds', 'Time to load the in-process catalogue snapshot',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
@@ -0,0 +1,100 @@
+"""Keyset (seek) pagination shared by the HTML views and JSON endpoints"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for the ordering values of the last row on a page"""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering, model=None):
+    """Turn a cursor back into ordering values, raising InvalidCursor if it's garbage
+
+    With a model, each value is also converted and checked by its ordering field.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Cursor does not match the ordering')
+    values = [_decode_value(value) for value in values]
+    if model is not None:
+        values = [_to_python(model, field, value) for (field, descending), value in zip(ordering, values)]
+    return values
+
+
+def _to_python(model, path, value):
+    """Validate a cursor value against the model field it orders by; annotations pass through"""
+    try:
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        field = model._meta.get_field(name)
+    except (AttributeError, FieldDoesNotExist):
+        return value
+    try:
+        return field.to_python(value)
+    except ValidationError:
+        raise InvalidCursor(f'Bad {path} in cursor')
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        try:
+            value = parse_datetime(value.get('dt') or '')
+        except (TypeError, ValueError):
+            value = None
+        if value is None:
+            raise InvalidCursor('Malformed date in cursor')
+    elif value is None or isinstance(value, (list, dict)):
+        raise InvalidCursor('Unexpected value in cursor')
+    return value
+
+
+def keyset_filter(ordering, values):
+    """Q matching rows strictly after `values` for ordering [(field, descending), ...]"""
+    condition = Q()
+    equal = {}
+    for field, descending in ordering:
+        lookup = f'{field}__lt' if descending else f'{field}__gt'
+        condition |= Q(**equal, **{lookup: values[len(equal)]})
+        equal[field] = values[len(equal)]
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=24):
+    """Return (rows, next_cursor) for one page of a queryset ordered by `ordering`
+
+    The last field of `ordering` must be unique (normally the primary key).
+    """
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, ordering, queryset.model)))
+    queryset = queryset.order_by(*[f'-{field}' if descending else field for field, descending in ordering])
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([_ordering_value(rows[-1], field) for field, descending in ordering])
+    return rows, next_cursor
+
+
+def _ordering_value(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    for attr in field.split('__'):
+        row = getattr(row, attr)
+    return row
@@ -0,0 +1,153 @@
+"""On-demand profiling of single requests for staff
+
+A staff user adds ?_profile=1 (or an X-Profile: 1 header) to any URL and the
+request runs under cProfile, a stack sampler and tracemalloc. The response is
+replaced by a plain-text report: top functions by cumulative time and the
+biggest allocation sites. ?_profile=collapsed returns the sampled stacks in
+the collapsed format flamegraph.pl and speedscope read instead. With
+PROFILE_DIR set the .prof, report and collapsed stacks are also saved there.
+
+cProfile and the sampler only look at the profiled request's thread.
+tracemalloc is process-wide, so one request is profiled at a time and others
+are served normally while it runs.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+
+_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread every `interval` seconds"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, profiler, stacks, snapshot, peak_bytes, seconds):
+        self.profiler = profiler
+        self.stacks = stacks
+        self.snapshot = snapshot
+        self.peak_bytes = peak_bytes
+        self.seconds = seconds
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def report(self, title):
+        out = io.StringIO()
+        out.write(f'{title}\n')
+        out.write(f'{self.seconds * 1000:.1f} ms wall, {len(self.stacks)} distinct sampled stacks, '
+                  f'peak traced memory {self.peak_bytes / 1024:.0f} KiB\n\n')
+        out.write(f'Top {TOP_FUNCTIONS} functions by cumulative time\n')
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        out.write(f'\nTop {TOP_ALLOCATIONS} allocation sites still held at the end of the request\n')
+        snapshot = self.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ])
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            out.write(f'{stat}\n')
+        return out.getvalue()
+
+    def save(self, directory, name):
+        """Write <name>.prof, <name>.txt and <name>.collapsed to `directory`"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        self.profiler.dump_stats(f'{base}.prof')
+        with open(f'{base}.txt', 'w') as f:
+            f.write(self.report(name))
+        with open(f'{base}.collapsed', 'w') as f:
+            f.write(self.collapsed())
+
+
+def profile_call(func, *args, **kwargs):
+    """(result, Profile) for one call of func"""
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_SECONDS)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    sampler.start()
+    started = perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        seconds = perf_counter() - started
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+    return result, Profile(profiler, sampler.stacks, snapshot, peak_bytes, seconds)
+
+
+class ProfilingMiddleware:
+    """Goes after AuthenticationMiddleware, which it needs to recognise staff"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get('_profile') or request.headers.get('X-Profile')
+        if not (settings.PROFILING and mode and request.user.is_staff):
+            return self.get_response(request)
+        if not _lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile'] = 'busy'
+            return response
+        try:
+            response, profile = profile_call(self.get_response, request)
+        finally:
+            _lock.release()
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        title = f'{request.method} {request.get_full_path()} -> {view} ({response.status_code})'
+        if mode == 'collapsed':
+            report = HttpResponse(profile.collapsed(), content_type='text/plain; charset=utf-8')
+        else:
+            report = HttpResponse(profile.report(title), content_type='text/plain; charset=utf-8')
+        if settings.PROFILE_DIR:
+            name = f'{timezone.now():%Y%m%d-%H%M%S}-{view.replace(":", "-")}'
+            profile.save(settings.PROFILE_DIR, name)
+            report['X-Profile-Saved'] = name
+        return report
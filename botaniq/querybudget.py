@@ -0,0 +1,162 @@
+"""Per-view query budgets and N+1 detection
+
+Views declare how many queries a request may run, session and user lookups
+included:
+
+    @query_budget(6)
+    @login_required
+    def dashboard(request): ...
+
+With QUERY_BUDGETS = 'warn' (the default under DEBUG) QueryBudgetMiddleware
+logs requests that exceed their budget, repeat one SELECT shape at least
+N_PLUS_ONE_THRESHOLD times, or reach a project view that declares no budget.
+With 'raise' (tests) it raises QueryBudgetExceeded instead. Repeats are
+reported with the template line, or failing that the project stack frame, that
+issued them.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_PROJECT_ROOT = str(settings.BASE_DIR)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+_unbudgeted = ContextVar('botaniq_unbudgeted', default=False)
+
+
+@contextmanager
+def unbudgeted():
+    """Leave periodic housekeeping (buffer flushes, cache refreshes) out of the request's budget"""
+    token = _unbudgeted.set(True)
+    try:
+        yield
+    finally:
+        _unbudgeted.reset(token)
+
+
+def query_budget(max_queries):
+    """Declare the most queries a view may run per request"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def sql_shape(sql):
+    """SQL with IN lists collapsed, so the same lookup for different ids compares equal"""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def query_origin():
+    """'template.html:12' for the template node running the query, else the innermost project frame"""
+    frame = sys._getframe(1)
+    project_frame = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated' and code.co_filename.endswith(os.path.join('django', 'template', 'base.py')):
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name or origin.name}:{token.lineno}'
+        if (
+            project_frame is None
+            and code.co_filename.startswith(_PROJECT_ROOT)
+            and 'site-packages' not in code.co_filename
+            and not code.co_filename.endswith(('querybudget.py', 'slowqueries.py', 'timing.py'))
+        ):
+            project_frame = f'{os.path.relpath(code.co_filename, _PROJECT_ROOT)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return project_frame or 'unknown'
+
+
+class QueryRecorder:
+    """Counts queries and SELECT shapes; remembers where a shape started repeating"""
+
+    def __init__(self, threshold=N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.count = 0
+        self.shapes = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if _unbudgeted.get():
+            return execute(sql, params, many, context)
+        self.count += 1
+        if sql.lstrip().upper().startswith('SELECT'):
+            shape = sql_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.threshold:
+                self.origins[shape] = query_origin()
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """[(shape, times, origin)] for shapes at or over the threshold"""
+        return [(shape, self.shapes[shape], origin) for shape, origin in self.origins.items()]
+
+
+def _is_project_view(view_func):
+    """Whether a view is defined in this project rather than Django or another package"""
+    module = sys.modules.get(getattr(view_func, '__module__', None) or '')
+    filename = getattr(module, '__file__', None) or ''
+    return filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename
+
+
+def budget_problems(recorder, budget, view_name, requires_budget=False):
+    problems = []
+    if budget is None and requires_budget:
+        problems.append(f"{view_name} declares no query budget; decorate it with @query_budget(n)")
+    if budget is not None and recorder.count > budget:
+        problems.append(f"{view_name} ran {recorder.count} queries; its budget is {budget}")
+    for shape, times, origin in recorder.repeated():
+        problems.append(f"{view_name}: possible N+1, {times} x {shape[:200]} (from {origin})")
+    return problems
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_BUDGETS
+        if mode == 'off':
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._query_budget = None
+        request._requires_budget = False
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        problems = budget_problems(
+            recorder, request._query_budget, match.view_name if match else request.path, request._requires_budget
+        )
+        if problems:
+            if mode == 'raise':
+                raise QueryBudgetExceeded('\n'.join(problems))
+            for problem in problems:
+                logger.warning(problem)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+        request._requires_budget = _is_project_view(view_func)
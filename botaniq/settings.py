@@ -3,8 +3,10 @@ Django settings for botaniq project - Railway-ready configuration.
 """
 
 import os
+import sys
 from pathlib import Path
 import dj_database_url  # Ensure this is in requirements.txt
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -12,6 +14,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Environment variables
 SECRET_KEY = os.environ.get('SECRET_KEY', 'replace-this-with-env-secret-key')
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",")
 
 # Security settings
@@ -36,16 +39,22 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "plants",
     "dashboard",
+    "jobs",
 ]
 
 # Middleware
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "botaniq.timing.ServerTimingMiddleware",  # Server-Timing header + per-request timing log
+    "botaniq.querybudget.QueryBudgetMiddleware",  # per-view query budgets and N+1 warnings
+    "botaniq.slowqueries.SlowQueryMiddleware",  # slow-query log with EXPLAIN plans
     "whitenoise.middleware.WhiteNoiseMiddleware",  # serve static files
+    "plants.prerender.PrerenderMiddleware",  # pre-rendered plant pages for anonymous visitors
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "botaniq.profiling.ProfilingMiddleware",  # ?_profile=1 profiles one request for staff
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -107,6 +116,112 @@ STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Background jobs: 'thread' runs them in the web process, 'worker' leaves them
+# for `manage.py run_jobs`, 'sync' runs them inline
+JOBS_BACKEND = os.environ.get('JOBS_BACKEND', 'thread')
+JOBS_THREADS = int(os.environ.get('JOBS_THREADS', '2'))
+# Running jobs that haven't reported progress for this long are failed so their dedupe key frees up
+JOBS_STALE_SECONDS = int(os.environ.get('JOBS_STALE_SECONDS', '1800'))
+JOB_FILES_ROOT = os.environ.get('JOB_FILES_ROOT', os.path.join(BASE_DIR, "job_files"))
+# Job output files (e.g. library exports) are deleted this long after they're written
+JOB_FILES_MAX_AGE_HOURS = float(os.environ.get('JOB_FILES_MAX_AGE_HOURS', '24'))
+
+# Plant illustrations are fetched once and thumbnailed locally (plants.images).
+# Thumbnail names are content hashes, served under THUMBNAIL_URL with an
+# immutable Cache-Control header.
+THUMBNAIL_ROOT = os.environ.get('THUMBNAIL_ROOT', os.path.join(BASE_DIR, "media", "thumbs"))
+THUMBNAIL_URL = os.environ.get('THUMBNAIL_URL', '/media/thumbs/')
+THUMBNAIL_WIDTHS = [int(w) for w in os.environ.get('THUMBNAIL_WIDTHS', '320,640,960').split(',')]
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', '10'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# plant_list and plant_detail serve verified plants from an in-process snapshot
+# (plants.catalogue), rebuilt when an edit bumps the catalogue generation.
+# Without a shared cache, other workers see edits within CATALOGUE_MAX_AGE_SECONDS.
+# Rebuilds run on a background thread while requests use the previous snapshot.
+# CATALOGUE_PRELOAD builds it in wsgi.py, before a preloading server forks.
+CATALOGUE_SNAPSHOT = os.environ.get('CATALOGUE_SNAPSHOT', 'True').lower() == 'true'
+CATALOGUE_MAX_AGE_SECONDS = int(os.environ.get('CATALOGUE_MAX_AGE_SECONDS', '60'))
+CATALOGUE_BACKGROUND_REBUILD = os.environ.get(
+    'CATALOGUE_BACKGROUND_REBUILD', 'False' if TESTING else 'True'
+).lower() == 'true'
+CATALOGUE_PRELOAD = os.environ.get('CATALOGUE_PRELOAD', 'False').lower() == 'true'
+
+# Anonymous plant_detail and plant_list pages are served from pre-rendered,
+# precompressed HTML under PRERENDER_ROOT (plants.prerender). prerender_pages
+# builds them; plant edits regenerate the pages that changed in the background.
+# Needs REDIS_URL: every worker must see the catalogue generation the pages were built from.
+PRERENDER = os.environ.get('PRERENDER', 'False').lower() == 'true'
+PRERENDER_ROOT = os.environ.get('PRERENDER_ROOT', os.path.join(BASE_DIR, "prerendered"))
+
+# Per-process cache unless a shared Redis is configured (needed for warm_search_cache to help every worker)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+elif PRERENDER:
+    raise ImproperlyConfigured("PRERENDER needs a shared cache; set REDIS_URL")
+
+# Plant detail views are counted in memory and written this often by a thread in each process.
+# Trending lists are recomputed off the request path and re-read this often.
+VIEW_COUNT_FLUSH_SECONDS = int(os.environ.get('VIEW_COUNT_FLUSH_SECONDS', '30'))
+TRENDING_CACHE_SECONDS = int(os.environ.get('TRENDING_CACHE_SECONDS', '600'))
+
+# Search analytics are written in batches; search results are cached per query and catalogue generation
+SEARCH_LOG_BATCH_SIZE = int(os.environ.get('SEARCH_LOG_BATCH_SIZE', '50'))
+SEARCH_LOG_FLUSH_SECONDS = int(os.environ.get('SEARCH_LOG_FLUSH_SECONDS', '30'))
+SEARCH_CACHE_SECONDS = int(os.environ.get('SEARCH_CACHE_SECONDS', '3600'))
+
+# Request phase timing (Server-Timing header). Requests slower than
+# SERVER_TIMING_SLOW_MS are logged at INFO, the rest at DEBUG. The header,
+# which gives away DB time and query counts, goes to staff only unless
+# SERVER_TIMING_PUBLIC is on (the default under DEBUG).
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True').lower() == 'true'
+SERVER_TIMING_PUBLIC = os.environ.get('SERVER_TIMING_PUBLIC', str(DEBUG)).lower() == 'true'
+SERVER_TIMING_SLOW_MS = int(os.environ.get('SERVER_TIMING_SLOW_MS', '500'))
+
+# Prometheus metrics at /metrics (staff, or METRICS_TOKEN as a bearer token).
+# With several workers set METRICS_DIR to a directory they share.
+METRICS = os.environ.get('METRICS', 'True').lower() == 'true'
+METRICS_DIR = os.environ.get('METRICS_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '1'))
+
+# Per-view query budgets and N+1 detection: 'off', 'warn' (log) or 'raise'.
+# The test suite raises, so a template change that adds queries fails CI.
+QUERY_BUDGETS = os.environ.get('QUERY_BUDGETS', 'raise' if TESTING else 'warn' if DEBUG else 'off')
+
+# Slow-query log: queries over SLOW_QUERY_MS are kept, with their EXPLAIN plan,
+# for staff at dashboard/admin/slow-queries/. On PostgreSQL a
+# SLOW_QUERY_ANALYZE_RATE fraction of repeats is re-run under EXPLAIN ANALYZE.
+SLOW_QUERIES = os.environ.get('SLOW_QUERIES', 'True').lower() == 'true'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_ANALYZE_RATE = float(os.environ.get('SLOW_QUERY_ANALYZE_RATE', '0'))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', '200'))
+SLOW_QUERY_DUMP = os.environ.get('SLOW_QUERY_DUMP')  # JSON file written on exit
+
+# Staff can profile a single request with ?_profile=1 (report) or
+# ?_profile=collapsed (flame-graph stacks). Set PROFILE_DIR to keep the files.
+PROFILING = os.environ.get('PROFILING', 'True').lower() == 'true'
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+PROFILE_SAMPLE_SECONDS = float(os.environ.get('PROFILE_SAMPLE_SECONDS', '0.002'))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "botaniq.timing": {
+            "handlers": ["console"],
+            "level": os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            "propagate": False,
+        },
+        "botaniq.slowqueries": {
+            "handlers": ["console"],
+            "level": os.environ.get('SLOW_QUERY_LOG_LEVEL', 'WARNING'),
+            "propagate": False,
+        },
+    },
+}
+
 # Default primary key
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
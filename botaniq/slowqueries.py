@@ -0,0 +1,178 @@
+"""Slow-query log with EXPLAIN capture
+
+SlowQueryMiddleware times every query a request runs. Queries slower than
+SLOW_QUERY_MS are grouped by normalized SQL in a bounded, per-process log
+(least recently seen shapes drop out first) with the views and code line
+that issued them. The first time a SELECT shape turns up its plan is
+captured with EXPLAIN on the same connection and parameters. On PostgreSQL a
+SLOW_QUERY_ANALYZE_RATE fraction of later occurrences re-runs it with
+EXPLAIN ANALYZE, which executes the query a second time.
+
+Staff can read the log at dashboard/admin/slow-queries/ (?format=json to
+download it). With SLOW_QUERY_DUMP set it is also written there on exit.
+"""
+import atexit
+import json
+import logging
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .querybudget import query_origin, sql_shape, unbudgeted
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_LIMIT = re.compile(r'\b(LIMIT|OFFSET) \d+')
+
+_explaining = ContextVar('botaniq_explaining', default=False)
+
+
+def normalize_sql(sql):
+    """Parameterised SQL with IN lists, LIMIT/OFFSET values and whitespace collapsed"""
+    return _LIMIT.sub(r'\1 N', sql_shape(_WHITESPACE.sub(' ', sql).strip()))
+
+
+def explain(connection, sql, params, analyze=False):
+    """The plan for `sql` as text, or the error that stopped EXPLAIN"""
+    options = {'analyze': True} if analyze else {}
+    token = _explaining.set(True)
+    try:
+        prefix = connection.ops.explain_query_prefix(**options)
+        with unbudgeted(), transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            # PostgreSQL returns one text column; SQLite's plan detail is the last of four.
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except (DatabaseError, ValueError) as exc:
+        return f'EXPLAIN failed: {exc}'
+    finally:
+        _explaining.reset(token)
+
+
+class SlowQueryLog:
+    """Slow queries grouped by normalized SQL, keeping the `size` most recently seen"""
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def record(self, sql, duration_ms, view, origin, explainable=True):
+        """Add one slow execution; True if its plan still needs capturing"""
+        shape = normalize_sql(sql)
+        with self.lock:
+            entry = self.entries.get(shape)
+            if entry is None:
+                entry = self.entries[shape] = {
+                    'sql': shape,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'views': Counter(),
+                    'origin': origin,
+                    'plan': '',
+                    'analyzed': False,
+                }
+                if len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(shape)
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            if duration_ms >= entry['max_ms']:
+                entry['max_ms'] = duration_ms
+                entry['origin'] = origin
+            entry['views'][view] += 1
+            entry['last_seen'] = timezone.now()
+            if explainable and not entry['plan']:
+                entry['plan'] = 'pending'
+                return True
+        return False
+
+    def set_plan(self, sql, plan, analyzed):
+        with self.lock:
+            entry = self.entries.get(normalize_sql(sql))
+            if entry is not None:
+                entry['plan'] = plan
+                entry['analyzed'] = analyzed
+
+    def snapshot(self):
+        """Entries, slowest in total first"""
+        with self.lock:
+            entries = [
+                {**entry, 'views': dict(entry['views'].most_common()),
+                 'mean_ms': entry['total_ms'] / entry['count']}
+                for entry in self.entries.values()
+            ]
+        return sorted(entries, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
+
+
+def _dump_at_exit():
+    if settings.SLOW_QUERY_DUMP and slow_query_log.entries:
+        slow_query_log.dump(settings.SLOW_QUERY_DUMP)
+
+
+atexit.register(_dump_at_exit)
+
+
+class SlowQueryRecorder:
+    def __init__(self, request, threshold_ms):
+        self.request = request
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explaining.get():
+            return execute(sql, params, many, context)
+        started = perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (perf_counter() - started) * 1000
+        if duration_ms >= self.threshold_ms:
+            self.slow(sql, params, many, context['connection'], duration_ms)
+        return result
+
+    def slow(self, sql, params, many, connection, duration_ms):
+        match = self.request.resolver_match
+        view = match.view_name if match else self.request.path
+        explainable = not many and sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        logger.warning('%.1f ms in %s: %s', duration_ms, view, sql[:200])
+        if slow_query_log.record(sql, duration_ms, view, query_origin(), explainable):
+            slow_query_log.set_plan(sql, explain(connection, sql, params), analyzed=False)
+        elif (
+            explainable
+            and connection.vendor == 'postgresql'
+            and random.random() < settings.SLOW_QUERY_ANALYZE_RATE
+        ):
+            slow_query_log.set_plan(sql, explain(connection, sql, params, analyze=True), analyzed=True)
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERIES:
+            return self.get_response(request)
+        recorder = SlowQueryRecorder(request, settings.SLOW_QUERY_MS)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
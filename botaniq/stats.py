@@ -0,0 +1,10 @@
+"""Small statistics helpers shared by the benchmarks and the relevance report"""
+import math
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * fraction) - 1, 0)]
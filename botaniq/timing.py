@@ -0,0 +1,144 @@
+"""Per-request phase timing
+
+ServerTimingMiddleware times the database (through connection execute
+wrappers), template rendering and any explicit span() blocks, such as
+sentence-encoder loading and encoding or the Mistral call. It reports them
+in a JSON log line on the botaniq.timing logger, and in a Server-Timing
+header for staff (everyone with SERVER_TIMING_PUBLIC), and feeds the request
+latency and query-count metrics. The cost is a couple of perf_counter()
+calls per query or span.
+"""
+import json
+import logging
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('botaniq.timing')
+
+_current = ContextVar('botaniq_request_timer', default=None)
+
+
+class RequestTimer:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+
+@contextmanager
+def span(name):
+    """Attribute the enclosed block's time to `name` in the current request, if any"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _time_query(execute, sql, params, many, context):
+    with span('db'):
+        return execute(sql, params, many, context)
+
+
+_templates_instrumented = False
+
+
+def _instrument_templates():
+    """Time top-level template renders; Django only sends template_rendered under the test runner"""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    Template.render = timed('tpl')(Template.render)
+    _templates_instrumented = True
+
+
+def server_timing_header(durations, counts, total):
+    metrics = []
+    for name, seconds in sorted(durations.items()):
+        metric = f'{name};dur={seconds * 1000:.1f}'
+        if name == 'db':
+            metric += f';desc="{counts[name]} queries"'
+        metrics.append(metric)
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+def _is_staff(request):
+    # Pages answered before AuthenticationMiddleware (pre-rendered ones) have no user
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.SERVER_TIMING:
+            _instrument_templates()
+
+    def __call__(self, request):
+        if not (settings.SERVER_TIMING or settings.METRICS):
+            return self.get_response(request)
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if settings.METRICS:
+            metrics.REQUEST_LATENCY.observe(total, view=view, method=request.method)
+            metrics.REQUESTS.inc(view=view, status=f'{response.status_code // 100}xx')
+            metrics.DB_QUERIES.observe(timer.counts['db'], view=view)
+        if not settings.SERVER_TIMING:
+            return response
+
+        if settings.SERVER_TIMING_PUBLIC or _is_staff(request):
+            response['Server-Timing'] = server_timing_header(timer.durations, timer.counts, total)
+        level = logging.INFO if total * 1000 >= settings.SERVER_TIMING_SLOW_MS else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timer.counts['db'],
+                'total_ms': round(total * 1000, 1),
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in timer.durations.items()},
+            }))
+        return response
@@ -16,8 +16,9 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
+from plants.views import serve_thumbnail
 from . import views
 
 urlpatterns = [
@@ -25,11 +26,17 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("plants/", include("plants.urls")),
     path("dashboard/", include("dashboard.urls")),
+    path("api/v1/plants/", include("plants.api_urls")),
+    path("jobs/", include("jobs.urls")),
+    path("metrics", views.metrics, name="metrics"),
+    # Thumbnails at the default THUMBNAIL_URL; originals under THUMBNAIL_ROOT are never served
+    re_path(r"^media/thumbs/(?P<name>[0-9a-f]{2}/[0-9a-f]{64}-\d+\.(?:webp|jpg))$", serve_thumbnail, name="thumbnail"),
 
     # Authentication
     path("accounts/login/", views.custom_login, name="login"),
     path("accounts/logout/", auth_views.LogoutView.as_view(next_page="/"), name="logout"),
     path("accounts/register/", views.register, name="register"),
-    # Temporary internal endpoint to run DB seeding (protected by SEED_TOKEN env var)
+    # Internal endpoints to queue DB seeding and follow its progress (protected by SEED_TOKEN env var)
     path("internal/seed/<str:token>/", views.run_seed, name="internal_seed"),
+    path("internal/seed/<str:token>/<uuid:job_id>/", views.seed_status, name="internal_seed_status"),
 ]
@@ -1,19 +1,29 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import login, authenticate
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from dashboard.forms import CustomUserCreationForm
 import os
-from django.core.management import call_command
-from io import StringIO
 from django.http import HttpResponseForbidden
+from jobs.models import Job
+from jobs.runner import submit_unique
+from plants.management.commands.seed_plants import SEED_FILE
+from plants.trending import get_trending
+from . import metrics as app_metrics
+from .querybudget import query_budget
 
 
+@query_budget(2)
 def home(request):
     """Home page for BotanIQ"""
-    return render(request, 'home.html')
+    return render(request, 'home.html', {'trending': get_trending()})
 
 
+@query_budget(10)
 def custom_login(request):
     """Custom login view that redirects based on user type"""
     if request.method == 'POST':
@@ -35,6 +45,7 @@ def custom_login(request):
     return render(request, 'registration/login.html', {'form': form})
 
 
+@query_budget(21)
 def register(request):
     """User registration view"""
     if request.method == 'POST':
@@ -48,17 +59,67 @@ def register(request):
     return render(request, 'registration/register.html', {'form': form})
 
 
+def _seed_token_ok(token):
+    secret = os.environ.get('SEED_TOKEN')
+    return bool(secret) and constant_time_compare(token, secret)
+
+
+@query_budget(6)
+@csrf_exempt  # called by scripts, and the token authenticates it
+@require_POST
 def run_seed(request, token: str):
-    """Protected one-off endpoint to run the seed_plants management command.
+    """Protected endpoint that queues the seed import as a background job.
 
     Usage: set an environment variable SEED_TOKEN on the production host, then
-    call /internal/seed/<token>/ to trigger seeding. This is temporary and
-    should be removed after use.
+    POST to /internal/seed/<token>/ to trigger seeding. The response carries the
+    job id straight away; poll the status_url for rows processed, rate and
+    errors. While a seed job is queued or running, repeat calls return it
+    instead of starting another.
     """
-    secret = os.environ.get('SEED_TOKEN')
-    if not secret or token != secret:
+    if not _seed_token_ok(token):
+        return HttpResponseForbidden('Forbidden')
+
+    job, created = submit_unique(
+        'import_plants', f'import_plants:{SEED_FILE}', params={'path': str(SEED_FILE), 'update': False}
+    )
+    return JsonResponse(_seed_job_payload(job, token, created), status=202 if created else 200)
+
+
+@query_budget(1)
+def seed_status(request, token: str, job_id):
+    """Progress of a seed job, protected by the same SEED_TOKEN"""
+    if not _seed_token_ok(token):
         return HttpResponseForbidden('Forbidden')
+    job = get_object_or_404(Job, pk=job_id, kind='import_plants')
+    return JsonResponse(_seed_job_payload(job, token))
+
+
+def _seed_job_payload(job, token, created=False):
+    return {
+        'job_id': str(job.id),
+        'created': created,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error.splitlines()[0] if job.error else '',
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'status_url': reverse('internal_seed_status', args=[token, job.id]),
+    }
+
 
-    out = StringIO()
-    call_command('seed_plants', stdout=out)
-    return HttpResponse(out.getvalue(), content_type='text/plain')
+def _metrics_allowed(request):
+    """Staff, or a scraper presenting the METRICS_TOKEN env var as a bearer token"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    secret = os.environ.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+    return bool(secret) and constant_time_compare(token, secret)
+
+
+@query_budget(2)
+def metrics(request):
+    """Prometheus scrape endpoint, summed across worker processes"""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(app_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "botaniq.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.CATALOGUE_PRELOAD:
+    from plants.catalogue import preload  # noqa: E402
+
+    preload()
@@ -0,0 +1,210 @@
+"""End-to-end benchmark of the main pages
+
+Each case is a stream of URLs (different searches, plants and collections
+on every request) fetched either in-process through the Django test client,
+with every middleware and the query count of each request, or over HTTP
+against a running server with a pool of concurrent clients. Over HTTP the
+query count is read from the Server-Timing header, which the server only
+sends to anonymous clients with SERVER_TIMING_PUBLIC on.
+
+Results are JSON: throughput, p50/p95/p99/mean latency and query counts per
+case. compare() checks them against a saved baseline.
+"""
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import Mod
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from botaniq.stats import percentile
+from plants.models import Plant
+from plants.searchlog import flush_search_log
+from plants.trending import flush_views
+from .models import UserCollection
+from .synthetic import USERNAME_PREFIX
+
+CASES = ['plant_list_basic', 'plant_list_smart', 'plant_detail', 'dashboard', 'collection_detail', 'admin_dashboard']
+STAFF_USERNAME = f'{USERNAME_PREFIX}staff'
+SEARCH_TERMS = [
+    'fever', 'malaria', 'digestive', 'inflammation', 'cough', 'wound', 'diabetes', 'skin',
+    'antimicrobial', 'pain', 'stomach', 'respiratory', 'anxiety', 'immune', 'tea', 'bark',
+]
+URLS_PER_CASE = 50
+
+_SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def summarize(latencies, queries, errors, elapsed):
+    latencies_ms = [seconds * 1000 for seconds in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies_ms, 0.50), 2),
+        'p95_ms': round(percentile(latencies_ms, 0.95), 2),
+        'p99_ms': round(percentile(latencies_ms, 0.99), 2),
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 2),
+        'queries_p50': percentile(queries, 0.50) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def benchmark_users():
+    """(researcher, staff): the user with the largest library, and a temporary staff account
+
+    The staff account has no usable password; run() deletes it when it is done.
+    """
+    researcher = (
+        User.objects.filter(is_staff=False).annotate(saves=Count('saved_plants'))
+        .filter(saves__gt=0).order_by('-saves', 'id').first()
+    )
+    staff, created = User.objects.get_or_create(username=STAFF_USERNAME, defaults={'is_staff': True})
+    if created:
+        staff.set_unusable_password()
+        staff.save(update_fields=['password'])
+    return researcher, staff
+
+
+def case_urls(researcher):
+    """{case: [url, ...]} cycling through different inputs"""
+    plant_list = reverse('plants:plant_list')
+    # Plants spread evenly across the table, the same ones every run
+    step = max(Plant.objects.count() // URLS_PER_CASE, 1)
+    names = list(
+        Plant.objects.filter(is_verified=True).alias(bucket=Mod('id', step)).filter(bucket=0)
+        .order_by('id').values_list('scientific_name', flat=True)[:URLS_PER_CASE]
+    )
+    urls = {
+        'plant_list_basic': [f'{plant_list}?q={term}&search_type=basic' for term in SEARCH_TERMS],
+        'plant_list_smart': [f'{plant_list}?q={term}&search_type=smart' for term in SEARCH_TERMS],
+        'plant_detail': [reverse('plants:plant_detail', args=[name]) for name in names],
+        'admin_dashboard': [reverse('dashboard:admin_dashboard')],
+    }
+    if researcher is not None:
+        urls['dashboard'] = [reverse('dashboard:dashboard')]
+        urls['collection_detail'] = [
+            reverse('dashboard:collection_detail', args=[pk])
+            for pk in UserCollection.objects.filter(user=researcher).values_list('pk', flat=True)
+        ]
+    return urls
+
+
+def run_in_process(urls, client, requests, warmup=2):
+    """Fetch `requests` URLs through the test client, counting queries on each"""
+    for url in islice(cycle(urls), warmup):
+        client.get(url)
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for url in islice(cycle(urls), requests):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - request_started)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+
+def run_http(base_url, urls, cookie, requests, concurrency, warmup=2, timeout=60):
+    """Fetch `requests` URLs from a running server with `concurrency` clients at once"""
+    lock = threading.Lock()
+    latencies, queries = [], []
+    errors = 0
+
+    def fetch(url):
+        nonlocal errors
+        request = urllib.request.Request(base_url.rstrip('/') + url)
+        if cookie:
+            request.add_header('Cookie', cookie)
+        request_started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                timing = response.headers.get('Server-Timing', '')
+            failed = False
+        except OSError:
+            timing, failed = '', True
+        elapsed = time.perf_counter() - request_started
+        match = _SERVER_TIMING_QUERIES.search(timing)
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+            if match:
+                queries.append(int(match.group(1)))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, islice(cycle(urls), warmup)))
+        latencies.clear()
+        queries.clear()
+        errors = 0
+        started = time.perf_counter()
+        list(pool.map(fetch, islice(cycle(urls), requests)))
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+
+def session_cookie(client, user):
+    """A logged-in session cookie header for `user`, usable against a server sharing this database"""
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def run(cases=CASES, requests=50, base_url=None, concurrency=1, progress=None):
+    """{case: summary} for every case there is data for
+
+    The sessions it logs in with, and the staff account, are removed afterwards.
+    """
+    researcher, staff = benchmark_users()
+    urls = case_urls(researcher)
+    results = {}
+    logged_in = []
+    try:
+        for case in cases:
+            if not urls.get(case):
+                continue
+            user = (
+                staff if case == 'admin_dashboard' else researcher if case in ('dashboard', 'collection_detail') else None
+            )
+            client = Client()
+            if user:
+                logged_in.append(client)
+            if base_url:
+                cookie = session_cookie(client, user) if user else ''
+                results[case] = run_http(base_url, urls[case], cookie, requests, concurrency)
+            else:
+                if user:
+                    client.force_login(user)
+                results[case] = run_in_process(urls[case], client, requests)
+            if progress:
+                progress(case, results[case])
+    finally:
+        for client in logged_in:
+            client.logout()
+        User.objects.filter(username=STAFF_USERNAME).delete()
+    # Don't leave buffered page views and searches to the exit handlers
+    flush_views()
+    flush_search_log()
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Regressions against a baseline: p95 more than `tolerance` slower, or more queries"""
+    regressions = []
+    for case, result in results.items():
+        before = baseline.get(case)
+        if not before:
+            continue
+        if before.get('p95_ms') and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{case}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if before.get('queries_max') is not None and (result['queries_max'] or 0) > before['queries_max']:
+            regressions.append(f"{case}: up to {result['queries_max']} queries, was {before['queries_max']}")
+    return regressions
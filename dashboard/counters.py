@@ -0,0 +1,54 @@
+"""Denormalized research library counters stored on UserProfile"""
+from django.contrib.auth.models import User
+from django.db.models import F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import UserProfile, UserCollection, SavedPlant, ResearchNote
+
+
+def adjust_counters(profiles, **deltas):
+    """Atomically add deltas (e.g. saved=1, favorite=-1) to the given profiles"""
+    updates = {
+        f'{name}_count': F(f'{name}_count') + delta
+        for name, delta in deltas.items() if delta
+    }
+    if updates:
+        profiles.update(**updates)
+
+
+def count_subquery(queryset):
+    """Correlated COUNT(*) subquery, 0 when nothing matches"""
+    counted = queryset.order_by().annotate(total=Func(F('pk'), function='COUNT')).values('total')
+    return Coalesce(Subquery(counted), 0)
+
+
+def ensure_library(user_ids=None):
+    """Create missing profiles and default collections in bulk"""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+
+    missing_profiles = users.filter(profile__isnull=True).values_list('pk', flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk) for pk in missing_profiles], ignore_conflicts=True
+    )
+    missing_defaults = users.exclude(collections__is_default=True).values_list('pk', flat=True)
+    UserCollection.objects.bulk_create(
+        [UserCollection(user_id=pk, is_default=True, **UserCollection.DEFAULT_FIELDS) for pk in missing_defaults],
+        ignore_conflicts=True,
+    )
+
+
+def recompute_counters(user_ids=None):
+    """Recompute profile counters from the source tables in a single UPDATE"""
+    profiles = UserProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+
+    saved = SavedPlant.objects.filter(user=OuterRef('user'))
+    return profiles.update(
+        saved_count=count_subquery(saved),
+        favorite_count=count_subquery(saved.filter(is_favorite=True)),
+        collection_count=count_subquery(UserCollection.objects.filter(user=OuterRef('user'))),
+        note_count=count_subquery(ResearchNote.objects.filter(saved_plant__user=OuterRef('user'))),
+    )
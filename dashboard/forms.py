@@ -5,72 +5,95 @@ from plants.models import Plant
 from .models import UserProfile
 
 
+def split_list(data, separator):
+    """Split entered text into a clean list; lists (e.g. from imports) are only stripped"""
+    if not isinstance(data, list):
+        data = data.split(separator) if data else []
+    return [item.strip() for item in data if item.strip()]
+
+
+class PlantListField(forms.CharField):
+    """Text field for a JSON list that also accepts an already split list of strings"""
+
+    def to_python(self, value):
+        if isinstance(value, (list, tuple)):
+            return [str(item) for item in value if item is not None]
+        return super().to_python(value)
+
+
 class PlantForm(forms.ModelForm):
     """Form for adding/editing plants in admin dashboard"""
 
     # Convert JSON fields to text inputs for easier editing
-    common_names = forms.CharField(
+    common_names = PlantListField(
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Enter common names separated by commas (e.g., Ginger, Ginger Root)",
         label="Common Names"
     )
 
-    traditional_systems = forms.CharField(
+    traditional_systems = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Traditional medicine systems (e.g., Ayurveda, TCM)",
         label="Traditional Systems"
     )
 
-    cultural_uses = forms.CharField(
+    cultural_uses = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 3}),
         help_text="Cultural and historical uses",
         label="Cultural Uses"
     )
 
-    parts_used = forms.CharField(
+    parts_used = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Plant parts used medicinally",
         label="Parts Used"
     )
 
-    preparations = forms.CharField(
+    preparations = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 3}),
         help_text="Traditional preparation methods",
         label="Preparations"
     )
 
-    active_compounds = forms.CharField(
+    active_compounds = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Known active compounds",
         label="Active Compounds"
     )
 
-    pharmacological_actions = forms.CharField(
+    pharmacological_actions = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Pharmacological effects",
         label="Pharmacological Actions"
     )
 
-    research_studies = forms.CharField(
+    research_studies = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 4}),
         help_text="Scientific studies and findings",
         label="Research Studies"
     )
 
-    regions = forms.CharField(
+    regions = PlantListField(
         required=False,
         widget=forms.Textarea(attrs={'rows': 2}),
         help_text="Geographical regions where found",
         label="Regions"
     )
 
+    # Not a model field: stored and thumbnailed by plants.images, taking precedence over image_url
+    image_upload = forms.ImageField(
+        required=False,
+        help_text="JPEG, PNG or WebP; thumbnails are generated in the background",
+        label="Upload Image"
+    )
+
     class Meta:
         model = Plant
         fields = [
@@ -95,66 +118,39 @@ class PlantForm(forms.ModelForm):
 
     def clean_common_names(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data['common_names']
-        if data:
-            return [name.strip() for name in data.split(',') if name.strip()]
-        return []
+        return split_list(self.cleaned_data.get('common_names', ''), ',')
 
     def clean_traditional_systems(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data.get('traditional_systems', '')
-        if data:
-            return [system.strip() for system in data.split(',') if system.strip()]
-        return []
+        return split_list(self.cleaned_data.get('traditional_systems', ''), ',')
 
     def clean_cultural_uses(self):
         """Convert newline-separated string to list"""
-        data = self.cleaned_data.get('cultural_uses', '')
-        if data:
-            return [use.strip() for use in data.split('\n') if use.strip()]
-        return []
+        return split_list(self.cleaned_data.get('cultural_uses', ''), '\n')
 
     def clean_parts_used(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data.get('parts_used', '')
-        if data:
-            return [part.strip() for part in data.split(',') if part.strip()]
-        return []
+        return split_list(self.cleaned_data.get('parts_used', ''), ',')
 
     def clean_preparations(self):
         """Convert newline-separated string to list"""
-        data = self.cleaned_data.get('preparations', '')
-        if data:
-            return [prep.strip() for prep in data.split('\n') if prep.strip()]
-        return []
+        return split_list(self.cleaned_data.get('preparations', ''), '\n')
 
     def clean_active_compounds(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data.get('active_compounds', '')
-        if data:
-            return [compound.strip() for compound in data.split(',') if compound.strip()]
-        return []
+        return split_list(self.cleaned_data.get('active_compounds', ''), ',')
 
     def clean_pharmacological_actions(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data.get('pharmacological_actions', '')
-        if data:
-            return [action.strip() for action in data.split(',') if action.strip()]
-        return []
+        return split_list(self.cleaned_data.get('pharmacological_actions', ''), ',')
 
     def clean_research_studies(self):
         """Convert newline-separated string to list"""
-        data = self.cleaned_data.get('research_studies', '')
-        if data:
-            return [study.strip() for study in data.split('\n') if study.strip()]
-        return []
+        return split_list(self.cleaned_data.get('research_studies', ''), '\n')
 
     def clean_regions(self):
         """Convert comma-separated string to list"""
-        data = self.cleaned_data.get('regions', '')
-        if data:
-            return [region.strip() for region in data.split(',') if region.strip()]
-        return []
+        return split_list(self.cleaned_data.get('regions', ''), ',')
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -182,9 +178,8 @@ class CustomUserCreationForm(UserCreationForm):
         user.email = self.cleaned_data["email"]
         if commit:
             user.save()
-            # Create user profile
-            UserProfile.objects.create(
-                user=user,
+            # The profile is created by the post_save signal; fill in its details
+            UserProfile.objects.filter(user=user).update(
                 phone_number=self.cleaned_data["phone_number"],
                 location=self.cleaned_data["location"]
             )
@@ -0,0 +1,180 @@
+"""Streaming exports of a user's research library (collections, saved plants, notes)"""
+import csv
+import io
+import json
+import re
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from jobs.runner import job_file_path, register
+from plants.exporter import encode_stream
+from .models import SavedPlant, ResearchNote
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'markdown': ('application/zip', 'zip'),
+}
+CHUNK_SIZE = 500
+CSV_COLUMNS = [
+    'collection', 'scientific_name', 'common_name', 'plant_family', 'date_saved',
+    'is_favorite', 'notes', 'research_notes',
+]
+
+
+def library_queryset(user, collection_id=None):
+    """Saved plants with their plant, collection and notes, in collection order"""
+    saved_plants = SavedPlant.objects.filter(user=user).select_related('plant', 'collection').prefetch_related(
+        Prefetch('research_notes', queryset=ResearchNote.objects.order_by('created_at', 'id'))
+    )
+    if collection_id is not None:
+        saved_plants = saved_plants.filter(collection_id=collection_id)
+    return saved_plants.order_by('collection__name', 'date_saved', 'id')
+
+
+def library_records(saved_plants, chunk_size=CHUNK_SIZE):
+    """One dict per saved plant, read in chunks (prefetches run per chunk)"""
+    for saved_plant in saved_plants.iterator(chunk_size=chunk_size):
+        plant = saved_plant.plant
+        yield {
+            'collection': saved_plant.collection.name,
+            'scientific_name': plant.scientific_name,
+            'common_name': plant.get_primary_common_name(),
+            'plant_family': plant.plant_family,
+            'date_saved': saved_plant.date_saved,
+            'is_favorite': saved_plant.is_favorite,
+            'notes': saved_plant.notes,
+            'research_notes': [
+                {'title': note.title, 'content': note.content, 'created_at': note.created_at}
+                for note in saved_plant.research_notes.all()
+            ],
+        }
+
+
+def ndjson_lines(records):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for record in records:
+        record = dict(record, date_saved=record['date_saved'].isoformat())
+        record['research_notes'] = json.dumps(record['research_notes'], cls=DjangoJSONEncoder, ensure_ascii=False)
+        writer.writerow([record[column] for column in CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', value).strip('-') or 'untitled'
+
+
+def _markdown(record):
+    lines = [
+        f"# {record['common_name']} (*{record['scientific_name']}*)",
+        '',
+        f"- Family: {record['plant_family']}",
+        f"- Collection: {record['collection']}",
+        f"- Saved: {record['date_saved']:%Y-%m-%d}",
+    ]
+    if record['is_favorite']:
+        lines.append('- ⭐ Favorite')
+    if record['notes']:
+        lines += ['', '## Notes', '', record['notes']]
+    for note in record['research_notes']:
+        lines += ['', f"## {note['title']}", f"_{note['created_at']:%Y-%m-%d}_", '', note['content']]
+    return '\n'.join(lines) + '\n'
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink that hands zip bytes back out as they are produced"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _unique(name, used):
+    """name, or name-2, name-3, ... if an earlier entry already took it"""
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f'{name}-{n}'
+    used.add(candidate)
+    return candidate
+
+
+def markdown_zip_blocks(records):
+    """Yield a zip of one Markdown file per saved plant, grouped by collection folder
+
+    Names that slug to the same path (collections "A B" and "A/B") get a -2,
+    -3, ... suffix instead of overwriting each other on extract.
+    """
+    sink = _ZipStream()
+    folders, used = {}, set()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        for record in records:
+            if record['collection'] not in folders:
+                folders[record['collection']] = _unique(_slug(record['collection']), used)
+            folder = folders[record['collection']]
+            name = _unique(f"{folder}/{_slug(record['scientific_name'])}", used)
+            bundle.writestr(f'{name}.md', _markdown(record))
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def _counted(records, report, every=CHUNK_SIZE):
+    rows = 0
+    for record in records:
+        yield record
+        rows += 1
+        if rows % every == 0:
+            report(rows=rows)
+    report(rows=rows)
+
+
+def export_blocks(user, fmt, collection_id=None, report=None):
+    """Bytes blocks of a library export in the given format"""
+    records = library_records(library_queryset(user, collection_id))
+    if report:
+        records = _counted(records, report)
+    if fmt == 'markdown':
+        return markdown_zip_blocks(records)
+    lines = ndjson_lines(records) if fmt == 'ndjson' else csv_lines(records)
+    return encode_stream(lines)
+
+
+@register('library_export')
+def run_library_export(job, report):
+    """Background job: write a library export to a file for later download"""
+    fmt = job.params['format']
+    collection_id = job.params.get('collection_id')
+    relative, path = job_file_path(job, f"botaniq-library.{FORMATS[fmt][1]}")
+
+    report(rows=0, total=library_queryset(job.user, collection_id).count())
+    with open(path, 'wb') as f:
+        for block in export_blocks(job.user, fmt, collection_id, report):
+            f.write(block)
+    return relative
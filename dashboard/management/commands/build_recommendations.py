@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.recommendations import MIN_SUPPORT, TOP_N, build_cosaved
+
+
+class Command(BaseCommand):
+    help = 'Rebuild "researchers also saved" recommendations from saved plants (schedule this periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_N, help='Neighbours kept per plant')
+        parser.add_argument('--min-support', type=int, default=MIN_SUPPORT,
+                            help='Users who must have saved both plants')
+
+    def handle(self, *args, **options):
+        plants = build_cosaved(top_n=options['top'], min_support=options['min_support'])
+        self.stdout.write(self.style.SUCCESS(f"Stored recommendations for {plants} plants"))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.synthetic import SCALES, clear_synthetic, generate_plants, generate_users, rebuild_derived
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert deterministic synthetic plants and user libraries for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='10k',
+                            help='Preset plant and user counts (10k: 10,000 plants and 1,000 users)')
+        parser.add_argument('--plants', type=int, help='Override the number of plants')
+        parser.add_argument('--users', type=int, help='Override the number of users')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--clear', action='store_true', help='Delete earlier synthetic data first')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Don't rebuild the term index, interactions and recommendations afterwards "
+                                 "(run rebuild_term_index, build_interaction_matrix and build_recommendations later)")
+
+    def handle(self, *args, **options):
+        plants, users = SCALES[options['scale']]
+        plants = plants if options['plants'] is None else options['plants']
+        users = users if options['users'] is None else options['users']
+        if plants < 0 or users < 0 or options['batch_size'] < 1:
+            raise CommandError('--plants and --users must not be negative, --batch-size must be positive')
+
+        if options['clear']:
+            cleared_plants, cleared_users = clear_synthetic()
+            self.stdout.write(f"Deleted {cleared_plants} synthetic plants and {cleared_users} users")
+
+        plant_ids = generate_plants(
+            plants, options['seed'], options['batch_size'],
+            progress=lambda done: self.stdout.write(f"  {done:,}/{plants:,} plants"),
+        )
+        if users and not plant_ids:
+            raise CommandError('No synthetic plants to save; generate some with --plants')
+        generate_users(
+            users, plant_ids, options['seed'], options['batch_size'],
+            progress=lambda done: self.stdout.write(f"  {done:,}/{users:,} users"),
+        )
+        if not options['skip_derived']:
+            self.stdout.write("Rebuilding term index, interactions and recommendations...")
+            rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(f"Generated {plants:,} plants and {users:,} users"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dashboard.counters import ensure_library, recompute_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized dashboard counters on every user profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only repair this user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        with transaction.atomic():
+            ensure_library(user_ids)
+            updated = recompute_counters(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed counters for {updated} profiles'))
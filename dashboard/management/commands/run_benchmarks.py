@@ -0,0 +1,78 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from dashboard import benchmark
+from plants.models import Plant
+from plants.views import ML_AVAILABLE
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main pages (throughput, p50/p95/p99 latency, queries) and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--case', action='append', choices=benchmark.CASES, dest='cases',
+                            help='Case to run (repeatable; default all)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per case')
+        parser.add_argument('--url', help='Load a running server at this base URL instead of using the test client')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients with --url')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before starting')
+        parser.add_argument('--output', help='Write the results JSON here (e.g. to keep as a baseline)')
+        parser.add_argument('--baseline', help='Results JSON from an earlier run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 slowdown against the baseline (0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+        if not Plant.objects.exists():
+            raise CommandError('No plants to benchmark; run generate_synthetic_data first')
+        if options['cold_cache']:
+            cache.clear()
+
+        # The test client talks to "testserver"; budgets would only add noise to the numbers
+        with override_settings(ALLOWED_HOSTS=['testserver', '*'], QUERY_BUDGETS='off'):
+            results = benchmark.run(
+                options['cases'] or benchmark.CASES, options['requests'],
+                base_url=options['url'], concurrency=options['concurrency'], progress=self.report,
+            )
+
+        report = {
+            'meta': {
+                'plants': Plant.objects.count(),
+                'mode': 'http' if options['url'] else 'test-client',
+                'concurrency': options['concurrency'] if options['url'] else 1,
+                'requests_per_case': options['requests'],
+                'ml_available': ML_AVAILABLE,
+            },
+            'cases': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)['cases']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Can't read baseline: {e}")
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stderr.write(f"  regression: {regression}")
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def report(self, case, result):
+        self.stderr.write(
+            f"{case:18} {result['throughput_rps'] or 0:8.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+            f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  queries {result['queries_max']}"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0002_userprofile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="collection_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="favorite_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="note_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="saved_count",
+            field=models.IntegerField(default=0),
+        ),
+    ]
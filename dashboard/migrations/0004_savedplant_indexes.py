@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0003_userprofile_counters"),
+        ("plants", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="savedplant",
+            index=models.Index(
+                fields=["user", "collection", "date_saved"],
+                name="savedplant_user_coll_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="savedplant",
+            index=models.Index(
+                fields=["user", "is_favorite"], name="savedplant_user_fav_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0004_savedplant_indexes"),
+        ("plants", "0002_plant_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # auth.User belongs to another app, so its index is created with plain SQL
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS auth_user_date_joined_idx ON auth_user (date_joined);",
+            reverse_sql="DROP INDEX IF EXISTS auth_user_date_joined_idx;",
+        ),
+        migrations.AddIndex(
+            model_name="savedplant",
+            index=models.Index(
+                fields=["user", "date_saved"], name="savedplant_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="savedplant",
+            index=models.Index(fields=["date_saved"], name="savedplant_date_saved_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="usercollection",
+            index=models.Index(
+                fields=["user", "is_default"], name="collection_user_default_idx"
+            ),
+        ),
+    ]
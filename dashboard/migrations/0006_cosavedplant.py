@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0005_access_path_indexes"),
+        ("plants", "0005_plant_interactions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoSavedPlant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "score",
+                    models.FloatField(
+                        help_text="Co-saves normalized by both plants' popularity"
+                    ),
+                ),
+                (
+                    "support",
+                    models.PositiveIntegerField(
+                        help_text="Users who saved both plants"
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "neighbour",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="plants.plant",
+                    ),
+                ),
+                (
+                    "plant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cosaved",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["plant", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("plant", "rank"), name="cosavedplant_plant_rank_unique"
+                    )
+                ],
+            },
+        ),
+    ]
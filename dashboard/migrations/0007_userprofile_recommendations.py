@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0006_cosavedplant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="recommendations",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
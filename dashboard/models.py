@@ -11,6 +11,15 @@ class UserProfile(models.Model):
     bio = models.TextField(blank=True, help_text="Brief description about yourself")
     email_verified = models.BooleanField(default=False)
     email_verification_token = models.CharField(max_length=100, blank=True, null=True)
+
+    # Denormalized research library counters, kept in sync by dashboard.signals
+    saved_count = models.IntegerField(default=0)
+    favorite_count = models.IntegerField(default=0)
+    collection_count = models.IntegerField(default=0)
+    note_count = models.IntegerField(default=0)
+    # "Researchers also saved" suggestions, written by build_cosaved()
+    recommendations = models.JSONField(default=list, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -20,6 +29,8 @@ class UserProfile(models.Model):
 
 class UserCollection(models.Model):
     """User's custom collections for organizing saved plants"""
+    DEFAULT_FIELDS = {'name': 'My Research Library', 'description': 'Your main collection of saved plants'}
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='collections')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -29,6 +40,9 @@ class UserCollection(models.Model):
 
     class Meta:
         unique_together = ['user', 'name']
+        indexes = [
+            models.Index(fields=['user', 'is_default'], name='collection_user_default_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s {self.name}"
@@ -45,6 +59,14 @@ class SavedPlant(models.Model):
 
     class Meta:
         unique_together = ['user', 'plant']  # One save per user per plant
+        indexes = [
+            # collection_detail keyset pages and favorites lookups
+            models.Index(fields=['user', 'collection', 'date_saved'], name='savedplant_user_coll_date_idx'),
+            models.Index(fields=['user', 'is_favorite'], name='savedplant_user_fav_idx'),
+            # Dashboard "recently added" and admin activity windows
+            models.Index(fields=['user', 'date_saved'], name='savedplant_user_date_idx'),
+            models.Index(fields=['date_saved'], name='savedplant_date_saved_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} saved {self.plant.scientific_name}"
@@ -60,3 +82,21 @@ class ResearchNote(models.Model):
 
     def __str__(self):
         return f"Note: {self.title} - {self.saved_plant}"
+
+
+class CoSavedPlant(models.Model):
+    """Precomputed "researchers also saved" neighbours of a plant"""
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='cosaved')
+    neighbour = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="Co-saves normalized by both plants' popularity")
+    support = models.PositiveIntegerField(help_text="Users who saved both plants")
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['plant', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['plant', 'rank'], name='cosavedplant_plant_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.plant_id} & {self.neighbour_id} ({self.support})"
@@ -0,0 +1,183 @@
+""""Researchers also saved" recommendations from SavedPlant co-occurrence
+
+build_cosaved() streams SavedPlant ordered by user, so one user's library is
+in memory at a time, and accumulates the sparse plant x plant co-occurrence
+counts (the upper triangle of the user x plant matrix's Gram matrix). Each
+pair is scored as cosine similarity, co-saves / sqrt(saves_i * saves_j), and
+the top-N neighbours per plant replace CoSavedPlant in one transaction.
+
+The counts take about 85 bytes per distinct pair. At the 1m-save scale
+(~20 saves per user) that is several million pairs, so once MAX_PAIRS are
+held the rarest ones are pruned, and the threshold rises until at most half
+remain. A pair pruned early may later fall short of MIN_SUPPORT. This bounds
+the build to roughly 170 MB, at the cost of the weakest recommendations.
+
+A second pass over the libraries merges the neighbour lists of each user's
+recent saves into their suggestions, stored on UserProfile, so the
+dashboard shows them without a query of its own. Each batch of profiles is
+written in its own short transaction, because the library counter signals
+update the same rows on every save.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.db import transaction
+
+from jobs.runner import register
+from plants.models import Plant
+from .models import CoSavedPlant, SavedPlant, UserProfile
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 10
+# Pairs saved together by fewer users are noise
+MIN_SUPPORT = 2
+# Only a user's most recent saves count, so one huge library can't dominate
+MAX_SAVES_PER_USER = 200
+# Recent saves whose neighbours are merged into a user's suggestions
+LIBRARY_SIZE = 50
+# Stored per user; the dashboard shows fewer, after dropping plants saved since the build
+STORED_SUGGESTIONS = 12
+# Distinct pairs held in memory before the rarest are pruned
+MAX_PAIRS = 2_000_000
+READ_CHUNK = 5000
+WRITE_BATCH = 1000
+
+
+def prune_pairs(pairs, below):
+    """Drop pairs counted fewer than `below` times; returns how many remain"""
+    remaining = 0
+    for i in list(pairs):
+        row = pairs[i]
+        for j in [j for j, n in row.items() if n < below]:
+            del row[j]
+        if row:
+            remaining += len(row)
+        else:
+            del pairs[i]
+    return remaining
+
+
+def cooccurrence_counts(max_saves=MAX_SAVES_PER_USER, max_pairs=MAX_PAIRS, min_support=MIN_SUPPORT):
+    """(pair counts {i: Counter({j: n})} with i < j, per-plant save counts), holding at most max_pairs pairs"""
+    pairs = defaultdict(Counter)
+    saves = Counter()
+    size = 0
+    rows = SavedPlant.objects.order_by('user_id', '-date_saved').values_list('user_id', 'plant_id')
+    for user_id, user_rows in groupby(rows.iterator(chunk_size=READ_CHUNK), key=itemgetter(0)):
+        plant_ids = sorted(plant_id for _, plant_id in islice(user_rows, max_saves))
+        saves.update(plant_ids)
+        for i, j in combinations(plant_ids, 2):
+            row = pairs[i]
+            size += j not in row
+            row[j] += 1
+        if size > max_pairs:
+            below = min_support
+            while size > max_pairs // 2:
+                size = prune_pairs(pairs, below)
+                below += 1
+            logger.info("Pruned co-saved pairs counted fewer than %d times; %d remain", below - 1, size)
+    return pairs, saves
+
+
+def build_cosaved(top_n=TOP_N, min_support=MIN_SUPPORT):
+    """Rebuild CoSavedPlant; returns the number of plants with recommendations"""
+    pairs, saves = cooccurrence_counts()
+
+    neighbours = defaultdict(list)  # plant -> [(score, support, neighbour)]
+    for i, row in pairs.items():
+        for j, support in row.items():
+            if support < min_support:
+                continue
+            score = support / math.sqrt(saves[i] * saves[j])
+            neighbours[i].append((score, support, j))
+            neighbours[j].append((score, support, i))
+
+    best = {
+        plant_id: heapq.nsmallest(top_n, candidates, key=lambda c: (-c[0], -c[1], c[2]))
+        for plant_id, candidates in neighbours.items()
+    }
+
+    def rows():
+        for plant_id, candidates in best.items():
+            for rank, (score, support, neighbour_id) in enumerate(candidates, start=1):
+                yield CoSavedPlant(
+                    plant_id=plant_id, neighbour_id=neighbour_id, score=round(score, 6), support=support, rank=rank
+                )
+
+    with transaction.atomic():
+        CoSavedPlant.objects.all().delete()
+        CoSavedPlant.objects.bulk_create(rows(), batch_size=WRITE_BATCH)
+    store_suggestions(best)
+    return len(neighbours)
+
+
+def suggestions(recent, library, best, plants, limit=STORED_SUGGESTIONS):
+    """Plants outside `library`, ranked by summed co-save scores from the `recent` saves"""
+    totals = defaultdict(float)
+    because_of = Counter()
+    for plant_id in recent:
+        for score, support, neighbour_id in best.get(plant_id, ()):
+            if neighbour_id in plants and neighbour_id not in library:
+                totals[neighbour_id] += score
+                because_of[neighbour_id] += 1
+    ranked = heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1], item[0]))
+    return [
+        {
+            'neighbour_id': neighbour_id,
+            'neighbour__scientific_name': plants[neighbour_id][0],
+            'neighbour__common_names': plants[neighbour_id][1],
+            'total_score': round(total, 6),
+            'because_of': because_of[neighbour_id],
+        }
+        for neighbour_id, total in ranked
+    ]
+
+
+def store_suggestions(best, library_size=LIBRARY_SIZE):
+    """Write every user's suggestions onto their profile, one library in memory at a time
+
+    Profiles are only cleared when they have no suggestions left.
+    """
+    plants = {
+        plant_id: (scientific_name, common_names)
+        for plant_id, scientific_name, common_names in Plant.objects.filter(
+            is_verified=True, id__in=CoSavedPlant.objects.values('neighbour_id')
+        ).values_list('id', 'scientific_name', 'common_names')
+    }
+    rows = SavedPlant.objects.order_by('user_id', '-date_saved').values_list('user_id', 'plant_id')
+    pending = {}
+    for user_id, user_rows in groupby(rows.iterator(chunk_size=READ_CHUNK), key=itemgetter(0)):
+        library = [plant_id for _, plant_id in user_rows]
+        pending[user_id] = suggestions(library[:library_size], set(library), best, plants)
+        if len(pending) >= WRITE_BATCH:
+            _write_suggestions(pending)
+    _write_suggestions(pending)
+    # Users whose whole library was removed since the last build
+    UserProfile.objects.filter(user__saved_plants__isnull=True).exclude(recommendations=[]).update(
+        recommendations=[]
+    )
+
+
+def _write_suggestions(pending):
+    with transaction.atomic():
+        profiles = list(UserProfile.objects.filter(
+            user_id__in=[user_id for user_id, found in pending.items() if found]
+        ).only('id', 'user_id'))
+        for profile in profiles:
+            profile.recommendations = pending[profile.user_id]
+        UserProfile.objects.bulk_update(profiles, ['recommendations'], batch_size=WRITE_BATCH)
+        UserProfile.objects.filter(
+            user_id__in=[user_id for user_id, found in pending.items() if not found]
+        ).exclude(recommendations=[]).update(recommendations=[])
+    pending.clear()
+
+
+@register('cosaved_plants')
+def run_build_cosaved(job, report):
+    """Background job: rebuild the co-save recommendations"""
+    report(plants=build_cosaved())
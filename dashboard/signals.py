@@ -0,0 +1,84 @@
+"""Keep UserProfile counters in step with the research library"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .counters import adjust_counters
+from .models import UserProfile, UserCollection, SavedPlant, ResearchNote
+
+
+_bulk = ContextVar('dashboard_bulk_library_changes', default=False)
+
+
+@contextmanager
+def bulk_library_changes():
+    """Skip per-row counter upkeep inside; the caller applies one adjust_counters() delta afterwards"""
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+def _profiles(user_id):
+    return UserProfile.objects.filter(user_id=user_id)
+
+
+@receiver(post_save, sender=User)
+def create_research_library(sender, instance, created, raw=False, **kwargs):
+    """Give every new user a profile and their default collection"""
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+        UserCollection.objects.get_or_create(
+            user=instance, is_default=True, defaults=UserCollection.DEFAULT_FIELDS
+        )
+
+
+@receiver(post_save, sender=UserCollection)
+def collection_created(sender, instance, created, raw=False, **kwargs):
+    if created and not (raw or _bulk.get()):
+        adjust_counters(_profiles(instance.user_id), collection=1)
+
+
+@receiver(post_delete, sender=UserCollection)
+def collection_deleted(sender, instance, **kwargs):
+    if not _bulk.get():
+        adjust_counters(_profiles(instance.user_id), collection=-1)
+
+
+@receiver(post_init, sender=SavedPlant)
+def remember_favorite(sender, instance, **kwargs):
+    """Track the loaded favorite flag so saves can report a change"""
+    instance._saved_is_favorite = instance.is_favorite
+
+
+@receiver(post_save, sender=SavedPlant)
+def saved_plant_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _bulk.get():
+        return
+    if created:
+        adjust_counters(_profiles(instance.user_id), saved=1, favorite=int(instance.is_favorite))
+    elif instance.is_favorite != instance._saved_is_favorite:
+        adjust_counters(_profiles(instance.user_id), favorite=1 if instance.is_favorite else -1)
+    instance._saved_is_favorite = instance.is_favorite
+
+
+@receiver(post_delete, sender=SavedPlant)
+def saved_plant_deleted(sender, instance, **kwargs):
+    if not _bulk.get():
+        adjust_counters(_profiles(instance.user_id), saved=-1, favorite=-int(instance._saved_is_favorite))
+
+
+@receiver(post_save, sender=ResearchNote)
+def note_created(sender, instance, created, raw=False, **kwargs):
+    if created and not (raw or _bulk.get()):
+        adjust_counters(UserProfile.objects.filter(user__saved_plants=instance.saved_plant_id), note=1)
+
+
+@receiver(post_delete, sender=ResearchNote)
+def note_deleted(sender, instance, **kwargs):
+    if not _bulk.get():
+        adjust_counters(UserProfile.objects.filter(user__saved_plants=instance.saved_plant_id), note=-1)
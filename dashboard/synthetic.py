@@ -0,0 +1,219 @@
+"""Deterministic synthetic plants and research libraries for benchmarking
+
+Field values are drawn from the seed catalogue, so search terms, the term
+index and the interaction matrix see realistic vocabulary. Saves follow a
+Zipf-like popularity curve. Everything is written with bulk_create in
+batches, and the same seed always produces the same data.
+
+Synthetic rows are marked (SYNTHETIC_CREDIT on plants, the USERNAME_PREFIX on
+users) so clear_synthetic() can remove them without touching real data.
+"""
+import json
+import random
+from collections import defaultdict
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from plants.catalogue import bump_generation
+from plants.interactions import rebuild_interactions
+from plants.management.commands.seed_plants import SEED_FILE
+from plants.models import Plant
+from plants.signals import bulk_changes
+from plants.similarity import queue_refresh
+from plants.terms import rebuild_term_index
+from .counters import ensure_library, recompute_counters
+from .models import ResearchNote, SavedPlant, UserCollection
+from .recommendations import build_cosaved
+from .signals import bulk_library_changes
+
+SYNTHETIC_CREDIT = 'Synthetic benchmark data'
+USERNAME_PREFIX = 'synthetic-'
+PASSWORD = 'benchmark'
+
+SCALES = {
+    # plants, users
+    '10k': (10_000, 1_000),
+    '100k': (100_000, 5_000),
+    '1m': (1_000_000, 20_000),
+}
+
+LIST_FIELDS = [
+    'common_names', 'regions', 'traditional_systems', 'cultural_uses', 'parts_used',
+    'preparations', 'active_compounds', 'research_studies', 'pharmacological_actions',
+]
+TEXT_FIELDS = [
+    'habitat', 'dosage_info', 'safety_warnings', 'contraindications', 'interactions',
+    'toxicity_info', 'conservation_status', 'sustainability_info', 'ethical_sourcing',
+]
+EPITHETS = [
+    'africana', 'alba', 'amara', 'aromatica', 'capensis', 'edulis', 'grandiflora', 'indica',
+    'kenyensis', 'lanceolata', 'major', 'montana', 'nigra', 'occidentalis', 'officinalis',
+    'orientalis', 'parviflora', 'repens', 'silvestris', 'tomentosa', 'vulgaris', 'zeylanica',
+]
+COLLECTION_NAMES = ['Fieldwork', 'Antimicrobials', 'To review', 'Teaching set', 'Grant proposal']
+NOTE_TITLES = ['Field observation', 'Literature check', 'Dosage question', 'Follow up', 'Lab result']
+
+MAX_SAVES_PER_USER = 120
+NOTE_RATE = 0.3
+
+
+def vocabulary():
+    """Pools of values per field from the seed catalogue"""
+    pools = defaultdict(set)
+    with open(SEED_FILE) as f:
+        for line in f:
+            record = json.loads(line)
+            for field in LIST_FIELDS:
+                pools[field].update(record.get(field) or [])
+            for field in TEXT_FIELDS + ['plant_family', 'description']:
+                if record.get(field):
+                    pools[field].add(record[field])
+            pools['genus'].add(record['scientific_name'].split()[0])
+    return {field: sorted(values) for field, values in pools.items()}
+
+
+def synthetic_plant(rng, vocab, index):
+    def sample(field, low, high):
+        pool = vocab[field]
+        return rng.sample(pool, min(len(pool), rng.randint(low, high)))
+
+    genus = rng.choice(vocab['genus'])
+    epithet = rng.choice(EPITHETS)
+    return Plant(
+        scientific_name=f"{genus} {epithet} s{index}",
+        common_names=sample('common_names', 1, 3),
+        plant_family=rng.choice(vocab['plant_family']),
+        description=rng.choice(vocab['description']),
+        regions=sample('regions', 1, 4),
+        traditional_systems=sample('traditional_systems', 1, 2),
+        cultural_uses=sample('cultural_uses', 2, 5),
+        parts_used=sample('parts_used', 1, 3),
+        preparations=sample('preparations', 1, 4),
+        active_compounds=sample('active_compounds', 1, 5),
+        research_studies=sample('research_studies', 0, 3),
+        pharmacological_actions=sample('pharmacological_actions', 1, 4),
+        **{field: rng.choice(vocab[field]) for field in TEXT_FIELDS if vocab.get(field)},
+        image_credit=SYNTHETIC_CREDIT,
+        is_verified=rng.random() < 0.95,
+    )
+
+
+def _batched_create(model, objects, batch_size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch.clear()
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def generate_plants(count, seed=0, batch_size=2000, progress=None):
+    """Bulk-insert `count` synthetic plants; returns their ids in creation order"""
+    rng = random.Random(seed)
+    vocab = vocabulary()
+    start = Plant.objects.filter(image_credit=SYNTHETIC_CREDIT).count()
+    for offset in range(0, count, batch_size):
+        with transaction.atomic():
+            Plant.objects.bulk_create([
+                synthetic_plant(rng, vocab, start + i)
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        if progress:
+            progress(min(offset + batch_size, count))
+    return list(
+        Plant.objects.filter(image_credit=SYNTHETIC_CREDIT).order_by('id').values_list('id', flat=True)
+    )
+
+
+def generate_users(count, plant_ids, seed=0, batch_size=2000, progress=None):
+    """Bulk-insert users with collections, saves (popular plants more often) and notes"""
+    rng = random.Random(seed + 1)
+    password = make_password(PASSWORD)
+    start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    # Zipf-like popularity: the plant at rank r is saved about 1/r as often as the first
+    popularity = rng.sample(plant_ids, len(plant_ids))
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(popularity) + 1)))
+
+    for offset in range(0, count, batch_size):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{USERNAME_PREFIX}{start + i}', email=f'{USERNAME_PREFIX}{start + i}@example.com',
+                     password=password)
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+            user_ids = list(
+                User.objects.filter(username__in=[user.username for user in users])
+                .order_by('id').values_list('id', flat=True)
+            )
+            ensure_library(user_ids)
+            UserCollection.objects.bulk_create([
+                UserCollection(user_id=user_id, name=name, description='Synthetic collection')
+                for user_id in user_ids
+                for name in rng.sample(COLLECTION_NAMES, rng.randint(0, 3))
+            ])
+            collections = defaultdict(list)
+            for user_id, collection_id in (
+                UserCollection.objects.filter(user_id__in=user_ids)
+                .order_by('user_id', '-is_default', 'id').values_list('user_id', 'id')
+            ):
+                collections[user_id].append(collection_id)
+
+            saves = []
+            for user_id in user_ids:
+                size = min(int(rng.paretovariate(1.2)) * 3, MAX_SAVES_PER_USER, len(plant_ids))
+                chosen = set()
+                for plant_id in rng.choices(popularity, cum_weights=cum_weights, k=size * 2):
+                    chosen.add(plant_id)
+                    if len(chosen) >= size:
+                        break
+                for plant_id in sorted(chosen):
+                    saves.append(SavedPlant(
+                        user_id=user_id, plant_id=plant_id, collection_id=rng.choice(collections[user_id]),
+                        is_favorite=rng.random() < 0.15,
+                    ))
+            _batched_create(SavedPlant, saves, batch_size)
+
+            saved = SavedPlant.objects.filter(user_id__in=user_ids).order_by('id').values_list('id', flat=True)
+            _batched_create(ResearchNote, (
+                ResearchNote(
+                    saved_plant_id=saved_plant_id, title=rng.choice(NOTE_TITLES),
+                    content=' '.join(rng.choices(['Observed', 'reduced', 'symptoms', 'after', 'decoction',
+                                                  'repeat', 'with', 'larger', 'sample'], k=rng.randint(10, 80))),
+                )
+                for saved_plant_id in saved.iterator()
+                if rng.random() < NOTE_RATE
+                for _ in range(rng.randint(1, 3))
+            ), batch_size)
+            recompute_counters(user_ids)
+        if progress:
+            progress(min(offset + batch_size, count))
+
+
+def rebuild_derived():
+    """bulk_create bypasses the Plant signals; rebuild what they would have maintained"""
+    rebuild_term_index()
+    rebuild_interactions()
+    build_cosaved()
+    bump_generation()
+    queue_refresh()
+
+
+def clear_synthetic():
+    """Delete synthetic users and plants (with their saves and notes); returns (plants, users)
+
+    Run rebuild_derived() afterwards: plant deletes skip the per-plant index upkeep.
+    """
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    plants = Plant.objects.filter(image_credit=SYNTHETIC_CREDIT)
+    counts = plants.count(), users.count()
+    # The profiles go with the users, so there are no counters to keep in step
+    with bulk_library_changes():
+        users.delete()
+    with bulk_changes():
+        plants.delete()
+    return counts
@@ -1,6 +1,31 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.template import engines
+from unittest import mock
+from botaniq.pagination import encode_cursor
+from jobs import runner
+from botaniq.querybudget import QueryBudgetExceeded, QueryRecorder
+from botaniq.slowqueries import normalize_sql, slow_query_log
 from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from io import BytesIO, StringIO
+from plants.models import Plant
+from plants.models import PlantTerm
+from .models import CoSavedPlant, ResearchNote, UserProfile, UserCollection, SavedPlant
+from . import benchmark, synthetic
+from .recommendations import build_cosaved, cooccurrence_counts, prune_pairs
 
 
 class DashboardTest(TestCase):
@@ -21,3 +46,597 @@ class DashboardTest(TestCase):
         self.client.login(username='testuser', password='testpass123')
         response = self.client.get(reverse('dashboard:dashboard'))
         self.assertEqual(response.status_code, 200)
+
+
+class DashboardCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.plant = Plant.objects.create(
+            common_names=["Test Plant"],
+            scientific_name="Testus plantus",
+            plant_family="Testaceae",
+            description="A test plant for testing purposes",
+            is_verified=True
+        )
+        self.collection = self.user.collections.get(is_default=True)
+
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    def test_new_user_gets_profile_and_default_collection(self):
+        """Test that registration creates the profile and default collection"""
+        profile = self.profile()
+        self.assertEqual(profile.collection_count, 1)
+        self.assertEqual(self.collection.name, 'My Research Library')
+
+    def test_counters_follow_library_changes(self):
+        """Test that saves, favorites and notes update the profile counters"""
+        saved_plant = SavedPlant.objects.create(user=self.user, plant=self.plant, collection=self.collection)
+        saved_plant.research_notes.create(title="Dosage", content="Notes")
+        saved_plant.is_favorite = True
+        saved_plant.save()
+        profile = self.profile()
+        self.assertEqual(
+            (profile.saved_count, profile.favorite_count, profile.note_count),
+            (1, 1, 1)
+        )
+
+        saved_plant.delete()
+        profile = self.profile()
+        self.assertEqual(
+            (profile.saved_count, profile.favorite_count, profile.note_count),
+            (0, 0, 0)
+        )
+
+    def test_repair_command_recomputes_counters(self):
+        """Test that the repair command rebuilds drifted counters"""
+        SavedPlant.objects.create(user=self.user, plant=self.plant, collection=self.collection, is_favorite=True)
+        UserProfile.objects.filter(user=self.user).update(saved_count=42, favorite_count=0)
+        call_command('repair_dashboard_counters', stdout=StringIO())
+        profile = self.profile()
+        self.assertEqual((profile.saved_count, profile.favorite_count), (1, 1))
+
+    def test_dashboard_query_count(self):
+        """Test that the dashboard renders in three queries after session and user lookups"""
+        SavedPlant.objects.create(user=self.user, plant=self.plant, collection=self.collection, is_favorite=True)
+        self.client.force_login(self.user)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.context['total_saved'], 1)
+        self.assertEqual(len(response.context['favorite_plants']), 1)
+
+
+class LibraryApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"],
+                scientific_name=f"Testus plantus {i}",
+                plant_family="Testaceae",
+                description="A test plant for testing purposes",
+                is_verified=True
+            )
+            for i in range(3)
+        ]
+        self.plant_ids = [plant.id for plant in self.plants]
+        self.client.force_login(self.user)
+
+    def post_json(self, name, data):
+        return self.client.post(reverse(name), data=json.dumps(data), content_type='application/json')
+
+    def test_batch_save_is_idempotent(self):
+        """Test that saving a batch twice keeps one row per plant"""
+        self.post_json('dashboard:api_save_plants', {'plant_ids': self.plant_ids[:2]})
+        response = self.post_json('dashboard:api_save_plants', {'plant_ids': self.plant_ids + [999999]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_saved'], 3)
+        self.assertEqual(data['not_found'], [999999])
+        self.assertEqual(SavedPlant.objects.filter(user=self.user).count(), 3)
+
+    def test_batch_favorite_and_remove(self):
+        """Test setting, toggling and removing favorites in batches"""
+        self.post_json('dashboard:api_save_plants', {'plant_ids': self.plant_ids})
+        data = self.post_json('dashboard:api_favorite_plants', {'plant_ids': self.plant_ids, 'favorite': True}).json()
+        self.assertEqual(data['total_favorites'], 3)
+
+        data = self.post_json('dashboard:api_favorite_plants', {'plant_ids': self.plant_ids[:1]}).json()
+        self.assertEqual(data['plants'][0]['is_favorite'], False)
+        self.assertEqual(data['total_favorites'], 2)
+
+        data = self.post_json('dashboard:api_remove_plants', {'plant_ids': self.plant_ids[1:]}).json()
+        self.assertEqual(data['removed'], 2)
+        self.assertEqual((data['total_saved'], data['total_favorites']), (1, 0))
+
+    def test_large_batches_apply_one_counter_delta(self):
+        """Test that batch saves and removals keep the counters right in a fixed number of queries"""
+        plant_ids = self.plant_ids + [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Batchus plantus {i}", plant_family="Testaceae",
+                description="A test plant", is_verified=True
+            ).id
+            for i in range(30)
+        ]
+        self.post_json('dashboard:api_save_plants', {'plant_ids': plant_ids[:10]})
+        with self.assertNumQueries(12):
+            data = self.post_json('dashboard:api_save_plants', {'plant_ids': plant_ids}).json()
+        self.assertEqual(data['total_saved'], 33)
+        self.post_json('dashboard:api_favorite_plants', {'plant_ids': plant_ids[:5], 'favorite': True})
+        for saved_plant in SavedPlant.objects.filter(user=self.user)[:3]:
+            ResearchNote.objects.create(saved_plant=saved_plant, title="Note", content="Text")
+
+        with self.assertNumQueries(12):
+            data = self.post_json('dashboard:api_remove_plants', {'plant_ids': plant_ids[:30]}).json()
+        self.assertEqual(data['removed'], 30)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.saved_count, profile.favorite_count, profile.note_count), (3, 0, 0))
+
+    def test_invalid_payload(self):
+        """Test that malformed batches are rejected"""
+        response = self.post_json('dashboard:api_save_plants', {'plant_ids': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.post_json('dashboard:api_save_plants', {'plant_ids': self.plant_ids, 'collection_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('dashboard:api_save_plants'))
+        self.assertEqual(response.status_code, 405)
+
+
+class InteractionCheckTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.collection = UserCollection.objects.get(user=self.user, is_default=True)
+        fields = [
+            {'interactions': "Blood thinners, MAOIs", 'contraindications': "Pregnancy"},
+            {'pharmacological_actions': ["Anticoagulant", "Anti-inflammatory"]},
+            {'interactions': "None documented"},
+        ]
+        for i, extra in enumerate(fields):
+            plant = Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Testus plantus {i}", plant_family="Testaceae",
+                description="A test plant", is_verified=True, **extra
+            )
+            SavedPlant.objects.create(user=self.user, plant=plant, collection=self.collection)
+        self.client.force_login(self.user)
+
+    def test_collection_check(self):
+        """Test medication and plant-plant conflicts come from the matrix in one query"""
+        url = reverse('dashboard:api_collection_interactions', args=[self.collection.id])
+        # session, user, collection, matrix
+        with self.assertNumQueries(4):
+            data = self.client.get(url, {'medications': "Warfarin, sertraline, pregnancy, Unobtainium"}).json()
+
+        self.assertEqual(data['unrecognized'], ["Unobtainium"])
+        self.assertEqual(
+            [(row['medication'], row['scientific_name'], row['concept']) for row in data['medication_conflicts']],
+            [("Warfarin", "Testus plantus 0", 'anticoagulants'), ("pregnancy", "Testus plantus 0", 'pregnancy')],
+        )
+        self.assertEqual(
+            [(row['scientific_name'], row['conflicts_with'], row['concept']) for row in data['plant_conflicts']],
+            [("Testus plantus 0", "Testus plantus 1", 'anticoagulants')],
+        )
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        other_collection = UserCollection.objects.get(user=other, is_default=True)
+        response = self.client.get(reverse('dashboard:api_collection_interactions', args=[other_collection.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class RecommendationTest(TestCase):
+    def setUp(self):
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Testus plantus {i}", plant_family="Testaceae",
+                description="A test plant", is_verified=True
+            )
+            for i in range(4)
+        ]
+        # Three researchers save plants 0 and 1 together, two of them also plant 2
+        libraries = [[0, 1, 2], [0, 1, 2], [0, 1], [3]]
+        self.users = []
+        for n, library in enumerate(libraries):
+            user = User.objects.create_user(username=f'researcher{n}', password='testpass123')
+            collection = UserCollection.objects.get(user=user, is_default=True)
+            for i in library:
+                SavedPlant.objects.create(user=user, plant=self.plants[i], collection=collection)
+            self.users.append(user)
+
+    def test_cosaved_matrix(self):
+        """Test that only pairs with enough co-saves are kept, best first"""
+        self.assertEqual(build_cosaved(), 3)
+        neighbours = CoSavedPlant.objects.filter(plant=self.plants[0]).values_list('neighbour_id', 'support')
+        self.assertEqual(list(neighbours), [(self.plants[1].id, 3), (self.plants[2].id, 2)])
+        self.assertFalse(CoSavedPlant.objects.filter(plant=self.plants[3]).exists())
+
+    def test_pair_counts_are_bounded(self):
+        """Test that the rarest pairs are pruned once too many are held, keeping the well-supported ones"""
+        pairs, saves = cooccurrence_counts()
+        self.assertEqual(sum(len(row) for row in pairs.values()), 3)
+        pairs, saves = cooccurrence_counts(max_pairs=2)
+        self.assertLessEqual(sum(len(row) for row in pairs.values()), 2)
+        self.assertEqual(saves[self.plants[0].id], 3)
+        self.assertEqual(prune_pairs({1: Counter({2: 1, 3: 2}), 4: Counter({5: 1})}, 2), 1)
+
+    def test_stale_suggestions_are_cleared(self):
+        """Test that rebuilding clears suggestions only for users who no longer get any"""
+        UserProfile.objects.filter(user=self.users[0]).update(recommendations=[{'neighbour_id': 0}])
+        SavedPlant.objects.filter(user=self.users[0]).delete()
+        build_cosaved()
+        self.assertEqual(UserProfile.objects.get(user=self.users[0]).recommendations, [])
+
+    def test_dashboard_suggestions(self):
+        """Test that suggestions exclude the user's own library"""
+        build_cosaved()
+        self.client.force_login(self.users[2])
+        response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual([row['neighbour_id'] for row in response.context['recommended_plants']], [self.plants[2].id])
+        self.assertContains(response, "Researchers Also Saved")
+
+        # Saved since the matrix was built
+        collection = UserCollection.objects.get(user=self.users[2], is_default=True)
+        SavedPlant.objects.create(user=self.users[2], plant=self.plants[2], collection=collection)
+        response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.context['recommended_plants'], [])
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.collection = UserCollection.objects.get(user=self.user, is_default=True)
+        for i in range(4):
+            plant = Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Testus plantus {i}", plant_family="Testaceae",
+                description="A test plant", is_verified=True
+            )
+            SavedPlant.objects.create(user=self.user, plant=plant, collection=self.collection)
+
+    def test_n_plus_one_is_traced_to_the_template_line(self):
+        """Test that a related lookup missing select_related is reported with its template line"""
+        template = engines['django'].from_string(
+            "{% for saved_plant in saved_plants %}\n{{ saved_plant.plant.scientific_name }}\n{% endfor %}"
+        )
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            template.render({'saved_plants': SavedPlant.objects.filter(user=self.user)})
+        [(shape, times, origin)] = recorder.repeated()
+        self.assertEqual(times, 4)
+        self.assertIn('"plants_plant"', shape)
+        self.assertTrue(origin.endswith(':2'), origin)
+
+    def test_budget_is_enforced(self):
+        """Test that a view exceeding its declared budget fails under QUERY_BUDGETS='raise'"""
+        self.client.force_login(self.user)
+        with mock.patch('dashboard.views.dashboard.query_budget', 3):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "dashboard:dashboard ran 5 queries; its budget is 3"):
+                self.client.get(reverse('dashboard:dashboard'))
+        with override_settings(QUERY_BUDGETS='warn'), mock.patch('dashboard.views.dashboard.query_budget', 3):
+            with self.assertLogs('botaniq.querybudget', level='WARNING'):
+                self.assertEqual(self.client.get(reverse('dashboard:dashboard')).status_code, 200)
+
+    def test_views_without_a_budget_are_reported(self):
+        """Test that a project view with no declared budget fails under QUERY_BUDGETS='raise'"""
+        self.client.force_login(self.user)
+        with mock.patch('dashboard.views.dashboard.query_budget', None):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "dashboard:dashboard declares no query budget"):
+                self.client.get(reverse('dashboard:dashboard'))
+
+    def test_library_pages_fit_their_budgets(self):
+        """Test that the save/remove redirects and profile settings stay within their budgets"""
+        self.client.force_login(self.user)
+        plant = Plant.objects.create(
+            common_names=["Extra"], scientific_name="Testus extra", plant_family="Testaceae", is_verified=True
+        )
+        self.client.get(reverse('dashboard:save_plant', args=[plant.id]))
+        self.assertTrue(SavedPlant.objects.filter(user=self.user, plant=plant).exists())
+        self.client.get(reverse('dashboard:save_plant', args=[plant.id]))
+        self.client.get(reverse('dashboard:remove_plant', args=[plant.id]))
+        self.assertFalse(SavedPlant.objects.filter(user=self.user, plant=plant).exists())
+        self.assertEqual(self.client.get(reverse('dashboard:profile_settings')).status_code, 200)
+        response = self.client.post(reverse('dashboard:profile_settings'), {'email': 'researcher@example.com', 'bio': 'Adaptogens'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_admin_lists_fit_their_budgets(self):
+        """Test that the staff plant and user lists cost the same few queries however many rows they show"""
+        staff = User.objects.create_user(username='curator', password='testpass123', is_staff=True)
+        for i in range(5):
+            User.objects.create_user(username=f'reader{i}', password='testpass123')
+        self.client.force_login(staff)
+        for name in ['admin_plants', 'admin_users', 'admin_add_plant', 'admin_slow_queries']:
+            self.assertEqual(self.client.get(reverse(f'dashboard:{name}')).status_code, 200, name)
+        plant = Plant.objects.first()
+        response = self.client.get(reverse('dashboard:admin_edit_plant', args=[plant.id]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('dashboard:admin_edit_plant', args=[plant.id]), {
+            'scientific_name': plant.scientific_name, 'common_names': 'Renamed', 'plant_family': 'Testaceae',
+            'description': 'A test plant', 'is_verified': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Plant.objects.get(pk=plant.pk).common_names, ['Renamed'])
+
+    def test_login_and_register_fit_their_budgets(self):
+        """Test that signing in and registering stay within their budgets"""
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+        response = self.client.post(reverse('login'), {'username': 'researcher', 'password': 'testpass123'})
+        self.assertRedirects(response, reverse('dashboard:dashboard'), fetch_redirect_response=False)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('register')).status_code, 200)
+        response = self.client.post(reverse('register'), {
+            'username': 'newcomer', 'email': 'new@example.com', 'phone_number': '+254 700 000 000',
+            'location': 'Nairobi', 'password1': 'a-Long-pass-123', 'password2': 'a-Long-pass-123',
+        })
+        self.assertRedirects(response, reverse('dashboard:dashboard'), fetch_redirect_response=False)
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.staff = User.objects.create_user(username='curator', password='testpass123', is_staff=True)
+        self.collection = UserCollection.objects.get(user=self.user, is_default=True)
+        plant = Plant.objects.create(
+            common_names=["Plant"], scientific_name="Testus plantus", plant_family="Testaceae",
+            description="A test plant", is_verified=True
+        )
+        SavedPlant.objects.create(user=self.user, plant=plant, collection=self.collection)
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+
+    def test_normalize_sql(self):
+        """Test that queries differing only in IN lists, limits and spacing group together"""
+        self.assertEqual(
+            normalize_sql('SELECT *  FROM t\n WHERE id IN (%s, %s) LIMIT 21'),
+            normalize_sql('SELECT * FROM t WHERE id IN (%s) LIMIT 3'),
+        )
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_plans(self):
+        """Test that queries over the threshold are grouped by view with an EXPLAIN plan"""
+        self.client.force_login(self.user)
+        url = reverse('dashboard:collection_detail', args=[self.collection.id])
+        with self.assertLogs('botaniq.slowqueries', level='WARNING'):
+            self.client.get(url)
+            self.client.get(url)
+        entries = slow_query_log.snapshot()
+        saved = next(e for e in entries if e['sql'].startswith('SELECT "dashboard_savedplant"."id"'))
+        self.assertEqual(saved['views'], {'dashboard:collection_detail': 2})
+        self.assertEqual(saved['count'], 2)
+        self.assertIn('dashboard_savedplant', saved['plan'])
+        self.assertFalse(saved['analyzed'])
+        self.assertTrue(saved['origin'].startswith('botaniq/pagination.py'), saved['origin'])
+
+    def test_log_is_staff_only_and_downloadable(self):
+        """Test that staff can read and download the log"""
+        slow_query_log.record('SELECT 1', 250.0, 'plants:plant_list', 'plants/views.py:1 in plant_list')
+        url = reverse('dashboard:admin_slow_queries')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(url), 'plants:plant_list')
+        response = self.client.get(url, {'format': 'json'})
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(response.json()[0]['max_ms'], 250.0)
+
+
+class SyntheticDataTest(TestCase):
+    def test_generator_is_deterministic_and_consistent(self):
+        """Test that a seed always yields the same catalogue and libraries with correct counters"""
+        call_command('generate_synthetic_data', plants=40, users=5, seed=3, stdout=StringIO())
+        self.assertEqual(Plant.objects.filter(image_credit=synthetic.SYNTHETIC_CREDIT).count(), 40)
+        first = list(SavedPlant.objects.order_by('id').values_list('user__username', 'plant__scientific_name'))
+        self.assertTrue(first)
+        for profile in UserProfile.objects.filter(user__username__startswith=synthetic.USERNAME_PREFIX):
+            self.assertEqual(profile.saved_count, SavedPlant.objects.filter(user=profile.user).count())
+        self.assertTrue(PlantTerm.objects.exists())
+
+        with CaptureQueriesContext(connection) as captured:
+            synthetic.clear_synthetic()
+        self.assertFalse(User.objects.filter(username__startswith=synthetic.USERNAME_PREFIX).exists())
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "dashboard_userprofile"') for q in captured), 0)
+
+        call_command('generate_synthetic_data', plants=40, users=5, seed=3, clear=True, stdout=StringIO())
+        again = list(SavedPlant.objects.order_by('id').values_list('user__username', 'plant__scientific_name'))
+        self.assertEqual(again, first)
+
+    def test_benchmark_reports_and_compares(self):
+        """Test that run_benchmarks reports every case and finds no regression against itself"""
+        call_command('generate_synthetic_data', plants=30, users=3, seed=1, stdout=StringIO())
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        path = f'{output_dir}/baseline.json'
+        call_command('run_benchmarks', requests=3, output=path, stdout=StringIO(), stderr=StringIO())
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['cases']), set(benchmark.CASES))
+        self.assertEqual(report['cases']['dashboard']['queries_max'], 5)
+        self.assertFalse(User.objects.filter(username=benchmark.STAFF_USERNAME).exists())
+        self.assertFalse(Session.objects.exists())
+        for result in report['cases'].values():
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+        stdout = StringIO()
+        call_command('run_benchmarks', requests=3, case=['plant_detail'], baseline=path, tolerance=100,
+                     fail_on_regression=True, stdout=stdout, stderr=StringIO())
+        self.assertIn('No regressions', stdout.getvalue())
+        worse = {'dashboard': {**report['cases']['dashboard'], 'queries_max': 0}}
+        self.assertEqual(len(benchmark.compare(report['cases'], worse)), 1)
+
+
+class CollectionDetailTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.collection = self.user.collections.get(is_default=True)
+        for i in range(30):
+            plant = Plant.objects.create(
+                common_names=[f"Plant {i}"],
+                scientific_name=f"Testus plantus {i:02d}",
+                plant_family="Testaceae" if i % 2 else "Amaceae",
+                description="A test plant for testing purposes",
+                is_verified=True
+            )
+            saved_plant = SavedPlant.objects.create(user=self.user, plant=plant, collection=self.collection)
+            for n in range(i % 3):
+                saved_plant.research_notes.create(title=f"Note {n}", content="Observation " * 50)
+        self.client.force_login(self.user)
+
+    def test_keyset_pages_cover_collection_once(self):
+        """Test that following next cursors visits every plant exactly once"""
+        url = reverse('dashboard:collection_detail', args=[self.collection.id])
+        seen = []
+        response = self.client.get(url, {'sort': 'name'})
+        while True:
+            seen.extend(sp.plant.scientific_name for sp in response.context['saved_plants'])
+            if not response.context['next_cursor']:
+                break
+            response = self.client.get(url, {'sort': 'name', 'after': response.context['next_cursor']})
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+
+    def test_note_annotations_use_constant_queries(self):
+        """Test that note counts and excerpts don't add a query per plant"""
+        url = reverse('dashboard:collection_detail', args=[self.collection.id])
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'sort': 'family'})
+        saved_plant = next(sp for sp in response.context['saved_plants'] if sp.note_count == 2)
+        self.assertEqual(saved_plant.latest_note_title, "Note 1")
+        self.assertLessEqual(len(saved_plant.latest_note_excerpt), 200)
+
+    def test_bad_cursor_restarts_listing(self):
+        """Test that a tampered cursor redirects to the first page"""
+        url = reverse('dashboard:collection_detail', args=[self.collection.id])
+        response = self.client.get(url, {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 302)
+        # Well-formed but of the wrong types for the recent ordering
+        response = self.client.get(url, {'after': encode_cursor(["notadate", "abc"])})
+        self.assertEqual(response.status_code, 302)
+
+
+class QueryPlanTest(TestCase):
+    """EXPLAIN the hot queries and fail if they stop using their index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.since = timezone.now() - timedelta(days=30)
+        if connection.vendor == 'postgresql':
+            # Tiny test tables always favour a sequential scan otherwise
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in plan:\n{plan}")
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, r'(?m)SCAN \w+$', f"Full table scan in plan:\n{plan}")
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+
+    def test_public_plant_listing(self):
+        self.assertUsesIndex(Plant.objects.filter(is_verified=True), 'plant_verified_name_idx')
+
+    def test_plant_recency(self):
+        self.assertUsesIndex(Plant.objects.order_by('-created_at')[:8], 'plant_created_at_idx')
+        self.assertUsesIndex(Plant.objects.filter(created_at__gte=self.since).order_by(), 'plant_created_at_idx')
+
+    def test_user_recency(self):
+        self.assertUsesIndex(User.objects.order_by('-date_joined')[:8], 'auth_user_date_joined_idx')
+        self.assertUsesIndex(User.objects.filter(date_joined__gte=self.since).order_by(), 'auth_user_date_joined_idx')
+
+    def test_saved_plant_access_paths(self):
+        self.assertUsesIndex(
+            SavedPlant.objects.filter(user=self.user).order_by('-date_saved')[:10], 'savedplant_user_date_idx'
+        )
+        self.assertUsesIndex(
+            SavedPlant.objects.filter(date_saved__gte=self.since).order_by(), 'savedplant_date_saved_idx'
+        )
+        collection = self.user.collections.get(is_default=True)
+        self.assertUsesIndex(
+            SavedPlant.objects.filter(user=self.user, collection=collection).order_by('-date_saved'),
+            'savedplant_user_coll_date_idx'
+        )
+
+    def test_default_collection_lookup(self):
+        self.assertUsesIndex(
+            UserCollection.objects.filter(user=self.user, is_default=True), 'collection_user_default_idx'
+        )
+
+
+@override_settings(JOBS_BACKEND='sync')
+class LibraryExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        self.collection = self.user.collections.get(is_default=True)
+        for i in range(3):
+            plant = Plant.objects.create(
+                common_names=[f"Plant {i}"],
+                scientific_name=f"Testus plantus {i}",
+                plant_family="Testaceae",
+                description="A test plant for testing purposes",
+                is_verified=True
+            )
+            saved_plant = SavedPlant.objects.create(
+                user=self.user, plant=plant, collection=self.collection, notes=f"Field notes {i}"
+            )
+            saved_plant.research_notes.create(title="Dosage", content=f"Observation {i}")
+        self.client.force_login(self.user)
+        self.job_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.job_root)
+
+    def test_ndjson_export_includes_notes(self):
+        """Test that each saved plant is exported with its research notes"""
+        response = self.client.get(reverse('dashboard:export_library'), {'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['research_notes'][0]['title'], "Dosage")
+        self.assertEqual(rows[0]['collection'], "My Research Library")
+
+    def test_markdown_bundle(self):
+        """Test that the Markdown export is a valid zip with one file per plant"""
+        response = self.client.get(reverse('dashboard:export_library'), {
+            'format': 'markdown', 'collection': self.collection.id
+        })
+        bundle = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(bundle.namelist()), 3)
+        content = bundle.read('My-Research-Library/Testus-plantus-0.md').decode()
+        self.assertIn("## Dosage", content)
+        self.assertIn("Field notes 0", content)
+
+    def test_markdown_bundle_names_never_collide(self):
+        """Test that collections whose names slug to the same folder each keep their own files"""
+        spaced = UserCollection.objects.create(user=self.user, name="A B")
+        slashed = UserCollection.objects.create(user=self.user, name="A/B")
+        SavedPlant.objects.filter(plant__scientific_name="Testus plantus 0").update(collection=spaced)
+        SavedPlant.objects.filter(plant__scientific_name="Testus plantus 1").update(collection=slashed)
+        plant = Plant.objects.create(
+            common_names=["Queried"], scientific_name="Testus plantus 0?", plant_family="Testaceae", is_verified=True
+        )
+        SavedPlant.objects.create(user=self.user, plant=plant, collection=spaced)
+        response = self.client.get(reverse('dashboard:export_library'), {'format': 'markdown'})
+        bundle = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(bundle.namelist()), [
+            'A-B-2/Testus-plantus-1.md', 'A-B/Testus-plantus-0-2.md', 'A-B/Testus-plantus-0.md',
+            'My-Research-Library/Testus-plantus-2.md',
+        ])
+        self.assertIn("Collection: A/B", bundle.read('A-B-2/Testus-plantus-1.md').decode())
+
+    def test_background_export_with_download_link(self):
+        """Test that background exports report progress and can be downloaded"""
+        with self.settings(JOB_FILES_ROOT=self.job_root):
+            response = self.client.get(reverse('dashboard:export_library'), {'format': 'csv', 'background': 1})
+            self.assertEqual(response.status_code, 202)
+            status = self.client.get(response.json()['status_url']).json()
+            self.assertEqual(status['status'], 'succeeded')
+            self.assertEqual(status['progress']['rows'], 3)
+            download = self.client.get(status['download_url'])
+            rows = list(csv.DictReader(b''.join(download.streaming_content).decode().splitlines()))
+            self.assertEqual(runner.purge_job_files(), 0)
+            job_dir = os.path.join(self.job_root, response.json()['id'])
+            os.utime(job_dir, (0, 0))
+            self.assertEqual(runner.purge_job_files(), 1)
+            self.assertEqual(self.client.get(status['download_url']).status_code, 404)
+        self.assertEqual([row['scientific_name'] for row in rows], [f"Testus plantus {i}" for i in range(3)])
+
+    def test_bad_collection_is_rejected(self):
+        """Test that a non-numeric collection parameter is a 400, not a server error"""
+        response = self.client.get(reverse('dashboard:export_library'), {'collection': 'abc'})
+        self.assertEqual(response.status_code, 400)
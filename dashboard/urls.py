@@ -11,6 +11,14 @@ urlpatterns = [
     path('remove/<int:plant_id>/', views.remove_plant, name='remove_plant'),
     path('collection/<int:collection_id>/', views.collection_detail, name='collection_detail'),
     path('favorite/<int:plant_id>/', views.toggle_favorite, name='toggle_favorite'),
+    path('export/', views.export_library, name='export_library'),
+
+    # JSON API (batch operations)
+    path('api/save/', views.api_save_plants, name='api_save_plants'),
+    path('api/remove/', views.api_remove_plants, name='api_remove_plants'),
+    path('api/favorite/', views.api_favorite_plants, name='api_favorite_plants'),
+    path('api/collections/<int:collection_id>/interactions/', views.api_collection_interactions,
+         name='api_collection_interactions'),
 
     # Admin Dashboard
     path('admin/', views.admin_dashboard, name='admin_dashboard'),
@@ -18,4 +26,5 @@ urlpatterns = [
     path('admin/plants/add/', views.admin_add_plant, name='admin_add_plant'),
     path('admin/plants/<int:plant_id>/edit/', views.admin_edit_plant, name='admin_edit_plant'),
     path('admin/users/', views.admin_users, name='admin_users'),
+    path('admin/slow-queries/', views.admin_slow_queries, name='admin_slow_queries'),
 ]
@@ -1,12 +1,30 @@
+import json
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from .models import UserCollection, SavedPlant, ResearchNote, UserProfile
+from .counters import adjust_counters, count_subquery
+from .signals import bulk_library_changes
+from botaniq.pagination import InvalidCursor, keyset_page
+from botaniq.querybudget import query_budget
+from botaniq.slowqueries import slow_query_log
+from jobs.runner import submit as submit_job
+from jobs.views import job_payload
+from . import library_export
+from plants.images import save_upload
+from plants.interactions import check_interactions
 from plants.models import Plant
+from plants.searchlog import search_rollup
 from .forms import UserProfileForm
 from django.core.paginator import Paginator
 
+@query_budget(5)
 @login_required
 def dashboard(request):
     """Main user dashboard - redirects staff to admin dashboard"""
@@ -16,44 +34,43 @@ def dashboard(request):
     if user.is_staff:
         return redirect('dashboard:admin_dashboard')
 
-    # Get or create default collection
-    default_collection, created = UserCollection.objects.get_or_create(
-        user=user,
-        is_default=True,
-        defaults={'name': 'My Research Library', 'description': 'Your main collection of saved plants'}
-    )
+    # Statistics come from the denormalized profile counters
+    profile, created = UserProfile.objects.get_or_create(user=user)
 
     # Get user's collections
-    collections = UserCollection.objects.filter(user=user).annotate(
+    collections = list(UserCollection.objects.filter(user=user).annotate(
         plant_count=Count('plants')
-    ).order_by('-is_default', '-updated_at')
-
-    # Get recent saved plants
-    recent_plants = SavedPlant.objects.filter(user=user).select_related(
-        'plant', 'collection'
-    ).order_by('-date_saved')[:10]
-
-    # Get favorite plants
-    favorite_plants = SavedPlant.objects.filter(
-        user=user, is_favorite=True
-    ).select_related('plant', 'collection')[:6]
-
-    # Statistics
-    total_saved = SavedPlant.objects.filter(user=user).count()
-    total_collections = collections.count()
-    total_notes = ResearchNote.objects.filter(saved_plant__user=user).count()
+    ).order_by('-is_default', '-updated_at'))
+
+    # Recent and favorite plants are fetched together and split in Python
+    saved = SavedPlant.objects.filter(user=user).order_by('-date_saved', '-id')
+    recent_ids = saved.values('id')[:10]
+    favorite_ids = saved.filter(is_favorite=True).values('id')[:6]
+    saved_plants = list(saved.filter(
+        Q(id__in=recent_ids) | Q(id__in=favorite_ids)
+    ).select_related('plant', 'collection'))
+    recent_plants = saved_plants[:10]
+    favorite_plants = [saved_plant for saved_plant in saved_plants if saved_plant.is_favorite][:6]
+    # Precomputed with the co-save matrix; drop anything saved since it was built
+    saved_ids = {saved_plant.plant_id for saved_plant in saved_plants}
+    recommended_plants = [
+        suggestion for suggestion in profile.recommendations if suggestion['neighbour_id'] not in saved_ids
+    ][:6]
 
     context = {
         'collections': collections,
         'recent_plants': recent_plants,
         'favorite_plants': favorite_plants,
-        'total_saved': total_saved,
-        'total_collections': total_collections,
-        'total_notes': total_notes,
+        'recommended_plants': recommended_plants,
+        'total_saved': profile.saved_count,
+        'total_collections': profile.collection_count,
+        'total_notes': profile.note_count,
+        'total_favorites': profile.favorite_count,
     }
     return render(request, 'dashboard/dashboard.html', context)
 
 
+@query_budget(9)
 @login_required
 def save_plant(request, plant_id):
     """Save a plant to user's default collection"""
@@ -63,7 +80,7 @@ def save_plant(request, plant_id):
     collection, created = UserCollection.objects.get_or_create(
         user=request.user,
         is_default=True,
-        defaults={'name': 'My Research Library', 'description': 'Your main collection of saved plants'}
+        defaults=UserCollection.DEFAULT_FIELDS
     )
 
     # Save plant if not already saved
@@ -81,6 +98,7 @@ def save_plant(request, plant_id):
     return redirect('plants:plant_detail', scientific_name=plant.scientific_name)
 
 
+@query_budget(7)
 @login_required
 def remove_plant(request, plant_id):
     """Remove a saved plant"""
@@ -90,30 +108,275 @@ def remove_plant(request, plant_id):
     return redirect('dashboard:dashboard')
 
 
+COLLECTION_SORTS = {
+    'recent': [('date_saved', True), ('id', True)],
+    'name': [('plant__scientific_name', False), ('id', False)],
+    'family': [('plant__plant_family', False), ('plant__scientific_name', False), ('id', False)],
+    'favorite': [('is_favorite', True), ('date_saved', True), ('id', True)],
+}
+COLLECTION_PAGE_SIZE = 24
+
+
+@query_budget(5)
 @login_required
 def collection_detail(request, collection_id):
-    """View plants in a specific collection"""
+    """View plants in a specific collection, one keyset page at a time"""
     collection = get_object_or_404(UserCollection, id=collection_id, user=request.user)
+
+    sort = request.GET.get('sort', 'recent')
+    if sort not in COLLECTION_SORTS:
+        sort = 'recent'
+
+    latest_note = ResearchNote.objects.filter(saved_plant=OuterRef('pk')).order_by('-created_at', '-id')
     saved_plants = SavedPlant.objects.filter(
         user=request.user, collection=collection
-    ).select_related('plant').order_by('-date_saved')
+    ).select_related('plant').annotate(
+        note_count=count_subquery(ResearchNote.objects.filter(saved_plant=OuterRef('pk'))),
+        latest_note_title=Subquery(latest_note.values('title')[:1]),
+        latest_note_excerpt=Subquery(latest_note.values(excerpt=Substr('content', 1, 200))[:1]),
+    )
+
+    try:
+        page, next_cursor = keyset_page(
+            saved_plants, COLLECTION_SORTS[sort], request.GET.get('after'), COLLECTION_PAGE_SIZE
+        )
+    except InvalidCursor:
+        return redirect(f"{request.path}?sort={sort}")
 
     context = {
         'collection': collection,
-        'saved_plants': saved_plants,
+        'saved_plants': page,
+        'plant_count': SavedPlant.objects.filter(user=request.user, collection=collection).count(),
+        'sort': sort,
+        'sorts': list(COLLECTION_SORTS),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
     }
     return render(request, 'dashboard/collection_detail.html', context)
 
 
+LIBRARY_EXPORT_INLINE_LIMIT = 2000
+
+
+@query_budget(16)
+@login_required
+def export_library(request):
+    """Export the user's library (or one collection) as NDJSON, CSV or a Markdown zip
+
+    Small exports stream straight back; large ones (or ?background=1) run as
+    a background job and answer 202 with status and download links.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in library_export.FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(library_export.FORMATS)}"}, status=400)
+
+    collection = None
+    if request.GET.get('collection'):
+        try:
+            collection_id = int(request.GET['collection'])
+        except ValueError:
+            return JsonResponse({'error': 'collection must be an integer'}, status=400)
+        collection = get_object_or_404(UserCollection, id=collection_id, user=request.user)
+        size = SavedPlant.objects.filter(collection=collection).count()
+    else:
+        size = UserProfile.objects.get_or_create(user=request.user)[0].saved_count
+
+    if request.GET.get('background') or size > LIBRARY_EXPORT_INLINE_LIMIT:
+        job = submit_job('library_export', {
+            'format': fmt, 'collection_id': collection.id if collection else None
+        }, user=request.user)
+        return JsonResponse(job_payload(job), status=202)
+
+    content_type, extension = library_export.FORMATS[fmt]
+    response = StreamingHttpResponse(
+        library_export.export_blocks(request.user, fmt, collection.id if collection else None),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="botaniq-library.{extension}"'
+    return response
+
+
+@query_budget(8)
 @login_required
 def toggle_favorite(request, plant_id):
     """Toggle favorite status of a saved plant"""
-    saved_plant = get_object_or_404(SavedPlant, user=request.user, plant_id=plant_id)
-    saved_plant.is_favorite = not saved_plant.is_favorite
-    saved_plant.save()
+    saved_plant = SavedPlant.objects.filter(user=request.user, plant_id=plant_id)
+    if not saved_plant.exists():
+        raise Http404('Plant is not in your library')
+    _toggle_favorites(request.user, saved_plant)
     return redirect('dashboard:dashboard')
 
 
+def _toggle_favorites(user, saved_plants):
+    """Flip is_favorite with single-statement UPDATEs and keep the counter exact"""
+    favorited = list(saved_plants.filter(is_favorite=False).values_list('id', flat=True))
+    unfavorited = saved_plants.filter(is_favorite=True).update(is_favorite=False)
+    favorited = SavedPlant.objects.filter(id__in=favorited, is_favorite=False).update(is_favorite=True)
+    adjust_counters(UserProfile.objects.filter(user=user), favorite=favorited - unfavorited)
+
+
+# JSON API for the research library
+MAX_BATCH_SIZE = 500
+MAX_MEDICATIONS = 50
+
+
+def _plant_ids(request):
+    """Read plant ids from a JSON body or repeated plant_ids form fields"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ValueError('Request body is not valid JSON')
+        if not isinstance(data, dict):
+            raise ValueError('Request body must be a JSON object')
+        raw_ids = data.get('plant_ids', [])
+    else:
+        data = request.POST
+        raw_ids = request.POST.getlist('plant_ids')
+
+    if not isinstance(raw_ids, list):
+        raise ValueError('plant_ids must be a list')
+    try:
+        plant_ids = sorted({int(plant_id) for plant_id in raw_ids})
+    except (TypeError, ValueError):
+        raise ValueError('plant_ids must be integers')
+    if not plant_ids:
+        raise ValueError('No plant_ids given')
+    if len(plant_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} plants per request')
+    return plant_ids, data
+
+
+def _library_state(user, plant_ids):
+    """Saved/favorite state of the given plants plus the profile counters"""
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    return {
+        'plants': [
+            {'plant_id': plant_id, 'collection_id': collection_id, 'is_favorite': is_favorite}
+            for plant_id, collection_id, is_favorite in SavedPlant.objects.filter(
+                user=user, plant_id__in=plant_ids
+            ).order_by('plant_id').values_list('plant_id', 'collection_id', 'is_favorite')
+        ],
+        'total_saved': profile.saved_count,
+        'total_favorites': profile.favorite_count,
+    }
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def api_save_plants(request):
+    """Save a batch of plants to a collection (the default one unless collection_id is given)"""
+    try:
+        plant_ids, data = _plant_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    collection_id = data.get('collection_id')
+    if collection_id:
+        try:
+            collection_id = int(collection_id)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'collection_id must be an integer'}, status=400)
+        collection = UserCollection.objects.filter(id=collection_id, user=request.user).first()
+        if collection is None:
+            return JsonResponse({'error': 'Collection not found'}, status=404)
+    else:
+        collection, created = UserCollection.objects.get_or_create(
+            user=request.user,
+            is_default=True,
+            defaults=UserCollection.DEFAULT_FIELDS
+        )
+
+    valid_ids = list(Plant.objects.filter(id__in=plant_ids, is_verified=True).values_list('id', flat=True))
+    saved = SavedPlant.objects.filter(user=request.user, plant_id__in=valid_ids)
+    with transaction.atomic():
+        # bulk_create skips signals and can't report ignored rows, so count what it added
+        before = saved.count()
+        SavedPlant.objects.bulk_create(
+            [SavedPlant(user=request.user, plant_id=plant_id, collection=collection) for plant_id in valid_ids],
+            ignore_conflicts=True
+        )
+        adjust_counters(UserProfile.objects.filter(user=request.user), saved=saved.count() - before)
+
+    state = _library_state(request.user, plant_ids)
+    state['not_found'] = sorted(set(plant_ids) - set(valid_ids))
+    return JsonResponse(state)
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def api_remove_plants(request):
+    """Remove a batch of plants from the user's library"""
+    try:
+        plant_ids, data = _plant_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    with transaction.atomic():
+        rows = list(SavedPlant.objects.select_for_update().filter(
+            user=request.user, plant_id__in=plant_ids
+        ).values_list('id', 'is_favorite'))
+        with bulk_library_changes():
+            total, per_model = SavedPlant.objects.filter(id__in=[pk for pk, favorite in rows]).delete()
+        removed = per_model.get(SavedPlant._meta.label, 0)
+        adjust_counters(
+            UserProfile.objects.filter(user=request.user),
+            saved=-removed,
+            favorite=-sum(favorite for pk, favorite in rows),
+            note=-per_model.get(ResearchNote._meta.label, 0),
+        )
+
+    state = _library_state(request.user, plant_ids)
+    state['removed'] = removed
+    return JsonResponse(state)
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def api_favorite_plants(request):
+    """Set (favorite=true/false) or toggle (no favorite key) favorites for a batch of saved plants"""
+    try:
+        plant_ids, data = _plant_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    saved_plants = SavedPlant.objects.filter(user=request.user, plant_id__in=plant_ids)
+    favorite = data.get('favorite')
+    with transaction.atomic():
+        if favorite is None or favorite == '':
+            _toggle_favorites(request.user, saved_plants)
+        else:
+            favorite = favorite in (True, 'true', '1', 'on')
+            changed = saved_plants.filter(is_favorite=not favorite).update(is_favorite=favorite)
+            adjust_counters(UserProfile.objects.filter(user=request.user),
+                            favorite=changed if favorite else -changed)
+
+    return JsonResponse(_library_state(request.user, plant_ids))
+
+
+@query_budget(4)
+@login_required
+def api_collection_interactions(request, collection_id):
+    """Check a collection against ?medications=warfarin,sertraline (conditions work too)
+
+    Reads the precomputed interaction matrix; also reports saved plants that
+    conflict with each other.
+    """
+    collection = get_object_or_404(UserCollection, id=collection_id, user=request.user)
+    medications = [
+        name.strip() for value in request.GET.getlist('medications') for name in value.split(',') if name.strip()
+    ]
+    if len(medications) > MAX_MEDICATIONS:
+        return JsonResponse({'error': f'At most {MAX_MEDICATIONS} medications per request'}, status=400)
+
+    plants = Plant.objects.filter(saved_by__collection=collection)
+    return JsonResponse({'collection_id': collection.id, **check_interactions(plants, medications)})
+
+
+@query_budget(6)
 @login_required
 def profile_settings(request):
     """User profile and account settings"""
@@ -141,6 +404,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from .forms import PlantForm
 
+@query_budget(40)
 @staff_member_required
 def admin_dashboard(request):
     """Admin dashboard for content management"""
@@ -227,47 +491,73 @@ def admin_dashboard(request):
         'plants_without_description': plants_without_description,
         'plants_without_uses': plants_without_uses,
 
+        # Search analytics
+        'search_stats': search_rollup(),
+
         # Recent items
         'recent_plants': Plant.objects.order_by('-created_at')[:8],
         'recent_users': User.objects.order_by('-date_joined')[:8],
     }
     return render(request, 'dashboard/admin_dashboard.html', context)
 
+@query_budget(3)
 @staff_member_required
 def admin_plants(request):
     """Manage plants in admin dashboard"""
     plants = Plant.objects.all().order_by('-created_at')
     return render(request, 'dashboard/admin_plants.html', {'plants': plants})
 
+@query_budget(20)
 @staff_member_required
 def admin_add_plant(request):
     """Add new plant via admin dashboard"""
     if request.method == 'POST':
-        form = PlantForm(request.POST)
+        form = PlantForm(request.POST, request.FILES)
         if form.is_valid():
             plant = form.save()
+            if form.cleaned_data['image_upload']:
+                save_upload(plant.pk, form.cleaned_data['image_upload'])
             messages.success(request, f'Plant "{plant.get_primary_common_name()}" added successfully!')
             return redirect('dashboard:admin_plants')
     else:
         form = PlantForm()
     return render(request, 'dashboard/admin_add_plant.html', {'form': form})
 
+@query_budget(20)
 @staff_member_required
 def admin_edit_plant(request, plant_id):
     """Edit plant via admin dashboard"""
     plant = get_object_or_404(Plant, id=plant_id)
     if request.method == 'POST':
-        form = PlantForm(request.POST, instance=plant)
+        form = PlantForm(request.POST, request.FILES, instance=plant)
         if form.is_valid():
             form.save()
+            if form.cleaned_data['image_upload']:
+                save_upload(plant.pk, form.cleaned_data['image_upload'])
             messages.success(request, f'Plant "{plant.get_primary_common_name()}" updated successfully!')
             return redirect('dashboard:admin_plants')
     else:
         form = PlantForm(instance=plant)
     return render(request, 'dashboard/admin_edit_plant.html', {'form': form, 'plant': plant})
 
+@query_budget(3)
 @staff_member_required
 def admin_users(request):
     """Manage users in admin dashboard"""
     users = User.objects.all().order_by('-date_joined')
     return render(request, 'dashboard/admin_users.html', {'users': users})
+
+@query_budget(2)
+@staff_member_required
+def admin_slow_queries(request):
+    """Slow queries seen by this worker, with their plans; ?format=json downloads them"""
+    entries = slow_query_log.snapshot()
+    if request.GET.get('format') == 'json':
+        response = JsonResponse(entries, safe=False, json_dumps_params={'indent': 2})
+        response['Content-Disposition'] = 'attachment; filename="slow_queries.json"'
+        return response
+    return render(request, 'dashboard/admin_slow_queries.html', {
+        'entries': entries,
+        'threshold_ms': settings.SLOW_QUERY_MS,
+        'enabled': settings.SLOW_QUERIES,
+    })
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'user', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['id', 'created_at', 'started_at', 'finished_at']
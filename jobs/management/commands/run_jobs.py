@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from jobs.runner import purge_job_files, reclaim_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (use with JOBS_BACKEND=worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        purged_at = reclaimed_at = 0
+        while True:
+            if time.monotonic() - reclaimed_at > 60:
+                reclaimed = reclaim_stale_jobs()
+                if reclaimed:
+                    self.stdout.write(f"Failed {reclaimed} stale jobs")
+                reclaimed_at = time.monotonic()
+            if time.monotonic() - purged_at > 3600:
+                purged = purge_job_files()
+                if purged:
+                    self.stdout.write(f"Deleted the files of {purged} expired jobs")
+                purged_at = time.monotonic()
+            job = run_job()
+            if job is not None:
+                self.stdout.write(f"{job.kind} {job.pk}: {job.status}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll'])
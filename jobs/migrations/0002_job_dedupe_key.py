@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="dedupe_key",
+            field=models.CharField(
+                blank=True, help_text="At most one active job per key", max_length=255
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("status__in", ["queued", "running"]),
+                    models.Q(("dedupe_key", ""), _negated=True),
+                ),
+                fields=("dedupe_key",),
+                name="job_active_dedupe_key_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,229 @@
+"""Minimal background job runner
+
+Handlers are registered per job kind. With JOBS_BACKEND = 'thread' (the
+default) jobs run on a small thread pool inside the web process once the
+submitting transaction commits; 'worker' leaves them queued for the
+run_jobs management command; 'sync' runs them inline (tests, scripts).
+
+A running job's heartbeat is refreshed by every report() and, for handlers
+with long silent phases, every JOBS_STALE_SECONDS / 3 by a thread that lives
+as long as the handler does. A job that has been silent for JOBS_STALE_SECONDS
+(its process was restarted or killed, or with the thread backend it never got
+to run) is marked failed by reclaim_stale_jobs(), so its dedupe key can be
+used again. If the original run finishes after all, it leaves the job failed.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_executor = None
+
+
+def register(kind):
+    """Decorator registering `handler(job, report)` for a job kind"""
+    def decorator(handler):
+        _handlers[kind] = handler
+        return handler
+    return decorator
+
+
+def job_file_path(job, filename):
+    """Absolute path for a job's output file; the relative part is stored on the job"""
+    relative = os.path.join(str(job.id), filename)
+    absolute = os.path.join(settings.JOB_FILES_ROOT, relative)
+    os.makedirs(os.path.dirname(absolute), exist_ok=True)
+    return relative, absolute
+
+
+def purge_job_files(max_age_hours=None):
+    """Delete output files of jobs that finished over JOB_FILES_MAX_AGE_HOURS ago; returns how many went
+
+    Downloads of purged files answer 404 ("expired").
+    """
+    if max_age_hours is None:
+        max_age_hours = settings.JOB_FILES_MAX_AGE_HOURS
+    cutoff = time.time() - max_age_hours * 3600
+    root = settings.JOB_FILES_ROOT
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    old = {}
+    for name in names:
+        try:
+            job_id = uuid.UUID(name)
+        except ValueError:
+            continue
+        if os.path.getmtime(os.path.join(root, name)) < cutoff:
+            old[job_id] = name
+    if not old:
+        return 0
+    # A long-running job may still be writing to a directory it created long ago
+    active = set(Job.objects.filter(pk__in=old, status__in=[Job.QUEUED, Job.RUNNING]).values_list('pk', flat=True))
+    for job_id, name in old.items():
+        if job_id not in active:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return len(old) - len(active)
+
+
+def submit(kind, params=None, user=None):
+    """Queue a job and dispatch it according to JOBS_BACKEND"""
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind {kind!r}")
+    job = Job.objects.create(kind=kind, params=params or {}, user=user)
+    dispatch(job.pk)
+    return job
+
+
+def submit_unique(kind, dedupe_key, params=None, user=None):
+    """Like submit(), but return (existing job, False) while one with this key is active
+
+    An active job that has gone stale is failed and replaced.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind {kind!r}")
+    for attempt in range(3):
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(kind=kind, params=params or {}, user=user, dedupe_key=dedupe_key)
+        except IntegrityError:
+            active = Job.objects.filter(dedupe_key=dedupe_key, status__in=[Job.QUEUED, Job.RUNNING]).first()
+            if active is not None and not reclaim_stale_jobs(Job.objects.filter(pk=active.pk)):
+                return active, False
+            # The other job finished (or was reclaimed) between our insert and lookup; try again
+            continue
+        dispatch(job.pk)
+        return job, True
+    raise IntegrityError(f"Could not queue a {kind} job with key {dedupe_key!r}")
+
+
+def reclaim_stale_jobs(jobs=None):
+    """Fail active jobs that stopped reporting JOBS_STALE_SECONDS ago; returns how many"""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOBS_STALE_SECONDS)
+    stale = Q(status=Job.RUNNING) & (Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+    if getattr(settings, 'JOBS_BACKEND', 'thread') == 'thread':
+        # Dispatched on commit to a thread of a process that has since gone away
+        stale |= Q(status=Job.QUEUED, created_at__lt=cutoff)
+    jobs = Job.objects.all() if jobs is None else jobs
+    reclaimed = jobs.filter(stale).update(
+        status=Job.FAILED, finished_at=now,
+        error=f"Abandoned: no progress for {settings.JOBS_STALE_SECONDS} seconds (the worker was probably restarted)",
+    )
+    if reclaimed:
+        logger.warning("Reclaimed %d stale jobs", reclaimed)
+    return reclaimed
+
+
+def dispatch(job_id):
+    backend = getattr(settings, 'JOBS_BACKEND', 'thread')
+    if backend == 'sync':
+        run_job(job_id)
+    elif backend == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job_id))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'JOBS_THREADS', 2), thread_name_prefix='botaniq-job'
+        )
+    return _executor
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def claim(job_id=None):
+    """Atomically move one queued job (or the given one) to running and return it
+
+    The conditional UPDATE is what makes the claim safe between processes;
+    SKIP LOCKED just keeps concurrent workers from queueing behind each other.
+    """
+    while True:
+        with transaction.atomic():
+            candidates = Job.objects.select_for_update(skip_locked=True).filter(status=Job.QUEUED)
+            if job_id is not None:
+                candidates = candidates.filter(pk=job_id)
+            candidate = candidates.order_by('created_at').values_list('pk', flat=True).first()
+            if candidate is None:
+                return None
+            now = timezone.now()
+            if Job.objects.filter(pk=candidate, status=Job.QUEUED).update(
+                status=Job.RUNNING, started_at=now, heartbeat_at=now
+            ):
+                return Job.objects.get(pk=candidate)
+
+
+def heartbeat(job_id, stop):
+    """Refresh a running job's heartbeat every JOBS_STALE_SECONDS / 3 until `stop` is set"""
+    while not stop.wait(settings.JOBS_STALE_SECONDS / 3):
+        Job.objects.filter(pk=job_id, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def _heartbeat_in_thread(job_id, stop):
+    try:
+        heartbeat(job_id, stop)
+    finally:
+        connections.close_all()
+
+
+def run_job(job_id=None):
+    """Claim and run a job; returns it, or None when nothing was queued"""
+    job = claim(job_id)
+    if job is None:
+        return None
+
+    def report(**progress):
+        job.progress = {**job.progress, **progress}
+        Job.objects.filter(pk=job.pk).update(progress=job.progress, heartbeat_at=timezone.now())
+
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_in_thread, args=(job.pk, stop), name=f'botaniq-heartbeat-{job.pk}', daemon=True
+    ).start()
+    try:
+        result_file = _handlers[job.kind](job, report)
+    except Exception as e:
+        logger.exception("Job %s failed", job.pk)
+        job.status = Job.FAILED
+        job.error = f"{e}\n\n{traceback.format_exc()}"
+    else:
+        job.status = Job.SUCCEEDED
+        job.result_file = result_file or ''
+    finally:
+        stop.set()
+    job.finished_at = timezone.now()
+    # Only while still running: a reclaimed job may already have a replacement under its dedupe key
+    if not Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        status=job.status, error=job.error, result_file=job.result_file, finished_at=job.finished_at,
+    ):
+        logger.warning("Job %s finished after it was reclaimed as stale; leaving it failed", job.pk)
+        job.refresh_from_db()
+        return job
+    if job.result_file:
+        # Jobs that write files clear out expired ones, so storage stays bounded without a scheduler
+        purge_job_files()
+    return job
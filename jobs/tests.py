@@ -0,0 +1,130 @@
+import os
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from plants.models import Plant
+from .models import Job
+from . import runner
+
+
+@runner.register('test_reclaimed')
+def reclaimed_while_running(job, report):
+    Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+    runner.reclaim_stale_jobs()
+    return ''
+
+
+@runner.register('test_echo')
+def echo(job, report):
+    if job.params.get('fail'):
+        raise RuntimeError('boom')
+    report(rows=job.params['rows'])
+    return ''
+
+
+@override_settings(JOBS_BACKEND='worker')
+class JobRunnerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+
+    def test_worker_backend_leaves_job_queued_until_run(self):
+        """Test that queued jobs are claimed once and record progress"""
+        job = runner.submit('test_echo', {'rows': 7}, user=self.user)
+        self.assertEqual(job.status, Job.QUEUED)
+        finished = runner.run_job()
+        self.assertEqual(finished.pk, job.pk)
+        self.assertEqual(finished.status, Job.SUCCEEDED)
+        self.assertEqual(Job.objects.get(pk=job.pk).progress, {'rows': 7})
+        self.assertIsNone(runner.run_job())
+
+    def test_failures_are_recorded(self):
+        """Test that handler exceptions mark the job failed"""
+        job = runner.submit('test_echo', {'fail': True}, user=self.user)
+        with self.assertLogs('jobs.runner', level='ERROR'):
+            runner.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('boom', job.error)
+
+    def test_status_is_private(self):
+        """Test that other users can't see a job"""
+        job = runner.submit('test_echo', {'rows': 1}, user=self.user)
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('jobs:job_status', args=[job.pk])).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('jobs:job_status', args=[job.pk])).json()['status'], 'queued')
+
+
+@override_settings(JOBS_BACKEND='worker')
+class SeedEndpointTest(TestCase):
+    def test_seed_requires_token(self):
+        """Test that the seed endpoint stays closed without SEED_TOKEN"""
+        with mock.patch.dict(os.environ, {'SEED_TOKEN': 'secret'}):
+            response = self.client.post(reverse('internal_seed', args=['wrong']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_seed_is_queued_deduplicated_and_reports_progress(self):
+        """Test that seeding returns a job at once, dedupes repeats and reports progress"""
+        with mock.patch.dict(os.environ, {'SEED_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get(reverse('internal_seed', args=['secret'])).status_code, 405)
+            self.assertFalse(Job.objects.exists())
+            first = self.client.post(reverse('internal_seed', args=['secret']))
+            second = self.client.post(reverse('internal_seed', args=['secret']))
+            self.assertEqual(first.status_code, 202)
+            self.assertEqual(second.json()['job_id'], first.json()['job_id'])
+            self.assertFalse(second.json()['created'])
+            self.assertEqual(Plant.objects.count(), 0)
+
+            runner.run_job()
+            status = self.client.get(first.json()['status_url']).json()
+
+        self.assertEqual(status['status'], 'succeeded')
+        self.assertEqual(status['progress']['rows'], 20)
+        self.assertEqual(status['progress']['failed'], 0)
+        self.assertGreater(status['progress']['rate'], 0)
+        self.assertEqual(Plant.objects.count(), 20)
+
+    def test_finished_jobs_release_the_key(self):
+        """Test that a new seed can be queued once the previous one finished"""
+        job, created = runner.submit_unique('test_echo', 'echo', {'rows': 1})
+        runner.run_job(job.pk)
+        again, created = runner.submit_unique('test_echo', 'echo', {'rows': 1})
+        self.assertTrue(created)
+        self.assertNotEqual(again.pk, job.pk)
+
+    def test_stale_running_job_is_reclaimed(self):
+        """Test that a job whose worker died stops blocking its dedupe key"""
+        job, created = runner.submit_unique('test_echo', 'echo', {'rows': 1})
+        runner.claim(job.pk)
+        self.assertFalse(runner.submit_unique('test_echo', 'echo', {'rows': 1})[1])
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('jobs.runner', level='WARNING'):
+            again, created = runner.submit_unique('test_echo', 'echo', {'rows': 1})
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Abandoned', job.error)
+
+    def test_reclaimed_job_stays_failed(self):
+        """Test that a run finishing after its job was reclaimed doesn't overwrite the failure"""
+        job, created = runner.submit_unique('test_reclaimed', 'reclaimed')
+        with self.assertLogs('jobs.runner', level='WARNING') as logs:
+            finished = runner.run_job(job.pk)
+        self.assertEqual(finished.status, Job.FAILED)
+        self.assertIn('Abandoned', finished.error)
+        self.assertIn('finished after it was reclaimed', logs.output[-1])
+
+    def test_heartbeat_keeps_silent_jobs_alive(self):
+        """Test that the heartbeat refreshes a running job until it is stopped"""
+        job, created = runner.submit_unique('test_echo', 'echo', {'rows': 1})
+        runner.claim(job.pk)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        stop = mock.Mock()
+        stop.wait.side_effect = [False, True]
+        runner.heartbeat(job.pk, stop)
+        self.assertEqual(runner.reclaim_stale_jobs(), 0)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('<uuid:job_id>/', views.job_status, name='job_status'),
+    path('<uuid:job_id>/download/', views.job_download, name='job_download'),
+]
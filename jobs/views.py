@@ -0,0 +1,53 @@
+import os
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from botaniq.querybudget import query_budget
+from .models import Job
+
+
+def _visible_job(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    if job.user_id != request.user.pk and not request.user.is_staff:
+        raise Http404('Job not found')
+    return job
+
+
+def job_payload(job):
+    data = {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'status_url': reverse('jobs:job_status', args=[job.id]),
+    }
+    if job.status == Job.SUCCEEDED and job.result_file:
+        data['download_url'] = reverse('jobs:job_download', args=[job.id])
+    if job.status == Job.FAILED:
+        data['error'] = job.error.splitlines()[0] if job.error else 'Failed'
+    return data
+
+
+@query_budget(3)
+@login_required
+def job_status(request, job_id):
+    """JSON status and progress of a background job"""
+    return JsonResponse(job_payload(_visible_job(request, job_id)))
+
+
+@query_budget(3)
+@login_required
+def job_download(request, job_id):
+    """Download a finished job's output file"""
+    job = _visible_job(request, job_id)
+    if job.status != Job.SUCCEEDED or not job.result_file:
+        raise Http404('No file for this job')
+    path = os.path.join(settings.JOB_FILES_ROOT, job.result_file)
+    if not os.path.exists(path):
+        raise Http404('Job file has expired')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
@@ -0,0 +1,124 @@
+"""Read-only JSON API for the verified catalogue (v1)
+
+Responses are built straight from .values() rows, support sparse fieldsets
+via ?fields=, cursor pagination via ?cursor= and conditional GETs via ETag.
+"""
+import hashlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from botaniq.pagination import InvalidCursor, keyset_page
+from botaniq.querybudget import query_budget
+from . import exporter
+from .models import Plant
+
+LIST_FIELDS = ['id', 'scientific_name', 'common_names', 'plant_family', 'description', 'traditional_systems']
+DETAIL_FIELDS = exporter.EXPORT_FIELDS
+LIST_ORDERING = [('scientific_name', False)]  # unique, so it is a complete cursor key
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _catalogue_etag(request, *args, **kwargs):
+    """Changes whenever any verified plant is added, edited or removed"""
+    state = Plant.objects.filter(is_verified=True).aggregate(count=Count('id'), latest=Max('updated_at'))
+    key = f"{request.get_full_path()}|{state['count']}|{state['latest']}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _plant_etag(request, scientific_name):
+    updated_at = Plant.objects.filter(
+        scientific_name=scientific_name, is_verified=True
+    ).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return hashlib.md5(f"{request.get_full_path()}|{updated_at}".encode()).hexdigest()
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page(request, plants):
+    """One cursor page of plants as dicts holding only the requested fields"""
+    fields = exporter.parse_fields(request.GET.get('fields'), default=LIST_FIELDS)
+    selected = list(dict.fromkeys(fields + [field for field, descending in LIST_ORDERING]))
+    rows, next_cursor = keyset_page(
+        plants.values(*selected), LIST_ORDERING, request.GET.get('cursor'), _limit(request)
+    )
+    if len(selected) != len(fields):
+        rows = [{name: row[name] for name in fields} for row in rows]
+    return JsonResponse({'results': rows, 'next_cursor': next_cursor}, encoder=DjangoJSONEncoder)
+
+
+@query_budget(3)
+@require_GET
+@condition(etag_func=_catalogue_etag)
+def plant_list(request):
+    """GET /api/v1/plants/?fields=&limit=&cursor="""
+    try:
+        return _page(request, Plant.objects.filter(is_verified=True))
+    except (ValueError, InvalidCursor) as e:
+        return _error(str(e))
+
+
+@query_budget(3)
+@require_GET
+@condition(etag_func=_plant_etag)
+def plant_detail(request, scientific_name):
+    """GET /api/v1/plants/<scientific_name>/?fields="""
+    try:
+        fields = exporter.parse_fields(request.GET.get('fields'), default=DETAIL_FIELDS)
+    except ValueError as e:
+        return _error(str(e))
+    plant = Plant.objects.filter(scientific_name=scientific_name, is_verified=True).values(*fields).first()
+    if plant is None:
+        raise Http404('Plant not found')
+    return JsonResponse(plant, encoder=DjangoJSONEncoder)
+
+
+@query_budget(3)
+@require_GET
+@condition(etag_func=_catalogue_etag)
+def plant_search(request):
+    """GET /api/v1/plants/search/?q=&mode=basic|smart&fields=&limit=&cursor=
+
+    Basic search is cursor-paged like the list; smart search returns one
+    ranked page of up to `limit` results.
+    """
+    from .views import smart_search_plants
+
+    query = request.GET.get('q', '').strip()
+    mode = request.GET.get('mode', 'basic')
+    if mode not in ('basic', 'smart'):
+        return _error('mode must be basic or smart')
+    if not query:
+        return _error('q is required')
+
+    try:
+        if mode == 'basic':
+            return _page(request, Plant.objects.filter(is_verified=True).filter(
+                Q(scientific_name__icontains=query) |
+                Q(common_names__icontains=query) |
+                Q(description__icontains=query)
+            ))
+
+        fields = exporter.parse_fields(request.GET.get('fields'), default=LIST_FIELDS)
+        ranked_ids = [plant.id for plant in smart_search_plants(query, limit=_limit(request))]
+    except (ValueError, InvalidCursor) as e:
+        return _error(str(e))
+
+    rows = {row['id']: row for row in Plant.objects.filter(is_verified=True, id__in=ranked_ids).values('id', *fields)}
+    results = [{name: rows[plant_id][name] for name in fields} for plant_id in ranked_ids if plant_id in rows]
+    return JsonResponse({'results': results, 'next_cursor': None}, encoder=DjangoJSONEncoder)
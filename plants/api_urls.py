@@ -0,0 +1,10 @@
+from django.urls import path
+from . import api
+
+app_name = 'plants_api'
+
+urlpatterns = [
+    path('', api.plant_list, name='plant_list'),
+    path('search/', api.plant_search, name='plant_search'),
+    path('<str:scientific_name>/', api.plant_detail, name='plant_detail'),
+]
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PlantsConfig(AppConfig):
     name = "plants"
+
+    def ready(self):
+        from . import images, importer, prerender, signals, trending  # noqa: F401  (registers jobs and signal handlers)
@@ -0,0 +1,256 @@
+"""Immutable in-process snapshot of the verified catalogue for public reads
+
+plant_list and plant_detail read verified plants, their thumbnails and their
+similar plants from a Catalogue each worker keeps in memory, so an anonymous
+request runs no SQL. A snapshot is built with three queries when first
+needed and never modified after that. Edits bump the catalogue generation, a
+token in the cache. The next request to notice starts a thread that builds a
+new snapshot and swaps it in with a single assignment. Requests keep being
+served from the old snapshot meanwhile; only a worker without any snapshot
+builds one on the request thread. CATALOGUE_BACKGROUND_REBUILD=False (the
+default under tests) builds on the request thread instead.
+
+Workers share generations when they share the cache (REDIS_URL). With the
+default per-process cache, each worker also rebuilds once its snapshot is
+CATALOGUE_MAX_AGE_SECONDS old.
+
+Records are __slots__ objects holding tuples. Equal strings and tuples are
+stored once across plants. memory_bytes() measures a snapshot, and the
+catalogue_snapshot command reports build time and memory per worker.
+"""
+import gc
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from botaniq import metrics
+from botaniq.querybudget import unbudgeted
+from .models import Plant, PlantImage, SimilarPlant, ThumbnailUrls
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'plants:catalogue:generation'
+TEXT_FIELDS = (
+    'scientific_name', 'plant_family', 'description', 'habitat', 'dosage_info', 'safety_warnings',
+    'contraindications', 'interactions', 'toxicity_info', 'conservation_status', 'sustainability_info',
+    'ethical_sourcing', 'image_url', 'image_credit',
+)
+LIST_FIELDS = (
+    'common_names', 'regions', 'traditional_systems', 'cultural_uses', 'parts_used', 'preparations',
+    'active_compounds', 'research_studies', 'pharmacological_actions',
+)
+FIELDS = ('id',) + TEXT_FIELDS + LIST_FIELDS + ('updated_at',)
+
+_catalogue = None
+_build_lock = threading.Lock()
+
+
+class Frozen:
+    """Slotted record whose attributes are set once, in __init__"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class ImageRecord(Frozen, ThumbnailUrls):
+    """A ready PlantImage"""
+    __slots__ = ('source_hash', 'width', 'height', 'widths')
+    is_ready = True
+
+
+class PlantRecord(Frozen):
+    """A verified plant with the fields the public pages show; list fields are tuples"""
+    __slots__ = FIELDS + ('image', 'similar_ids')
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f"<PlantRecord {self.id}: {self.scientific_name}>"
+
+    def get_primary_common_name(self):
+        """Get the first common name for display"""
+        return self.common_names[0] if self.common_names else self.scientific_name
+
+
+class Catalogue:
+    def __init__(self, generation, plants):
+        self.generation = generation
+        self.plants = tuple(plants)
+        self.by_id = {plant.id: plant for plant in self.plants}
+        self.by_name = {plant.scientific_name: plant for plant in self.plants}
+        # What basic search matches against, lower-cased once
+        self.haystacks = tuple(
+            '\x00'.join((plant.scientific_name, *plant.common_names, plant.description)).lower()
+            for plant in self.plants
+        )
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.plants)
+
+    def is_stale(self, generation):
+        max_age = settings.CATALOGUE_MAX_AGE_SECONDS
+        return generation != self.generation or (max_age and time.monotonic() - self.built_at > max_age)
+
+    def in_order(self, ids):
+        """Records for plant ids, in the given order, skipping any no longer verified"""
+        return [self.by_id[plant_id] for plant_id in ids if plant_id in self.by_id]
+
+    def similar(self, plant):
+        return self.in_order(plant.similar_ids)
+
+    def search(self, query):
+        """Ids of the plants basic search matches, in scientific name order like search_plant_ids"""
+        needle = query.lower().replace('\x00', '')
+        return [plant.id for plant, haystack in zip(self.plants, self.haystacks) if needle in haystack]
+
+    def memory_bytes(self):
+        """Deep size of the snapshot, counting each shared object once"""
+        seen = set()
+        total = 0
+        stack = [self]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (tuple, list)):
+                stack.extend(obj)
+            elif isinstance(obj, Frozen):
+                stack.extend(getattr(obj, name) for cls in type(obj).__mro__ for name in getattr(cls, '__slots__', ()))
+            elif hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+        return total
+
+
+def build(generation=None):
+    """Load a snapshot of the verified catalogue (three queries)"""
+    started = time.perf_counter()
+    tuples = {}
+    share = tuples.setdefault
+    intern = sys.intern
+
+    with unbudgeted():
+        images = {
+            plant_id: ImageRecord(source_hash, width, height, tuple(widths))
+            for plant_id, source_hash, width, height, widths in PlantImage.objects.filter(
+                status=PlantImage.READY, plant__is_verified=True
+            ).values_list('plant_id', 'source_hash', 'width', 'height', 'widths')
+            if widths
+        }
+        similar = defaultdict(list)
+        for plant_id, neighbour_id in SimilarPlant.objects.filter(
+            plant__is_verified=True, neighbour__is_verified=True
+        ).order_by('plant', 'rank').values_list('plant_id', 'neighbour_id'):
+            similar[plant_id].append(neighbour_id)
+
+        plants = []
+        text_end = 1 + len(TEXT_FIELDS)
+        list_end = text_end + len(LIST_FIELDS)
+        for row in Plant.objects.filter(is_verified=True).order_by('scientific_name').values_list(*FIELDS):
+            lists = [tuple(map(intern, values or ())) for values in row[text_end:list_end]]
+            plants.append(PlantRecord(
+                row[0],
+                *map(intern, row[1:text_end]),
+                *(share(values, values) for values in lists),
+                row[list_end],
+                images.get(row[0]),
+                tuple(similar.get(row[0], ())),
+            ))
+    catalogue = Catalogue(generation, plants)
+    metrics.CATALOGUE_BUILD.observe(time.perf_counter() - started)
+    return catalogue
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _bump():
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def bump_generation():
+    """Mark snapshots stale now, and again once the current transaction commits
+
+    The early bump lets this process see its own edit at once. The second one
+    covers workers that rebuilt from the database before the commit.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def get_catalogue():
+    """The current snapshot, rebuilt if the generation moved on; None when CATALOGUE_SNAPSHOT is off"""
+    global _catalogue
+    if not settings.CATALOGUE_SNAPSHOT:
+        return None
+    generation = current_generation()
+    catalogue = _catalogue
+    if catalogue is not None and not catalogue.is_stale(generation):
+        metrics.CACHE_REQUESTS.inc(cache='catalogue', result='hit')
+        return catalogue
+    metrics.CACHE_REQUESTS.inc(cache='catalogue', result='miss')
+    if not _build_lock.acquire(blocking=catalogue is None):
+        return catalogue  # another thread is building the next snapshot; serve this one meanwhile
+    if catalogue is not None and settings.CATALOGUE_BACKGROUND_REBUILD:
+        threading.Thread(target=_rebuild, args=(generation,), name='botaniq-catalogue', daemon=True).start()
+        return catalogue
+    try:
+        current = _catalogue
+        if current is None or current is catalogue or current.is_stale(generation):
+            current = _catalogue = build(generation)
+        return current
+    finally:
+        _build_lock.release()
+
+
+def _rebuild(generation):
+    """Build the next snapshot off the request path; releases the build lock taken by get_catalogue()"""
+    global _catalogue
+    try:
+        _catalogue = build(generation)
+    except Exception:
+        logger.exception("Catalogue snapshot rebuild failed; serving the previous one")
+    finally:
+        _build_lock.release()
+        connections.close_all()
+
+
+def preload():
+    """Build the snapshot before the server forks its workers (CATALOGUE_PRELOAD)
+
+    Forked workers start with the snapshot already loaded and share its pages
+    until they write to them. gc.freeze() stops the collector from touching
+    those pages, which would copy them. Database connections are closed so
+    the workers don't share a socket.
+    """
+    catalogue = get_catalogue()
+    connections.close_all()
+    gc.freeze()
+    return catalogue
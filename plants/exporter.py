@@ -0,0 +1,154 @@
+"""Constant-memory catalogue exports shared by the export endpoint and export_plants"""
+import csv
+import heapq
+import io
+import json
+import zlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Plant, PlantDeletion
+
+EXPORT_FIELDS = [field.name for field in Plant._meta.concrete_fields]
+LIST_FIELDS = {field.name for field in Plant._meta.concrete_fields if isinstance(field, models.JSONField)}
+DEFAULT_FIELDS = [name for name in EXPORT_FIELDS if name != 'id']
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# verified= filter values
+VERIFIED = {'true': True, 'false': False, 'all': None}
+# Columns of the removals feed: plants deleted, or no longer verified, since updated_since
+REMOVED_FIELDS = ['id', 'scientific_name', 'reason', 'removed_at']
+CHUNK_SIZE = 2000
+
+
+def parse_fields(value, default=DEFAULT_FIELDS):
+    """Comma-separated field list -> validated list (`default` when empty)"""
+    if not value:
+        return list(default)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_since(value):
+    """ISO date or datetime -> aware datetime (None when empty)"""
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value) or (parse_date(value) and datetime.combine(parse_date(value), time.min))
+    except ValueError:
+        since = None
+    if not since:
+        raise ValueError(f"Invalid updated_since: {value}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def export_queryset(verified=True, region=None, updated_since=None):
+    """Plants to export, ordered by (updated_at, id) so updated_since can resume a sync"""
+    plants = Plant.objects.all()
+    if verified is not None:
+        plants = plants.filter(is_verified=verified)
+    if region:
+        if connection.features.supports_json_field_contains:
+            plants = plants.filter(regions__contains=[region])
+        else:
+            plants = plants.filter(regions__icontains=json.dumps(region))
+    if updated_since:
+        plants = plants.filter(updated_at__gt=updated_since)
+    return plants.order_by('updated_at', 'id')
+
+
+def removed_rows(updated_since=None, chunk_size=CHUNK_SIZE):
+    """Plants deleted or un-verified after updated_since, as REMOVED_FIELDS dicts in time order
+
+    Un-verified rows are plants that are unverified now and changed since;
+    partners drop any of those they hold.
+    """
+    deleted = PlantDeletion.objects.order_by('deleted_at', 'id')
+    unverified = Plant.objects.filter(is_verified=False).order_by('updated_at', 'id')
+    if updated_since:
+        deleted = deleted.filter(deleted_at__gt=updated_since)
+        unverified = unverified.filter(updated_at__gt=updated_since)
+    deleted = (
+        {'id': plant_id, 'scientific_name': name, 'reason': 'deleted', 'removed_at': at}
+        for plant_id, name, at in deleted.values_list('plant_id', 'scientific_name', 'deleted_at').iterator(chunk_size)
+    )
+    unverified = (
+        {'id': plant_id, 'scientific_name': name, 'reason': 'unverified', 'removed_at': at}
+        for plant_id, name, at in unverified.values_list('id', 'scientific_name', 'updated_at').iterator(chunk_size)
+    )
+    return heapq.merge(deleted, unverified, key=lambda row: row['removed_at'])
+
+
+def export_lines(queryset, fields, fmt='ndjson', chunk_size=CHUNK_SIZE):
+    """Yield the export as text, one row at a time
+
+    `queryset` is exported through a chunked .values() iterator; an iterable of
+    dicts (removed_rows()) is written as it is.
+    """
+    if isinstance(queryset, models.QuerySet):
+        rows = queryset.values(*fields).iterator(chunk_size=chunk_size)
+    else:
+        rows = queryset
+    if fmt == 'ndjson':
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(row) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(fields)
+    yield flush()
+    for row in rows:
+        # List fields are written as JSON arrays so items containing commas survive
+        writer.writerow([
+            json.dumps(row[name], ensure_ascii=False) if name in LIST_FIELDS else _csv_value(row[name])
+            for name in fields
+        ])
+        yield flush()
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_stream(lines, compress=False, buffer_size=64 * 1024):
+    """Encode text lines to bytes in ~buffer_size blocks, gzip-compressing on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            block = b''.join(pending)
+            pending, size = [], 0
+            block = compressor.compress(block) if compressor else block
+            if block:
+                yield block
+    block = b''.join(pending)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
@@ -0,0 +1,295 @@
+"""Local thumbnails of plant illustrations
+
+Source images (fetched from Plant.image_url or uploaded by staff) are stored
+once under THUMBNAIL_ROOT/originals by their SHA-256. THUMBNAIL_WIDTHS WebP
+and JPEG variants go next to them as <hash>-<width>.<ext>. The names never
+change for a given image, so serve_thumbnail() can send them with an
+immutable Cache-Control header, and regenerating them is idempotent.
+
+Fetching and resizing happen in the 'plant_images' background job, on the
+job runner's thread pool, with a few downloads in flight at once. Only http
+and https URLs on public addresses are fetched, redirects included. The job
+bumps the catalogue generation once when it finishes, not per image;
+callers of process_plant_image() do the same.
+regenerate_thumbnails rebuilds the variants from the stored originals in a
+process pool, e.g. after THUMBNAIL_WIDTHS changes.
+"""
+import hashlib
+import ipaddress
+import logging
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import django
+import requests
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from PIL import Image, ImageOps
+
+from jobs.runner import register, submit_unique
+from .catalogue import bump_generation
+from .models import Plant, PlantImage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    # format -> (extension, Pillow save options)
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+FETCH_THREADS = 4
+IMAGE_MAX_REDIRECTS = 5
+
+
+def source_path(source_hash):
+    return os.path.join(settings.THUMBNAIL_ROOT, 'originals', source_hash[:2], source_hash)
+
+
+def thumbnail_name(source_hash, width, fmt):
+    """Path of a variant relative to THUMBNAIL_ROOT (and THUMBNAIL_URL)"""
+    return f'{source_hash[:2]}/{source_hash}-{width}.{FORMATS[fmt][0]}'
+
+
+def store_source(data):
+    """Keep the source image bytes under their SHA-256; returns the hash"""
+    source_hash = hashlib.sha256(data).hexdigest()
+    path = source_path(source_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(f'{path}.tmp', path)
+    return source_hash
+
+
+def check_fetch_url(url):
+    """Raise ValueError unless url is http(s) and its host resolves only to public addresses
+
+    image_url comes from staff edits and partner imports, so without this the
+    server could be made to fetch from localhost or the internal network.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'only http and https image URLs are fetched, not {url!r}')
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or 80, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f'cannot resolve {parts.hostname}: {e}')
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f'{parts.hostname} resolves to a non-public address ({address})')
+
+
+def fetch_source(url):
+    """Download an image, refusing anything over IMAGE_MAX_BYTES
+
+    Redirects are followed by hand, up to IMAGE_MAX_REDIRECTS, so every hop
+    goes through check_fetch_url().
+    """
+    for _ in range(IMAGE_MAX_REDIRECTS + 1):
+        check_fetch_url(url)
+        with requests.get(url, stream=True, timeout=settings.IMAGE_FETCH_TIMEOUT, allow_redirects=False,
+                          headers={'User-Agent': 'BotanIQ thumbnailer'}) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > settings.IMAGE_MAX_BYTES:
+                    raise ValueError(f'image is larger than {settings.IMAGE_MAX_BYTES} bytes')
+        return bytes(data)
+    raise ValueError(f'more than {IMAGE_MAX_REDIRECTS} redirects')
+
+
+def make_thumbnails(source_hash, force=False):
+    """Write the WebP and JPEG variants of a stored source; returns (width, height, widths)"""
+    with Image.open(source_path(source_hash)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            # JPEG has no alpha: flatten transparent images onto white
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        width, height = image.size
+        # Never upscale; a source narrower than every width still gets one variant at its own size
+        widths = [w for w in settings.THUMBNAIL_WIDTHS if w < width] + [min(width, max(settings.THUMBNAIL_WIDTHS))]
+        widths = sorted(set(widths))
+        for w in widths:
+            resized = None
+            for fmt, (extension, options) in FORMATS.items():
+                path = os.path.join(settings.THUMBNAIL_ROOT, thumbnail_name(source_hash, w, fmt))
+                if os.path.exists(path) and not force:
+                    continue
+                if resized is None:
+                    resized = image if w == width else image.resize((w, max(round(height * w / width), 1)), Image.LANCZOS)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                resized.save(f'{path}.tmp', format=fmt.upper(), **options)
+                os.replace(f'{path}.tmp', path)
+    return width, height, widths
+
+
+def attach_source(plant_id, source_hash, source_url=''):
+    """Record a plant's source image and thumbnail it in place; returns the PlantImage"""
+    try:
+        width, height, widths = make_thumbnails(source_hash)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return _failed(plant_id, source_url, f'Unreadable image: {e}', source_hash)
+    image, _ = PlantImage.objects.update_or_create(plant_id=plant_id, defaults={
+        'source_url': source_url, 'source_hash': source_hash, 'width': width, 'height': height,
+        'widths': widths, 'status': PlantImage.READY, 'error': '',
+    })
+    return image
+
+
+def _failed(plant_id, source_url, error, source_hash=''):
+    logger.warning('Plant %s image %s: %s', plant_id, source_url or source_hash, error)
+    image, _ = PlantImage.objects.update_or_create(plant_id=plant_id, defaults={
+        'source_url': source_url, 'source_hash': source_hash, 'widths': [],
+        'status': PlantImage.FAILED, 'error': error[:500],
+    })
+    return image
+
+
+def save_upload(plant_id, upload):
+    """Store an uploaded image for a plant and queue its thumbnails; it replaces any image_url one"""
+    source_hash = store_source(b''.join(upload.chunks()))
+    PlantImage.objects.update_or_create(plant_id=plant_id, defaults={
+        'source_url': '', 'source_hash': source_hash, 'widths': [], 'status': PlantImage.PENDING, 'error': '',
+    })
+    bump_generation()
+    return queue_images()
+
+
+def needs_processing(plant):
+    """Whether a saved plant's image_url differs from the image last fetched for it"""
+    source_url = PlantImage.objects.filter(plant_id=plant.pk).values_list('source_url', flat=True).first()
+    if source_url is None:
+        return bool(plant.image_url)
+    return source_url != '' and source_url != plant.image_url
+
+
+def process_plant_image(plant_id):
+    """Bring one plant's thumbnails in line with its image_url or pending upload
+
+    The caller bumps the catalogue generation once it has processed its batch.
+    """
+    plant = Plant.objects.filter(pk=plant_id).values('image_url').first()
+    if plant is None:
+        return None
+    image = PlantImage.objects.filter(plant_id=plant_id).first()
+    if image is not None and image.status == PlantImage.PENDING and image.source_hash:
+        return attach_source(plant_id, image.source_hash, image.source_url)
+    url = plant['image_url']
+    if image is not None and (not image.source_url or image.source_url == url):
+        return image  # an upload (which wins over the URL) or already processed
+    if not url:
+        if image is not None:
+            image.delete()
+        return None
+    try:
+        source_hash = store_source(fetch_source(url))
+    except (requests.RequestException, ValueError, OSError) as e:
+        return _failed(plant_id, url, f'Download failed: {e}')
+    return attach_source(plant_id, source_hash, url)
+
+
+def stale_plant_ids():
+    """Plants whose image_url changed since it was thumbnailed, or with an upload waiting"""
+    changed = Plant.objects.exclude(image_url='').filter(
+        Q(image__isnull=True) | (~Q(image__source_url='') & ~Q(image__source_url=F('image_url')))
+    )
+    removed = Plant.objects.filter(image_url='').exclude(image__isnull=True).exclude(image__source_url='')
+    pending = PlantImage.objects.filter(status=PlantImage.PENDING).values('plant_id')
+    return sorted(
+        set(changed.values_list('pk', flat=True))
+        | set(removed.values_list('pk', flat=True))
+        | set(pending.values_list('plant_id', flat=True))
+    )
+
+
+@register('plant_images')
+def run_plant_images(job, report):
+    """Background job: fetch and thumbnail every stale plant image, a few downloads at a time"""
+    plant_ids = job.params.get('plant_ids') or stale_plant_ids()
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix='botaniq-images') as pool:
+        for image in pool.map(_process_in_thread, plant_ids):
+            done += 1
+            failed += image is not None and image.status == PlantImage.FAILED
+            if done % 25 == 0:
+                report(processed=done, failed=failed, total=len(plant_ids))
+    if done:
+        bump_generation()
+    report(processed=done, failed=failed, total=len(plant_ids))
+
+
+def _process_in_thread(plant_id):
+    try:
+        return process_plant_image(plant_id)
+    finally:
+        close_old_connections()
+
+
+def queue_images():
+    """Queue a pass over stale plant images, coalescing like queue_refresh()"""
+    job, created = submit_unique('plant_images', 'plant_images')
+    if not created and job.status == job.RUNNING:
+        job, created = submit_unique('plant_images', 'plant_images:followup')
+    return job
+
+
+def _regenerate_one(args):
+    source_hash, force = args
+    try:
+        return source_hash, make_thumbnails(source_hash, force), None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return source_hash, None, str(e)
+
+
+def regenerate(force=False, workers=1, progress=None):
+    """Rebuild the variants of every stored image from its original; returns (done, errors)
+
+    Variants are CPU-bound, so workers > 1 spreads the sources over a process pool.
+    """
+    hashes = list(
+        PlantImage.objects.exclude(source_hash='').exclude(status=PlantImage.PENDING)
+        .values_list('source_hash', flat=True).distinct().order_by('source_hash')
+    )
+    tasks = [(source_hash, force) for source_hash in hashes]
+    done, errors = 0, []
+    if workers <= 1:
+        results = map(_regenerate_one, tasks)
+        pool = None
+    else:
+        # Children must not share the parent's database socket
+        connections.close_all()
+        pool = multiprocessing.Pool(workers, initializer=django.setup)
+        results = pool.imap_unordered(_regenerate_one, tasks)
+    try:
+        for source_hash, result, error in results:
+            images = PlantImage.objects.filter(source_hash=source_hash)
+            if error:
+                errors.append((source_hash, error))
+                images.update(status=PlantImage.FAILED, widths=[], error=f'Unreadable image: {error}'[:500])
+            else:
+                width, height, widths = result
+                images.update(status=PlantImage.READY, width=width, height=height, widths=widths, error='')
+            done += 1
+            if progress:
+                progress(done, len(tasks))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if done:
+        bump_generation()
+    return done, errors
@@ -0,0 +1,247 @@
+"""Streaming, chunked catalogue import shared by import_plants and seed_plants"""
+import csv
+import json
+import multiprocessing
+import time
+from pathlib import Path
+
+import django
+from django.db import connections, transaction
+
+from dashboard.forms import PlantForm, PlantListField
+from jobs.runner import register
+from .catalogue import bump_generation
+from .images import queue_images
+from .interactions import rebuild_interactions
+from .models import Plant
+from .prerender import queue_prerender
+from .similarity import queue_refresh
+from .terms import rebuild_term_index
+
+# Everything the form edits except the conflict key is overwritten on upsert;
+# created_at is left alone so re-imports don't reset a plant's age, and
+# is_verified so an import never verifies or un-verifies an existing plant.
+UPSERT_FIELDS = [
+    name for name in PlantForm.Meta.fields if name not in ('scientific_name', 'is_verified')
+] + ['updated_at']
+
+BOOLEAN_STRINGS = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False, '': False}
+
+
+class SharedFields(dict):
+    """Form fields that every form instance uses as they are instead of deep-copying them
+
+    Deep-copying all of PlantForm's fields costs more than validating a record,
+    and validation never changes a field.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class PlantImportForm(PlantForm):
+    """PlantForm rules minus the per-row uniqueness query; the upsert resolves conflicts"""
+
+    def validate_unique(self):
+        pass
+
+
+PlantImportForm.base_fields = SharedFields(PlantImportForm.base_fields)
+
+
+def detect_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        return 'csv'
+    if suffix in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f"Can't tell the format of {path}; use .jsonl/.ndjson or .csv")
+
+
+def read_records(path, fmt=None):
+    """Yield (line_number, record) pairs from a JSON Lines or CSV file without loading it whole"""
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as e:
+                        yield line_number, e
+
+
+LIST_FIELDS = [name for name, field in PlantForm.base_fields.items() if isinstance(field, PlantListField)]
+
+
+def _form_data(record):
+    data = dict(record)
+    for name in LIST_FIELDS:
+        # CSV exports write list fields as JSON arrays
+        value = data.get(name)
+        if isinstance(value, str) and value.lstrip().startswith('['):
+            try:
+                data[name] = json.loads(value)
+            except ValueError:
+                pass
+    verified = data.get('is_verified', False)
+    if isinstance(verified, str):
+        if verified.strip().lower() not in BOOLEAN_STRINGS:
+            raise ValueError(f"is_verified: {verified!r} is not one of true/false, yes/no, 1/0")
+        verified = BOOLEAN_STRINGS[verified.strip().lower()]
+    data['is_verified'] = bool(verified)
+    # Unchecked checkboxes are simply missing from form data
+    if not data['is_verified']:
+        del data['is_verified']
+    return data
+
+
+def validate_record(record):
+    """Return (Plant, None) for a valid record or (None, error message)"""
+    if isinstance(record, Exception):
+        return None, f"Invalid JSON: {record}"
+    if not isinstance(record, dict):
+        return None, "Expected a JSON object"
+    try:
+        data = _form_data(record)
+    except ValueError as e:
+        return None, str(e)
+    form = PlantImportForm(data)
+    if not form.is_valid():
+        errors = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+        return None, errors
+    return form.instance, None
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def upsert_plants(plants, update=True):
+    """Insert or update one chunk of plants in a single statement and transaction
+
+    With update=False plants that already exist are left untouched. Returns the
+    number of rows written.
+    """
+    # ON CONFLICT can't touch the same row twice in one statement, so the last row wins
+    unique = {plant.scientific_name: plant for plant in plants}
+    with transaction.atomic():
+        if update:
+            Plant.objects.bulk_create(
+                list(unique.values()),
+                update_conflicts=True,
+                unique_fields=['scientific_name'],
+                update_fields=UPSERT_FIELDS,
+            )
+            return len(unique)
+        existing = set(Plant.objects.filter(scientific_name__in=unique).values_list('scientific_name', flat=True))
+        new = [plant for name, plant in unique.items() if name not in existing]
+        Plant.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def _batched(records, size):
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate_batch(batch):
+    return [(line_number, *validate_record(record)) for line_number, record in batch]
+
+
+def _validated(records, chunk_size, workers):
+    """Yield (line_number, plant, error), validating in a process pool when workers > 1"""
+    batches = _batched(records, chunk_size)
+    if workers <= 1:
+        for batch in batches:
+            yield from _validate_batch(batch)
+        return
+
+    # Children must not share the parent's database socket
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=django.setup) as pool:
+        for results in pool.imap(_validate_batch, batches):
+            yield from results
+
+
+def import_records(records, chunk_size=1000, progress=None, max_errors=100, workers=1, update=True):
+    """Validate and upsert (line_number, record) pairs chunk by chunk
+
+    `progress` is called with the running ImportResult after every chunk.
+    With update=False only new plants are inserted (see upsert_plants).
+    """
+    result = ImportResult()
+    chunk = []
+
+    def flush():
+        if chunk:
+            result.imported += upsert_plants(chunk, update)
+            chunk.clear()
+            if progress:
+                progress(result)
+
+    for line_number, plant, error in _validated(records, chunk_size, workers):
+        result.rows += 1
+        if error:
+            result.failed += 1
+            if len(result.errors) < max_errors:
+                result.errors.append((line_number, error))
+            continue
+        chunk.append(plant)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    if result.imported:
+        # bulk upserts bypass the Plant signals
+        rebuild_term_index()
+        rebuild_interactions()
+        bump_generation()
+        queue_refresh()
+        queue_images()
+        queue_prerender()
+    return result
+
+
+@register('import_plants')
+def run_import_job(job, report):
+    """Background job: import one file, reporting rows, rate and errors as it goes"""
+    def progress(result):
+        report(
+            rows=result.rows,
+            imported=result.imported,
+            failed=result.failed,
+            rate=round(result.rate, 1),
+            errors=[f"line {line}: {error}" for line, error in result.errors[:20]],
+        )
+
+    result = import_records(
+        read_records(job.params['path'], job.params.get('format')),
+        chunk_size=job.params.get('chunk_size', 1000),
+        progress=progress,
+        update=job.params.get('update', True),
+    )
+    progress(result)
+    report(elapsed=round(result.elapsed, 2))
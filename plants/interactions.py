@@ -0,0 +1,245 @@
+"""Herb–drug interaction matrix
+
+A drug / condition lexicon is compiled once into an Aho–Corasick automaton
+and run over each plant's safety text and pharmacological actions; the
+concepts found are stored in PlantInteraction so checking a collection
+against a medication list is a single indexed query instead of a text scan.
+"""
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.db import transaction
+
+from .models import Plant, PlantInteraction
+
+# concept -> (label, phrases). Phrases match case-insensitively on word
+# boundaries, with an optional plural "s".
+LEXICON = {
+    # Drug classes
+    'anticoagulants': ("Anticoagulants / blood thinners", [
+        "anticoagulant", "blood thinner", "blood-thinning medication", "warfarin", "heparin",
+        "clopidogrel", "aspirin", "antiplatelet",
+    ]),
+    'antidiabetics': ("Diabetes medications", [
+        "diabetes medication", "diabetic medication", "antidiabetic", "hypoglycemic", "hypoglycaemic",
+        "blood sugar lowering", "metformin", "insulin", "glibenclamide",
+    ]),
+    'maois': ("MAO inhibitors", ["maoi", "monoamine oxidase inhibitor", "phenelzine", "selegiline"]),
+    'ssris': ("SSRIs", ["ssri", "selective serotonin reuptake inhibitor", "fluoxetine", "sertraline", "citalopram", "paroxetine"]),
+    'antidepressants': ("Antidepressants", ["antidepressant", "tricyclic", "amitriptyline"]),
+    'immunosuppressants': ("Immunosuppressants", ["immunosuppressant", "ciclosporin", "cyclosporine", "tacrolimus"]),
+    'chemotherapy': ("Chemotherapy", ["chemotherapy drug", "chemotherapy", "cytotoxic drug"]),
+    'acid_reducers': ("Acid-reducing medications", [
+        "acid-reducing medication", "acid reducer", "antacid", "proton pump inhibitor", "omeprazole", "h2 blocker",
+    ]),
+    'antihypertensives': ("Blood pressure medications", [
+        "antihypertensive", "blood pressure medication", "hypotensive", "beta blocker", "ace inhibitor",
+    ]),
+    'sedatives': ("Sedatives", ["sedative", "benzodiazepine", "diazepam", "sleeping pill", "cns depressant"]),
+    'diuretics': ("Diuretics", ["diuretic", "furosemide"]),
+    'cardiac_glycosides': ("Cardiac glycosides", ["digoxin", "cardiac glycoside"]),
+    'contraceptives': ("Hormonal contraceptives", ["oral contraceptive", "birth control pill", "hormonal contraceptive"]),
+    'anticonvulsants': ("Anticonvulsants", ["anticonvulsant", "antiepileptic"]),
+    'antiretrovirals': ("Antiretrovirals", ["antiretroviral", "hiv medication"]),
+    'stimulants': ("Stimulants", ["stimulant", "caffeine"]),
+    # Conditions
+    'pregnancy': ("Pregnancy", ["pregnancy", "pregnant"]),
+    'breastfeeding': ("Breastfeeding", ["breastfeeding", "lactation", "nursing mother"]),
+    'children': ("Young children", ["children under", "infant"]),
+    'epilepsy': ("Epilepsy / seizures", ["epilepsy", "seizure"]),
+    'heart_conditions': ("Heart conditions", ["heart condition", "heart disease", "cardiac condition"]),
+    'thyroid_conditions': ("Thyroid conditions", ["thyroid condition", "hypothyroidism", "hyperthyroidism"]),
+    'autoimmune_diseases': ("Autoimmune diseases", ["autoimmune disease", "autoimmune disorder"]),
+    'peptic_ulcers': ("Peptic ulcers", ["peptic ulcer", "stomach ulcer", "gastric ulcer"]),
+    'gallstones': ("Gallstones", ["gallstone", "bile duct obstruction"]),
+    'anxiety_disorders': ("Anxiety disorders", ["anxiety disorder"]),
+    'liver_disease': ("Liver disease", ["liver disease", "hepatic impairment"]),
+    'kidney_disease': ("Kidney disease", ["kidney disease", "renal impairment"]),
+    'diabetes': ("Diabetes", ["diabetes", "diabetic"]),
+    'hypertension': ("High blood pressure", ["hypertension", "high blood pressure"]),
+    'bleeding_disorders': ("Bleeding disorders", ["bleeding disorder", "hemophilia", "haemophilia"]),
+    'surgery': ("Upcoming surgery", ["surgery"]),
+}
+
+SOURCES = PlantInteraction.CAUTION_SOURCES + [PlantInteraction.EFFECT_SOURCE]
+WRITE_BATCH = 1000
+
+
+class Matcher:
+    """Aho–Corasick automaton over lower-cased phrases
+
+    find() returns leftmost-longest, non-overlapping whole-word matches as
+    (start, end, concept) tuples.
+    """
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # per state: (phrase length, concept)
+        for phrase, concept in phrases:
+            state = 0
+            for char in phrase.lower():
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(phrase), concept))
+
+        # Breadth-first failure links; each state inherits its fail state's outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        text = text.lower()
+        candidates = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, concept in self.output[state]:
+                start, end = position + 1 - length, position + 1
+                if end < len(text) and text[end] == 's':
+                    end += 1  # plural
+                if _boundary(text, start - 1) and _boundary(text, end):
+                    candidates.append((start, end, concept))
+
+        matches = []
+        last_end = 0
+        for start, end, concept in sorted(candidates, key=lambda match: (match[0], match[0] - match[1])):
+            if start >= last_end:
+                matches.append((start, end, concept))
+                last_end = end
+        return matches
+
+
+def _boundary(text, index):
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+@lru_cache(maxsize=1)
+def get_matcher():
+    return Matcher((phrase, concept) for concept, (label, phrases) in LEXICON.items() for phrase in phrases)
+
+
+def concepts_in(text):
+    """{concept: matched text} for free text, first mention wins"""
+    found = {}
+    for start, end, concept in get_matcher().find(text or ''):
+        found.setdefault(concept, text[start:end])
+    return found
+
+
+def plant_interactions(plant):
+    """Unsaved PlantInteraction rows for a plant or a .values() row"""
+    def value(field):
+        return plant[field] if isinstance(plant, dict) else getattr(plant, field)
+
+    plant_id = value('id')
+    rows = []
+    for source in SOURCES:
+        text = value(source)
+        if isinstance(text, list):
+            text = '\n'.join(str(item) for item in text)
+        for concept, matched in concepts_in(text).items():
+            rows.append(PlantInteraction(plant_id=plant_id, concept=concept, source=source, matched_text=matched[:200]))
+    return rows
+
+
+def refresh_plant_interactions(plant):
+    """Re-extract one plant's rows after an edit"""
+    with transaction.atomic():
+        PlantInteraction.objects.filter(plant_id=plant.pk).delete()
+        PlantInteraction.objects.bulk_create(plant_interactions(plant))
+
+
+def rebuild_interactions():
+    """Re-extract the whole matrix (after imports or lexicon changes); returns the row count"""
+    rows = Plant.objects.order_by('id').values('id', *SOURCES)
+    with transaction.atomic():
+        PlantInteraction.objects.all().delete()
+        batch, total = [], 0
+        for row in rows.iterator(chunk_size=2000):
+            batch.extend(plant_interactions(row))
+            if len(batch) >= WRITE_BATCH:
+                PlantInteraction.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        PlantInteraction.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def check_interactions(plants, medications):
+    """Conflicts between a set of plants and a medication / condition list
+
+    `plants` is a Plant queryset; its matrix rows are read in one query.
+    Returns medications (with recognized concepts), unrecognized inputs,
+    plant/medication cautions and plant/plant conflicts.
+    """
+    recognized, unrecognized = [], []
+    wanted = defaultdict(list)
+    for medication in medications:
+        concepts = list(concepts_in(medication))
+        if concepts:
+            recognized.append({'input': medication, 'concepts': concepts})
+            for concept in concepts:
+                wanted[concept].append(medication)
+        else:
+            unrecognized.append(medication)
+
+    rows = list(
+        PlantInteraction.objects.filter(plant__in=plants)
+        .order_by('plant__scientific_name', 'concept', 'source')
+        .values('plant_id', 'plant__scientific_name', 'concept', 'source', 'matched_text')
+    )
+
+    cautions = defaultdict(list)  # concept -> caution rows
+    effects = defaultdict(list)  # concept -> plants acting like it
+    medication_conflicts = []
+    for row in rows:
+        if row['source'] == PlantInteraction.EFFECT_SOURCE:
+            effects[row['concept']].append(row)
+            continue
+        cautions[row['concept']].append(row)
+        for medication in wanted.get(row['concept'], []):
+            medication_conflicts.append({
+                'medication': medication,
+                'plant_id': row['plant_id'],
+                'scientific_name': row['plant__scientific_name'],
+                'concept': row['concept'],
+                'label': LEXICON[row['concept']][0],
+                'source': row['source'],
+                'matched_text': row['matched_text'],
+            })
+
+    plant_conflicts = []
+    for concept, effect_rows in effects.items():
+        for caution in cautions.get(concept, []):
+            for effect in effect_rows:
+                if effect['plant_id'] != caution['plant_id']:
+                    plant_conflicts.append({
+                        'plant_id': caution['plant_id'],
+                        'scientific_name': caution['plant__scientific_name'],
+                        'conflicts_with_id': effect['plant_id'],
+                        'conflicts_with': effect['plant__scientific_name'],
+                        'concept': concept,
+                        'label': LEXICON[concept][0],
+                        'source': caution['source'],
+                    })
+
+    return {
+        'medications': recognized,
+        'unrecognized': unrecognized,
+        'medication_conflicts': medication_conflicts,
+        'plant_conflicts': plant_conflicts,
+    }
@@ -0,0 +1,63 @@
+import json
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from plants import api, views
+from plants.models import Plant
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the JSON plant API against the template-rendered pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=api.MAX_LIMIT, help='API page size')
+        parser.add_argument('--fields', default='', help='Sparse fieldset for the API runs')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        plant = Plant.objects.filter(is_verified=True).first()
+        if plant is None:
+            raise CommandError('No verified plants to benchmark; run seed_plants or import_plants first')
+
+        self.verified_count = Plant.objects.filter(is_verified=True).count()
+        factory = RequestFactory()
+        list_params = {'limit': options['limit']}
+        if options['fields']:
+            list_params['fields'] = options['fields']
+        cases = [
+            ('api plant_list', api.plant_list, factory.get('/api/v1/plants/', list_params), ()),
+            ('api plant_detail', api.plant_detail, factory.get('/api/v1/plants/x/'), (plant.scientific_name,)),
+            ('html plant_list', views.plant_list, factory.get('/plants/'), ()),
+            ('html plant_detail', views.plant_detail, factory.get('/plants/x/'), (plant.scientific_name,)),
+        ]
+
+        results = {}
+        for name, view, request, view_args in cases:
+            request.user = AnonymousUser()
+            rows = 0
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                response = view(request, *view_args)
+                rows += self.row_count(name, response)
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'ms_per_request': round(elapsed * 1000 / options['iterations'], 2),
+                'rows_per_sec': round(rows / elapsed) if elapsed else None,
+                'bytes': len(response.content),
+            }
+            if not options['json']:
+                self.stdout.write(
+                    f"{name:20} {results[name]['ms_per_request']:8.2f} ms/request "
+                    f"{results[name]['rows_per_sec'] or 0:>10,} rows/sec {results[name]['bytes']:>9,} bytes"
+                )
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def row_count(self, name, response):
+        if name == 'api plant_list':
+            return len(json.loads(response.content)['results'])
+        if name == 'html plant_list':
+            return self.verified_count
+        return 1
@@ -0,0 +1,74 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from plants import relevance
+from plants.models import Plant
+from plants.views import SMART_SEARCH_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = 'Score search modes against the labelled query set (recall@k, nDCG@k, MRR) alongside latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', default=str(relevance.QUERY_SET), help='Labelled queries (JSON Lines)')
+        parser.add_argument('--mode', action='append', choices=relevance.MODES, dest='modes',
+                            help='Search mode to score (repeatable; default all)')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query')
+        parser.add_argument('--encoder', choices=['auto', 'real', 'fake'], default='auto',
+                            help='Smart search encoder; auto falls back to the deterministic fake one')
+        parser.add_argument('--threshold', type=float, default=SMART_SEARCH_THRESHOLD,
+                            help='Smart search similarity cut-off')
+        parser.add_argument('--details', action='store_true', help='Include per-query results')
+        parser.add_argument('--output', help='Write the results JSON here')
+        parser.add_argument('--baseline', help='Results JSON from an earlier run to show changes against')
+
+    def handle(self, *args, **options):
+        if options['k'] < 1 or options['repeat'] < 1:
+            raise CommandError('--k and --repeat must be positive')
+        try:
+            queries = relevance.load_queries(options['queries'])
+            encoder, encoder_name = relevance.get_encoder(options['encoder'])
+        except (OSError, ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        labelled = {name for item in queries for name in item['relevant']}
+        present = set(Plant.objects.filter(scientific_name__in=labelled, is_verified=True)
+                      .values_list('scientific_name', flat=True))
+        if not present:
+            raise CommandError('None of the labelled plants are in the catalogue; run seed_plants first')
+        if present != labelled:
+            self.stderr.write(f"Missing labelled plants (they count as misses): {', '.join(sorted(labelled - present))}")
+
+        results = {}
+        for mode in options['modes'] or relevance.MODES:
+            search = relevance.searcher(mode, encoder, options['threshold'])
+            results[mode] = relevance.evaluate(queries, search, options['k'], options['repeat'])
+            if not options['details']:
+                del results[mode]['queries']
+
+        report = {
+            'meta': {
+                'queries': len(queries),
+                'k': options['k'],
+                'encoder': encoder_name,
+                'threshold': options['threshold'],
+                'plants': Plant.objects.filter(is_verified=True).count(),
+            },
+            'modes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)['modes']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Can't read baseline: {e}")
+            for mode, result in results.items():
+                for metric, value in result.items():
+                    before = baseline.get(mode, {}).get(metric)
+                    if isinstance(value, float) and isinstance(before, (int, float)) and value != before:
+                        self.stdout.write(f"{mode:6} {metric:16} {before:>9} -> {value:<9} ({value - before:+.4f})")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from plants.interactions import rebuild_interactions
+
+
+class Command(BaseCommand):
+    help = 'Re-extract the herb–drug interaction matrix (run after editing the lexicon)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_interactions()
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} interaction rows"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from plants.similarity import TOP_K, refresh_similar_plants
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed similar plants graph (incremental unless --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-score every plant, not just changed ones')
+        parser.add_argument('--k', type=int, default=TOP_K, help='Neighbours kept per plant')
+
+    def handle(self, *args, **options):
+        rescored = refresh_similar_plants(k=options['k'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Re-scored {rescored} plants"))
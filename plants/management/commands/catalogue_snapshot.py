@@ -0,0 +1,47 @@
+import gc
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from plants.catalogue import build
+
+
+class Command(BaseCommand):
+    help = 'Build the in-process catalogue snapshot and report its build time and memory per worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the measurements as JSON')
+
+    def handle(self, *args, **options):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        catalogue = build()
+        seconds = time.perf_counter() - started
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        plants = len(catalogue)
+        deep = catalogue.memory_bytes()
+        report = {
+            'plants': plants,
+            'images': sum(1 for plant in catalogue.plants if plant.image),
+            'build_ms': round(seconds * 1000, 1),
+            'retained_bytes': retained,
+            'deep_size_bytes': deep,
+            'bytes_per_plant': round(retained / plants) if plants else None,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{plants} plants ({report['images']} with images) loaded in {report['build_ms']} ms"
+        ))
+        self.stdout.write(
+            f"  retained after the build: {retained / 2**20:.2f} MiB"
+            + (f" ({report['bytes_per_plant']:,} bytes per plant)" if plants else "")
+        )
+        self.stdout.write(f"  deep size of the snapshot: {deep / 2**20:.2f} MiB")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from plants.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trending and most viewed plant lists (schedule this every TRENDING_CACHE_SECONDS)'
+
+    def handle(self, *args, **options):
+        trending = refresh_trending()
+        names = ', '.join(row['scientific_name'] for row in trending['trending']) or 'none yet'
+        self.stdout.write(self.style.SUCCESS(f"Trending: {names}"))
@@ -0,0 +1,42 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from plants import exporter
+
+
+class Command(BaseCommand):
+    help = 'Export the plant catalogue as NDJSON or CSV without loading it into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(exporter.FORMATS), default='ndjson')
+        parser.add_argument('--fields', help='Comma-separated fields (default: all but id)')
+        parser.add_argument('--verified', choices=list(exporter.VERIFIED), default='true')
+        parser.add_argument('--region', help='Only plants found in this region')
+        parser.add_argument('--updated-since', help='Only plants updated after this ISO date/time')
+        parser.add_argument('--removed', action='store_true',
+                            help='List plants deleted or un-verified since --updated-since instead')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+        parser.add_argument('--gzip', action='store_true', help='gzip-compress the output')
+        parser.add_argument('--chunk-size', type=int, default=exporter.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            fields = exporter.parse_fields(options['fields'])
+            since = exporter.parse_since(options['updated_since'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['removed']:
+            plants, fields = exporter.removed_rows(since), exporter.REMOVED_FIELDS
+        else:
+            plants = exporter.export_queryset(exporter.VERIFIED[options['verified']], options['region'], since)
+        lines = exporter.export_lines(plants, fields, options['format'], options['chunk_size'])
+        blocks = exporter.encode_stream(lines, compress=options['gzip'])
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for block in blocks:
+                    f.write(block)
+        else:
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
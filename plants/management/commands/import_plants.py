@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from plants.importer import import_records, read_records
+
+
+class Command(BaseCommand):
+    help = 'Import (upsert) plants from JSON Lines or CSV files, validated like the admin PlantForm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='.jsonl/.ndjson or .csv files')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Override format detection')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per upsert transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes used to validate rows (upserts stay in this process)')
+        parser.add_argument('--no-update', action='store_true',
+                            help='Only insert new plants; leave existing ones (and staff edits to them) alone')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        for path in options['paths']:
+            self.stdout.write(f"Importing {path}...")
+            try:
+                records = read_records(path, options['format'])
+                result = import_records(
+                    records, options['chunk_size'], progress=self.report, workers=options['workers'],
+                    update=not options['no_update'],
+                )
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+
+            for line_number, error in result.errors:
+                self.stderr.write(f"  line {line_number}: {error}")
+            if result.failed > len(result.errors):
+                self.stderr.write(f"  ... and {result.failed - len(result.errors)} more errors")
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {result.imported} plants upserted, {result.failed} rejected, "
+                f"{result.rows} rows in {result.elapsed:.2f}s ({result.rate:,.0f} rows/sec)"
+            ))
+
+    def report(self, result):
+        self.stdout.write(f"  {result.rows} rows, {result.imported} upserted ({result.rate:,.0f} rows/sec)")
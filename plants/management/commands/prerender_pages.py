@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from plants.prerender import prerender
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the anonymous plant_detail and plant_list pages (with gzip/brotli variants) to PRERENDER_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Render every page, even unchanged ones')
+
+    def handle(self, *args, **options):
+        if not settings.PRERENDER:
+            self.stdout.write('PRERENDER is off; nothing to pre-render.')
+            return
+        started = time.perf_counter()
+        rendered, unchanged, removed = prerender(
+            force=options['force'],
+            progress=lambda rendered, unchanged: self.stdout.write(f'  {rendered} rendered...'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{rendered} pages rendered, {unchanged} unchanged, {removed} removed '
+            f'in {time.perf_counter() - started:.1f}s to {settings.PRERENDER_ROOT}'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from plants.terms import rebuild_term_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the compound / action / system inverted index from the verified catalogue'
+
+    def handle(self, *args, **options):
+        terms = rebuild_term_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {terms} terms"))
@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from plants.catalogue import bump_generation
+from plants.images import process_plant_image, regenerate, stale_plant_ids
+
+
+class Command(BaseCommand):
+    help = 'Rebuild plant thumbnails from the stored originals, and fetch images whose image_url changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes resizing images (default: one per CPU)')
+        parser.add_argument('--force', action='store_true', help='Overwrite variants that already exist')
+        parser.add_argument('--skip-fetch', action='store_true', help="Don't download new or changed images")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        if not options['skip_fetch']:
+            plant_ids = stale_plant_ids()
+            self.stdout.write(f"Fetching {len(plant_ids)} new or changed images...")
+            for plant_id in plant_ids:
+                image = process_plant_image(plant_id)
+                if image is not None and image.status == image.FAILED:
+                    self.stderr.write(f"  plant {plant_id}: {image.error}")
+            if plant_ids:
+                bump_generation()
+
+        done, errors = regenerate(options['force'], options['workers'], progress=self.report)
+        for source_hash, error in errors:
+            self.stderr.write(f"  {source_hash}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"{done - len(errors)} images thumbnailed, {len(errors)} failed"))
+
+    def report(self, done, total):
+        if done % 100 == 0 or done == total:
+            self.stdout.write(f"  {done}/{total}")
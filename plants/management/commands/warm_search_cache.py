@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from plants.searchlog import cached_search_ids, top_queries
+from plants.views import search_plant_ids
+
+
+class Command(BaseCommand):
+    help = 'Pre-populate the search result cache with the most frequent recent queries (after deploys, with REDIS_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=50, help='How many queries to warm')
+        parser.add_argument('--days', type=int, default=7, help='Look-back window for query popularity')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        queries = top_queries(options['top'], days=options['days'])
+        for query, mode in queries:
+            cached_search_ids(query, mode, search_plant_ids, refresh=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {len(queries)} queries in {time.perf_counter() - started:.1f}s"
+        ))
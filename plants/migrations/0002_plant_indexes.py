@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="plant",
+            index=models.Index(
+                condition=models.Q(("is_verified", True)),
+                fields=["scientific_name"],
+                name="plant_verified_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="plant",
+            index=models.Index(fields=["created_at"], name="plant_created_at_idx"),
+        ),
+    ]
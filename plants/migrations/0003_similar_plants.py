@@ -0,0 +1,86 @@
+# Generated by Django 6.0 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0002_plant_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlantFeatures",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                (
+                    "embedding",
+                    models.BinaryField(
+                        blank=True,
+                        help_text="float32 vector, when the encoder is available",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "plant",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="features",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SimilarPlant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "neighbour",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="plants.plant",
+                    ),
+                ),
+                (
+                    "plant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["plant", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("plant", "rank"), name="similarplant_plant_rank_unique"
+                    )
+                ],
+            },
+        ),
+    ]
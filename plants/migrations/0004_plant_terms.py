@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0003_similar_plants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlantTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field", models.CharField(max_length=50)),
+                ("term", models.CharField(max_length=200)),
+                (
+                    "label",
+                    models.CharField(
+                        help_text="Display form of the term", max_length=200
+                    ),
+                ),
+                ("plant_count", models.PositiveIntegerField(default=0)),
+                (
+                    "postings",
+                    models.BinaryField(
+                        default=b"", help_text="Sorted plant ids, packed as uint32"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["field", "term"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "term"), name="plantterm_field_term_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-19 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0004_plant_terms"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlantInteraction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("concept", models.CharField(max_length=100)),
+                ("source", models.CharField(max_length=50)),
+                ("matched_text", models.CharField(max_length=200)),
+                (
+                    "plant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="interaction_terms",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["plant", "concept"],
+                "indexes": [
+                    models.Index(
+                        fields=["concept", "source"],
+                        name="plantinteraction_concept_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("plant", "concept", "source"),
+                        name="plantinteraction_unique",
+                    )
+                ],
+            },
+        ),
+    ]
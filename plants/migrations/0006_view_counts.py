@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0005_plant_interactions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plant",
+            name="view_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Detail page views, flushed from in-process buffers",
+            ),
+        ),
+        migrations.CreateModel(
+            name="PlantDailyViews",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("views", models.PositiveIntegerField(default=0)),
+                (
+                    "plant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_views",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["day"], name="plantdailyviews_day_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("plant", "day"), name="plantdailyviews_plant_day_unique"
+                    )
+                ],
+            },
+        ),
+    ]
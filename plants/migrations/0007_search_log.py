@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0006_view_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "query",
+                    models.CharField(help_text="Normalized query text", max_length=200),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[("basic", "Basic"), ("smart", "Smart")], max_length=10
+                    ),
+                ),
+                ("latency_ms", models.FloatField()),
+                ("result_count", models.PositiveIntegerField()),
+                ("zero_results", models.BooleanField()),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["created_at"], name="searchlog_created_at_idx"
+                    ),
+                    models.Index(
+                        fields=["mode", "created_at", "latency_ms"],
+                        name="searchlog_mode_latency_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
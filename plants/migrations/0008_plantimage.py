@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-19 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0007_search_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlantImage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source_url",
+                    models.URLField(
+                        blank=True,
+                        help_text="The image_url it was fetched from; blank for uploads",
+                    ),
+                ),
+                (
+                    "source_hash",
+                    models.CharField(
+                        blank=True, help_text="SHA-256 of the original", max_length=64
+                    ),
+                ),
+                ("width", models.PositiveIntegerField(default=0)),
+                ("height", models.PositiveIntegerField(default=0)),
+                (
+                    "widths",
+                    models.JSONField(
+                        default=list, help_text="Thumbnail widths generated"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("error", models.CharField(blank=True, max_length=500)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "plant",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="image",
+                        to="plants.plant",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0008_plantimage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data", models.JSONField(default=dict)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
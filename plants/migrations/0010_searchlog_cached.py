@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0009_trendingsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchlog",
+            name="cached",
+            field=models.BooleanField(
+                default=False, help_text="Answered from the search result cache"
+            ),
+        ),
+    ]
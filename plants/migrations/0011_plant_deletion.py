@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plants", "0010_searchlog_cached"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlantDeletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("plant_id", models.IntegerField()),
+                ("scientific_name", models.CharField(max_length=200)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
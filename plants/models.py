@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 
@@ -49,9 +50,20 @@ class Plant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_verified = models.BooleanField(default=False)
+    view_count = models.PositiveIntegerField(default=0, help_text="Detail page views, flushed from in-process buffers")
 
     class Meta:
         ordering = ['scientific_name']
+        indexes = [
+            # Every public view filters on is_verified and orders by name. Partial
+            # rather than (is_verified, scientific_name) because Django emits a bare
+            # WHERE "is_verified", which SQLite can't seek a composite index on.
+            models.Index(
+                fields=['scientific_name'], condition=models.Q(is_verified=True), name='plant_verified_name_idx'
+            ),
+            # Admin activity windows and recency lists
+            models.Index(fields=['created_at'], name='plant_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.scientific_name} ({', '.join(self.common_names[:2])})"
@@ -59,3 +71,188 @@ class Plant(models.Model):
     def get_primary_common_name(self):
         """Get the first common name for display"""
         return self.common_names[0] if self.common_names else self.scientific_name
+
+
+class PlantFeatures(models.Model):
+    """Fingerprint (and optional sentence embedding) of the content similarity is computed from"""
+    plant = models.OneToOneField(Plant, on_delete=models.CASCADE, related_name='features')
+    content_hash = models.CharField(max_length=64)
+    embedding = models.BinaryField(null=True, blank=True, help_text="float32 vector, when the encoder is available")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Features of {self.plant_id}"
+
+
+class ThumbnailUrls:
+    """srcset helpers over source_hash, width, height and widths (PlantImage, catalogue snapshot images)"""
+    __slots__ = ()
+
+    def url(self, width, fmt='jpeg'):
+        from .images import thumbnail_name
+
+        return settings.THUMBNAIL_URL + thumbnail_name(self.source_hash, width, fmt)
+
+    def srcset(self, fmt='jpeg'):
+        return ', '.join(f"{self.url(width, fmt)} {width}w" for width in self.widths)
+
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    def fallback_url(self):
+        """Smallest JPEG, for browsers without srcset"""
+        return self.url(self.widths[0])
+
+    def fallback_height(self):
+        """Height of the fallback variant, so the browser reserves the right box"""
+        return round(self.height * self.widths[0] / self.width) if self.width else 0
+
+
+class PlantImage(ThumbnailUrls, models.Model):
+    """Locally stored illustration of a plant, thumbnailed by plants.images"""
+    PENDING, READY, FAILED = 'pending', 'ready', 'failed'
+    STATUSES = [(PENDING, 'Pending'), (READY, 'Ready'), (FAILED, 'Failed')]
+
+    plant = models.OneToOneField(Plant, on_delete=models.CASCADE, related_name='image')
+    source_url = models.URLField(blank=True, help_text="The image_url it was fetched from; blank for uploads")
+    source_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the original")
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    widths = models.JSONField(default=list, help_text="Thumbnail widths generated")
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    error = models.CharField(max_length=500, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Image of {self.plant_id} ({self.status})"
+
+    @property
+    def is_ready(self):
+        return self.status == self.READY and bool(self.widths)
+
+
+class SimilarPlant(models.Model):
+    """Precomputed top-k neighbours of a verified plant"""
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='similar')
+    neighbour = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['plant', 'rank']
+        constraints = [
+            # Also the index the detail page reads neighbours through
+            models.UniqueConstraint(fields=['plant', 'rank'], name='similarplant_plant_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.plant_id} ~ {self.neighbour_id} ({self.score:.2f})"
+
+
+class PlantTerm(models.Model):
+    """Inverted index entry: the verified plants listing one normalized term"""
+    field = models.CharField(max_length=50)
+    term = models.CharField(max_length=200)
+    label = models.CharField(max_length=200, help_text="Display form of the term")
+    plant_count = models.PositiveIntegerField(default=0)
+    postings = models.BinaryField(default=b'', help_text="Sorted plant ids, packed as uint32")
+
+    class Meta:
+        ordering = ['field', 'term']
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'term'], name='plantterm_field_term_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.label} ({self.plant_count})"
+
+
+class PlantInteraction(models.Model):
+    """A lexicon concept found in a plant's safety text or pharmacological actions
+
+    Rows from interactions / contraindications / safety_warnings are cautions
+    ("avoid with anticoagulants"); rows from pharmacological_actions say the
+    plant itself acts like that drug class, which is what makes two saved
+    plants conflict.
+    """
+    CAUTION_SOURCES = ['interactions', 'contraindications', 'safety_warnings']
+    EFFECT_SOURCE = 'pharmacological_actions'
+
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='interaction_terms')
+    concept = models.CharField(max_length=100)
+    source = models.CharField(max_length=50)
+    matched_text = models.CharField(max_length=200)
+
+    class Meta:
+        ordering = ['plant', 'concept']
+        constraints = [
+            models.UniqueConstraint(fields=['plant', 'concept', 'source'], name='plantinteraction_unique'),
+        ]
+        indexes = [
+            # "which plants interact with X" lookups
+            models.Index(fields=['concept', 'source'], name='plantinteraction_concept_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plant_id}: {self.concept} ({self.source})"
+
+
+class PlantDeletion(models.Model):
+    """A deleted plant, so incremental exports (updated_since) can tell partners to drop it"""
+    plant_id = models.IntegerField()
+    scientific_name = models.CharField(max_length=200)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.scientific_name} deleted at {self.deleted_at}"
+
+
+class PlantDailyViews(models.Model):
+    """Detail page views per plant per day, the input to trending scores"""
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['plant', 'day'], name='plantdailyviews_plant_day_unique'),
+        ]
+        indexes = [
+            # Trending reads a window of recent days across all plants
+            models.Index(fields=['day'], name='plantdailyviews_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plant_id} on {self.day}: {self.views}"
+
+
+class TrendingSnapshot(models.Model):
+    """The latest trending and most viewed lists (a single row), computed off the request path"""
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Trending at {self.computed_at}"
+
+
+class SearchLog(models.Model):
+    """One plant_list / API search, written in batches by plants.searchlog"""
+    MODES = [('basic', 'Basic'), ('smart', 'Smart')]
+
+    query = models.CharField(max_length=200, help_text="Normalized query text")
+    mode = models.CharField(max_length=10, choices=MODES)
+    latency_ms = models.FloatField()
+    result_count = models.PositiveIntegerField()
+    zero_results = models.BooleanField()
+    cached = models.BooleanField(default=False, help_text="Answered from the search result cache")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Rollups scan a recent window, per mode for latency percentiles
+            models.Index(fields=['created_at'], name='searchlog_created_at_idx'),
+            models.Index(fields=['mode', 'created_at', 'latency_ms'], name='searchlog_mode_latency_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mode}: {self.query} ({self.result_count})"
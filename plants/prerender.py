@@ -0,0 +1,280 @@
+"""Pre-rendered plant pages for anonymous visitors
+
+prerender() writes the anonymous HTML of every plant_detail page and every
+page of the unfiltered plant_list under PRERENDER_ROOT. Each page gets gzip
+and (when the brotli package is installed) brotli variants, compressed once
+when it is written. Files are named by their content hash. A manifest records
+the catalogue generation the pages were built from and a fingerprint of each
+page's inputs. A regeneration only renders pages whose plants, thumbnails,
+similar plants or trending list changed.
+
+PrerenderMiddleware answers anonymous GET and HEAD requests for those URLs
+from disk while the manifest matches the current catalogue generation. An
+edit moves the generation on, and requests fall back to the dynamic views
+(served from the catalogue snapshot) until the 'prerender_pages' job catches
+up. Plant saves queue that job, and so does the first stale request a worker
+sees. List pages also go stale after TRENDING_CACHE_SECONDS because they show
+the trending plants. Requests with a session or messages cookie always get
+the dynamic views. Detail hits still count as plant views for trending.
+
+The generation lives in the cache, so PRERENDER needs a shared one (REDIS_URL).
+With per-process caches no worker's generation would match the manifest.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, HttpRequest, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from botaniq.encoding import accepted_encoding
+from botaniq.querybudget import unbudgeted
+from jobs.runner import register, submit_unique
+from .catalogue import build, current_generation, get_catalogue
+from .trending import record_view
+from .views import plant_detail_context, plant_list_context
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = 'manifest.json'
+MESSAGES_COOKIE = 'messages'
+
+_manifest_cache = (None, None)  # ((path, mtime), manifest)
+_queued = set()  # stale states this process has already queued a regeneration for
+
+
+def _fingerprint(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _image_key(image):
+    return (image.source_hash, image.widths) if image is not None else None
+
+
+def _anonymous_request(path):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.user = AnonymousUser()
+    return request
+
+
+def pages(catalogue):
+    """Yield (key, template, context, fingerprint) for every page to pre-render
+
+    Keys are the decoded request path, plus ?page=N for list pages after the first.
+    """
+    list_path = reverse('plants:plant_list')
+    page_number = 1
+    while True:
+        context = plant_list_context(catalogue.plants, page_number, len(catalogue))
+        page = context['page']
+        fingerprint = _fingerprint(
+            len(catalogue), page.number, page.paginator.num_pages, context['trending'],
+            [(plant.id, plant.updated_at, _image_key(plant.image)) for plant in page],
+        )
+        key = list_path if page.number == 1 else f'{list_path}?page={page.number}'
+        yield key, 'plants/plant_list.html', context, fingerprint
+        if not page.has_next():
+            break
+        page_number += 1
+
+    for plant in catalogue.plants:
+        context = plant_detail_context(plant, catalogue.similar(plant), summarize=False)
+        if context['ai_available'] and context['research_summary'] is None:
+            continue  # the dynamic view generates the summary; the next run picks it up
+        fingerprint = _fingerprint(
+            plant.id, plant.updated_at, _image_key(plant.image), context['research_summary'],
+            [(similar.scientific_name, similar.get_primary_common_name()) for similar in context['similar_plants']],
+        )
+        yield unquote(reverse('plants:plant_detail', args=[plant.scientific_name])), \
+            'plants/plant_detail.html', context, fingerprint
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def write_page(html):
+    """Store a page and its compressed variants; returns (file relative to PRERENDER_ROOT, etag, encodings)"""
+    data = html.encode()
+    etag = hashlib.sha256(data).hexdigest()[:32]
+    relative = f'{etag[:2]}/{etag}.html'
+    path = os.path.join(settings.PRERENDER_ROOT, relative)
+    encodings = ['gzip']
+    if not os.path.exists(path):
+        _write(path, data)
+        _write(f'{path}.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(f'{path}.br', brotli.compress(data, quality=11))
+    if brotli is not None:
+        encodings.insert(0, 'br')
+    return relative, etag, encodings
+
+
+def _remove_page(relative):
+    path = os.path.join(settings.PRERENDER_ROOT, relative)
+    for suffix in ('', '.gz', '.br'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def load_manifest():
+    """The current manifest, re-read only when the file changes"""
+    global _manifest_cache
+    path = os.path.join(settings.PRERENDER_ROOT, MANIFEST)
+    try:
+        state = (path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    cached_state, manifest = _manifest_cache
+    if cached_state != state:
+        with open(path) as f:
+            manifest = json.load(f)
+        _manifest_cache = (state, manifest)
+    return manifest
+
+
+def prerender(force=False, progress=None):
+    """Render every changed page to PRERENDER_ROOT; returns (rendered, unchanged, removed)"""
+    catalogue = get_catalogue() or build(current_generation())
+    previous = {} if force else (load_manifest() or {}).get('pages', {})
+    entries = {}
+    rendered = unchanged = 0
+    for key, template, context, fingerprint in pages(catalogue):
+        entry = previous.get(key)
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            entries[key] = entry
+            unchanged += 1
+            continue
+        html = render_to_string(template, context, request=_anonymous_request(key.split('?')[0]))
+        relative, etag, encodings = write_page(html)
+        entries[key] = {
+            'file': relative, 'etag': etag, 'encodings': encodings, 'fingerprint': fingerprint,
+            'list': template == 'plants/plant_list.html',
+            'plant_id': None if template == 'plants/plant_list.html' else context['plant'].id,
+        }
+        rendered += 1
+        if progress and rendered % 100 == 0:
+            progress(rendered=rendered, unchanged=unchanged)
+
+    manifest = {'generation': catalogue.generation, 'rendered_at': time.time(), 'pages': entries}
+    _write(os.path.join(settings.PRERENDER_ROOT, MANIFEST), json.dumps(manifest).encode())
+    # Only after the new manifest is in place: files the old one (or a forced rebuild's predecessor) used
+    kept = {entry['file'] for entry in entries.values()}
+    removed = 0
+    for directory, _, filenames in os.walk(settings.PRERENDER_ROOT):
+        for filename in filenames:
+            if filename.endswith('.html'):
+                relative = os.path.relpath(os.path.join(directory, filename), settings.PRERENDER_ROOT)
+                if relative not in kept:
+                    _remove_page(relative)
+                    removed += 1
+    return rendered, unchanged, removed
+
+
+@register('prerender_pages')
+def run_prerender(job, report):
+    """Background job: re-render the anonymous plant pages that changed"""
+    rendered, unchanged, removed = prerender(force=job.params.get('force', False), progress=report)
+    report(rendered=rendered, unchanged=unchanged, removed=removed)
+
+
+def queue_prerender():
+    """Queue a regeneration, coalescing like queue_refresh(); a no-op unless PRERENDER is on"""
+    if not settings.PRERENDER:
+        return None
+    job, created = submit_unique('prerender_pages', 'prerender_pages')
+    if not created and job.status == job.RUNNING:
+        job, created = submit_unique('prerender_pages', 'prerender_pages:followup')
+    return job
+
+
+def _queue_once(state):
+    if state in _queued:
+        return
+    if len(_queued) > 1000:
+        _queued.clear()
+    _queued.add(state)
+    with unbudgeted():
+        queue_prerender()
+
+
+def page_key(request):
+    """The manifest key for a request, or None if it can't have been pre-rendered"""
+    if not request.GET:
+        return request.path
+    if list(request.GET) == ['page'] and request.path == reverse('plants:plant_list'):
+        page = request.GET['page']
+        if page.isdigit():
+            return request.path if int(page) == 1 else f'{request.path}?page={int(page)}'
+    return None
+
+
+def serve_prerendered(request):
+    """A response from the pre-rendered pages, or None to render dynamically"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or MESSAGES_COOKIE in request.COOKIES:
+        return None
+    key = page_key(request)
+    manifest = load_manifest() if key else None
+    entry = manifest['pages'].get(key) if manifest else None
+    if entry is None:
+        return None
+    generation = current_generation()
+    if manifest['generation'] != generation:
+        _queue_once(generation)
+        return None
+    if entry['list'] and time.time() - manifest['rendered_at'] > settings.TRENDING_CACHE_SECONDS:
+        _queue_once(('trending', manifest['rendered_at']))
+        return None
+    if entry.get('plant_id'):
+        record_view(entry['plant_id'])
+
+    encoding = accepted_encoding(request, entry['encodings'])
+    etag = f'"{entry["etag"]}-{encoding}"' if encoding else f'"{entry["etag"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        try:
+            f = open(os.path.join(settings.PRERENDER_ROOT, entry['file'] + suffix), 'rb')
+        except FileNotFoundError:
+            return None
+        response = FileResponse(f, content_type='text/html; charset=utf-8')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['X-Frame-Options'] = settings.X_FRAME_OPTIONS
+    response['X-Prerendered'] = '1'
+    patch_vary_headers(response, ['Accept-Encoding', 'Cookie'])
+    return response
+
+
+class PrerenderMiddleware:
+    """Goes before SessionMiddleware: anonymous visitors are told apart by their lack of cookies"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = serve_prerendered(request) if settings.PRERENDER else None
+        return response or self.get_response(request)
@@ -0,0 +1,140 @@
+"""Search relevance and latency against a labelled query set
+
+Each labelled query lists the seed plants that answer it, graded 2 (a direct
+match) or 1 (a partial one). evaluate() runs every query through each search
+mode and reports recall@k, nDCG@k and MRR next to latency.
+
+Smart search uses the sentence encoder when it is installed. Otherwise, or
+with encoder='fake', it uses HashingEncoder, a deterministic bag-of-stems
+embedding that needs nothing beyond the standard library. Fake-encoder
+numbers say nothing about the real model, but they are stable. They show
+whether a change to the search text, the threshold or the fallbacks moved
+results, and they only compare with other fake-encoder runs.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+from pathlib import Path
+
+from botaniq.stats import percentile
+from .models import Plant
+from .views import SMART_SEARCH_THRESHOLD, get_sentence_model, search_plant_ids, smart_search_plants
+
+QUERY_SET = Path(__file__).resolve().parent / 'data' / 'search_relevance.jsonl'
+MODES = ['basic', 'smart']
+
+_WORD = re.compile(r'[a-z0-9]+')
+_SUFFIXES = ('ations', 'ation', 'ions', 'ion', 'ives', 'ive', 'ing', 'ies', 'es', 's', 'al', 'y')
+STOPWORDS = frozenset(
+    'a an and are as at by for from in is it of on or the to with used use plant plants remedy remedies'.split()
+)
+
+
+def load_queries(path=QUERY_SET):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+class HashingEncoder:
+    """Deterministic stand-in for the sentence encoder: hashed bag of word stems"""
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+
+    def embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in _WORD.findall(text.lower()):
+            if word in STOPWORDS:
+                continue
+            digest = hashlib.blake2b(stem(word).encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self.embed(sentences)
+        return [self.embed(sentence) for sentence in sentences]
+
+
+def get_encoder(kind='auto'):
+    """(encoder, name) for 'real', 'fake' or 'auto' (real when installed)"""
+    if kind != 'fake':
+        model = get_sentence_model()
+        if model is not None:
+            return model, 'sentence-transformers'
+        if kind == 'real':
+            raise RuntimeError('The sentence encoder is not installed')
+    return HashingEncoder(), 'hashing'
+
+
+def recall_at_k(ranked, relevant, k):
+    return len(set(ranked[:k]) & set(relevant)) / len(relevant) if relevant else 0.0
+
+
+def ndcg_at_k(ranked, relevant, k):
+    """Normalized discounted cumulative gain with graded relevance (gain 2^grade - 1)"""
+    dcg = sum((2 ** relevant.get(name, 0) - 1) / math.log2(rank + 2) for rank, name in enumerate(ranked[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def reciprocal_rank(ranked, relevant):
+    for rank, name in enumerate(ranked, 1):
+        if name in relevant:
+            return 1 / rank
+    return 0.0
+
+
+def searcher(mode, encoder=None, threshold=SMART_SEARCH_THRESHOLD):
+    """query -> ranked scientific names, the way plant_list searches (uncached)"""
+    if mode == 'smart':
+        return lambda query: [
+            plant.scientific_name for plant in smart_search_plants(query, model=encoder, threshold=threshold)
+        ]
+
+    def basic(query):
+        ids = search_plant_ids(query, 'basic')
+        names = dict(Plant.objects.filter(pk__in=ids).values_list('pk', 'scientific_name'))
+        return [names[pk] for pk in ids if pk in names]
+    return basic
+
+
+def evaluate(queries, search, k=10, repeat=3):
+    """Mean relevance metrics over the query set, latency over every run, and per-query detail"""
+    recalls, ndcgs, reciprocal_ranks, latencies, per_query = [], [], [], [], []
+    for item in queries:
+        relevant = item['relevant']
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ranked = search(item['query'])
+            latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(recall_at_k(ranked, relevant, k))
+        ndcgs.append(ndcg_at_k(ranked, relevant, k))
+        reciprocal_ranks.append(reciprocal_rank(ranked, relevant))
+        per_query.append({
+            'query': item['query'],
+            'results': len(ranked),
+            f'recall@{k}': round(recalls[-1], 3),
+            f'ndcg@{k}': round(ndcgs[-1], 3),
+            'missed': sorted(set(relevant) - set(ranked[:k])),
+        })
+    return {
+        f'recall@{k}': round(sum(recalls) / len(recalls), 4),
+        f'ndcg@{k}': round(sum(ndcgs) / len(ndcgs), 4),
+        'mrr': round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+        'zero_result_rate': round(sum(1 for q in per_query if not q['results']) / len(per_query), 4),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'queries': per_query,
+    }
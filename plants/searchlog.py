@@ -0,0 +1,160 @@
+"""Search analytics: buffered query logging, rollups and the search result cache
+
+Searches are appended to an in-process buffer and bulk-inserted once
+SEARCH_LOG_BATCH_SIZE entries or SEARCH_LOG_FLUSH_SECONDS have accumulated,
+so a search never waits on its own log write. Searches answered from the
+result cache are logged with cached=True and left out of the latency
+percentiles.
+
+Cached results are keyed by the catalogue generation, so an edit makes them
+unreachable. Without a shared cache other workers can't see that bump, so
+results expire within CATALOGUE_MAX_AGE_SECONDS, like the catalogue snapshot.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from botaniq import metrics
+from botaniq.querybudget import unbudgeted
+from .catalogue import current_generation
+from .models import SearchLog
+from .terms import normalize_term
+
+logger = logging.getLogger(__name__)
+
+_buffer = []
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def log_search(query, mode, latency, result_count, cached=False):
+    """Record a search (latency in seconds); written on the next batched flush"""
+    entry = SearchLog(
+        query=normalize_term(query)[:200],
+        mode=mode,
+        latency_ms=round(latency * 1000, 2),
+        result_count=result_count,
+        zero_results=result_count == 0,
+        cached=cached,
+        created_at=timezone.now(),
+    )
+    with _lock:
+        _buffer.append(entry)
+        due = (
+            len(_buffer) >= settings.SEARCH_LOG_BATCH_SIZE
+            or time.monotonic() - _last_flush >= settings.SEARCH_LOG_FLUSH_SECONDS
+        )
+    if due:
+        with unbudgeted():
+            flush_search_log()
+
+
+def flush_search_log():
+    """Bulk-insert buffered searches; returns how many were written"""
+    global _last_flush
+    with _lock:
+        pending = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+    try:
+        SearchLog.objects.bulk_create(pending)
+    except DatabaseError:
+        logger.exception("Could not write %d search log entries; keeping them for the next flush", len(pending))
+        with _lock:
+            # Bounded, so a database outage can't grow the buffer forever
+            _buffer[:0] = pending[-settings.SEARCH_LOG_BATCH_SIZE * 10:]
+        return 0
+    return len(pending)
+
+
+def _flush_at_exit():
+    try:
+        flush_search_log()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def percentile(queryset, field, fraction):
+    """The `fraction` percentile of a numeric field, read with one ORDER BY ... OFFSET query"""
+    total = queryset.count()
+    if not total:
+        return None
+    offset = max(math.ceil(total * fraction) - 1, 0)
+    return queryset.order_by(field).values_list(field, flat=True)[offset]
+
+
+def search_rollup(days=7, top=10):
+    """Top queries, zero-result queries and latency percentiles per mode over the last `days`
+
+    Percentiles only cover searches that missed the result cache.
+    """
+    recent = SearchLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    by_query = recent.values('query').annotate(searches=Count('id')).order_by('-searches', 'query')
+    modes = []
+    for mode, label in SearchLog.MODES:
+        searches = recent.filter(mode=mode)
+        stats = searches.aggregate(
+            searches=Count('id'), zero=Count('id', filter=Q(zero_results=True)), cached=Count('id', filter=Q(cached=True)),
+        )
+        if stats['searches']:
+            uncached = searches.filter(cached=False)
+            modes.append({
+                'mode': label,
+                'searches': stats['searches'],
+                'zero_rate': round(100 * stats['zero'] / stats['searches'], 1),
+                'cache_rate': round(100 * stats['cached'] / stats['searches'], 1),
+                'p50_ms': percentile(uncached, 'latency_ms', 0.5),
+                'p95_ms': percentile(uncached, 'latency_ms', 0.95),
+            })
+    return {
+        'days': days,
+        'top_queries': list(by_query[:top]),
+        'zero_result_queries': list(by_query.filter(zero_results=True)[:top]),
+        'modes': modes,
+    }
+
+
+def top_queries(limit, days=7):
+    """[(query, mode)] most searched recently, for cache warming"""
+    recent = SearchLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=days), zero_results=False)
+    rows = recent.values('query', 'mode').annotate(searches=Count('id')).order_by('-searches', 'query')[:limit]
+    return [(row['query'], row['mode']) for row in rows]
+
+
+def search_cache_key(query, mode):
+    digest = hashlib.sha1(normalize_term(query).encode()).hexdigest()
+    return f'plants:search:{current_generation()}:{mode}:{digest}'
+
+
+def search_cache_seconds():
+    if settings.REDIS_URL:
+        return settings.SEARCH_CACHE_SECONDS
+    return min(settings.SEARCH_CACHE_SECONDS, settings.CATALOGUE_MAX_AGE_SECONDS)
+
+
+def cached_search_ids(query, mode, search, refresh=False):
+    """(ranked plant ids, whether they came from the cache) for a query; misses call search(query, mode)"""
+    key = search_cache_key(query, mode)
+    ids = None if refresh else cache.get(key)
+    if not refresh:
+        metrics.CACHE_REQUESTS.inc(cache='search', result='miss' if ids is None else 'hit')
+    if ids is not None:
+        return ids, True
+    ids = search(query, mode)
+    cache.set(key, ids, search_cache_seconds())
+    return ids, False
@@ -0,0 +1,76 @@
+"""Keep the term index, interaction matrix, similar plants graph, thumbnails and snapshot in step with catalogue edits"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalogue import bump_generation
+from .images import needs_processing, queue_images
+from .interactions import refresh_plant_interactions
+from .models import Plant, PlantDeletion, SimilarPlant
+from .prerender import queue_prerender
+from .similarity import queue_refresh
+from .terms import TERM_FIELDS, term_labels, update_plant_terms
+
+_bulk = ContextVar('plants_bulk_changes', default=False)
+
+
+@contextmanager
+def bulk_changes():
+    """Skip per-plant upkeep inside; the caller rebuilds the index, matrix and graph once afterwards
+
+    Deletions inside aren't logged for incremental exports either.
+    """
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+def _indexed_labels(plant_id):
+    """Term labels the index currently holds for a plant, per its stored row"""
+    row = Plant.objects.filter(pk=plant_id, is_verified=True).values(*TERM_FIELDS).first()
+    return term_labels(row) if row else {}
+
+
+@receiver(pre_save, sender=Plant)
+def remember_plant_terms(sender, instance, raw=False, **kwargs):
+    if not (raw or _bulk.get()):
+        instance._indexed_labels = _indexed_labels(instance.pk) if instance.pk else {}
+
+
+@receiver(post_save, sender=Plant)
+def plant_saved(sender, instance, raw=False, **kwargs):
+    if raw or _bulk.get():
+        return
+    update_plant_terms(
+        instance.pk, instance._indexed_labels, term_labels(instance) if instance.is_verified else {}
+    )
+    refresh_plant_interactions(instance)
+    bump_generation()
+    queue_refresh([instance.pk])
+    queue_prerender()
+    if needs_processing(instance):
+        queue_images()
+
+
+@receiver(pre_delete, sender=Plant)
+def remember_deleted_plant_terms(sender, instance, **kwargs):
+    if not _bulk.get():
+        instance._indexed_labels = _indexed_labels(instance.pk)
+        # Their similar plants lists lose this one when the cascade deletes its rows
+        instance._similar_to = list(SimilarPlant.objects.filter(neighbour=instance).values_list('plant_id', flat=True))
+
+
+@receiver(post_delete, sender=Plant)
+def plant_deleted(sender, instance, **kwargs):
+    if _bulk.get():
+        return
+    PlantDeletion.objects.create(plant_id=instance.pk, scientific_name=instance.scientific_name)
+    update_plant_terms(instance.pk, getattr(instance, '_indexed_labels', {}), {})
+    bump_generation()
+    if getattr(instance, '_similar_to', None):
+        queue_refresh(instance._similar_to)
+    queue_prerender()
@@ -0,0 +1,291 @@
+"""Precomputed "similar plants" graph
+
+Similarity between two verified plants is the Jaccard overlap of their
+normalized active compounds, pharmacological actions and traditional
+systems, blended 50/50 with the cosine of their sentence embeddings when
+the encoder is installed. The overlap counts are the sparse product of the
+plant x term incidence matrix with its transpose, computed row by row by
+walking each term's postings list, so only plants that share a term are
+ever compared.
+
+refresh_similar_plants() only re-scores plants whose content fingerprint
+changed, plus the plants whose top-k those changes can affect. Given the ids
+of edited plants, it loads only their neighbourhood through the PlantTerm
+postings instead of the whole catalogue; the per-edit job does that.
+"""
+import hashlib
+import heapq
+import json
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from botaniq import metrics
+from jobs.models import Job
+from jobs.runner import register, submit_unique
+from .catalogue import bump_generation
+from .models import Plant, PlantFeatures, PlantTerm, SimilarPlant
+from .terms import TERM_FIELDS, plant_terms, unpack_ids
+
+TOP_K = 6
+EMBEDDING_WEIGHT = 0.5
+HASHED_FIELDS = ['scientific_name', 'common_names', 'description', 'cultural_uses'] + TERM_FIELDS
+WRITE_BATCH = 500
+
+
+def content_hash(row):
+    payload = json.dumps([row[field] for field in HASHED_FIELDS], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _encoder():
+    """(model, numpy) when the sentence encoder is usable, else (None, None)"""
+    from . import views
+    if not views.ML_AVAILABLE:
+        return None, None
+    model = views.get_sentence_model()
+    return (model, views.np) if model else (None, None)
+
+
+class SimilarityIndex:
+    """In-memory postings and embeddings for the verified catalogue"""
+
+    def __init__(self, terms, embeddings=None, np=None):
+        self.terms = terms  # plant id -> set of (field, term)
+        self.postings = defaultdict(list)
+        for plant_id, plant_terms_ in terms.items():
+            for term in plant_terms_:
+                self.postings[term].append(plant_id)
+
+        self.np = np
+        self.ids = list(terms)
+        self.matrix = None
+        if np is not None and embeddings:
+            self.ids = [plant_id for plant_id in terms if plant_id in embeddings]
+            self.matrix = np.vstack([embeddings[plant_id] for plant_id in self.ids])
+            self.matrix /= np.maximum(np.linalg.norm(self.matrix, axis=1, keepdims=True), 1e-12)
+            self.row_of = {plant_id: row for row, plant_id in enumerate(self.ids)}
+
+    def scores(self, plant_id):
+        """Similarity of plant_id to every other plant it relates to: {other_id: score}"""
+        own = self.terms[plant_id]
+        overlap = Counter()
+        for term in own:
+            overlap.update(self.postings[term])
+        overlap.pop(plant_id, None)
+
+        scores = {
+            other: shared / (len(own) + len(self.terms[other]) - shared)
+            for other, shared in overlap.items()
+        }
+        if self.matrix is not None and plant_id in self.row_of:
+            cosines = self.matrix @ self.matrix[self.row_of[plant_id]]
+            blended = {}
+            for row, other in enumerate(self.ids):
+                if other != plant_id:
+                    blended[other] = (
+                        (1 - EMBEDDING_WEIGHT) * scores.get(other, 0.0)
+                        + EMBEDDING_WEIGHT * max(float(cosines[row]), 0.0)
+                    )
+            scores = blended
+        return {other: score for other, score in scores.items() if score > 0}
+
+
+def top_k(scores, k=TOP_K):
+    # Ties broken by id so rebuilds are deterministic
+    return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def refresh_similar_plants(k=TOP_K, full=False, plant_ids=None):
+    """Bring SimilarPlant up to date; returns the number of plants re-scored
+
+    plant_ids limits the check to those plants (which are re-scored even if
+    unchanged) and the lists they can enter or leave. With the sentence
+    encoder every pair of plants has a score, so that needs the whole pass.
+    """
+    if plant_ids is not None and not full and _encoder()[1] is None:
+        return _refresh_neighbourhood(set(plant_ids), k)
+
+    rows = {row['id']: row for row in Plant.objects.filter(is_verified=True).values('id', *HASHED_FIELDS)}
+    stored = {
+        plant_id: (digest, embedding)
+        for plant_id, digest, embedding in PlantFeatures.objects.values_list('plant_id', 'content_hash', 'embedding')
+    }
+    hashes = {plant_id: content_hash(row) for plant_id, row in rows.items()}
+    changed = {plant_id for plant_id, digest in hashes.items() if stored.get(plant_id, (None,))[0] != digest}
+    removed = set(stored) - set(rows)
+
+    model, np = _encoder()
+    embeddings = {}
+    if np is not None:
+        embeddings = {
+            plant_id: np.frombuffer(embedding, dtype=np.float32)
+            for plant_id, (digest, embedding) in stored.items() if embedding and plant_id not in changed
+        }
+        # Plants stored before the encoder was installed need an embedding too
+        changed |= {plant_id for plant_id in rows if plant_id not in embeddings and plant_id not in changed}
+        to_encode = sorted(changed)
+        if to_encode:
+            from .views import plant_search_text
+            plants = Plant.objects.in_bulk(to_encode)
+            metrics.ENCODER_BATCH.observe(len(to_encode), caller='similarity')
+            vectors = model.encode([plant_search_text(plants[plant_id]) for plant_id in to_encode])
+            for plant_id, vector in zip(to_encode, vectors):
+                embeddings[plant_id] = np.asarray(vector, dtype=np.float32)
+
+    index = SimilarityIndex({plant_id: plant_terms(row) for plant_id, row in rows.items()}, embeddings, np)
+
+    if full:
+        dirty = set(rows)
+        changed = set(rows)
+    else:
+        dirty = set(changed)
+        current = defaultdict(list)
+        for plant_id, neighbour_id, score in SimilarPlant.objects.values_list('plant_id', 'neighbour_id', 'score'):
+            current[plant_id].append((neighbour_id, score))
+        touched = changed | removed
+        for plant_id in rows:
+            if plant_id in dirty:
+                continue
+            if any(neighbour_id in touched for neighbour_id, score in current.get(plant_id, [])):
+                dirty.add(plant_id)
+        # Scores are symmetric, so a changed plant can only enter the lists of
+        # plants it scores against, and only if it beats their k-th entry
+        for plant_id in changed:
+            for other, score in index.scores(plant_id).items():
+                neighbours = current.get(other, [])
+                if other not in dirty and (len(neighbours) < k or score > min(s for n, s in neighbours)):
+                    dirty.add(other)
+
+    _write(index, k, dirty, changed, removed, hashes, embeddings)
+    return len(dirty)
+
+
+def _postings(terms):
+    """Ids of the verified plants listing any of these (field, term) pairs, from the inverted index"""
+    by_field = defaultdict(list)
+    for field, term in terms:
+        by_field[field].append(term)
+    ids = set()
+    for field, values in by_field.items():
+        for postings in PlantTerm.objects.filter(field=field, term__in=values).order_by().values_list('postings', flat=True):
+            ids.update(unpack_ids(postings))
+    return ids
+
+
+def _load_terms(terms, plant_ids):
+    """Add the term sets of verified plants not loaded yet"""
+    missing = set(plant_ids) - set(terms)
+    if missing:
+        for row in Plant.objects.filter(id__in=missing, is_verified=True).values('id', *TERM_FIELDS):
+            terms[row['id']] = plant_terms(row)
+
+
+def _refresh_neighbourhood(plant_ids, k):
+    """refresh_similar_plants() for a few edited plants, loading only the plants that share terms with them"""
+    rows = {
+        row['id']: row
+        for row in Plant.objects.filter(id__in=plant_ids, is_verified=True).values('id', *HASHED_FIELDS)
+    }
+    stored = dict(PlantFeatures.objects.filter(plant_id__in=plant_ids).values_list('plant_id', 'content_hash'))
+    hashes = {plant_id: content_hash(row) for plant_id, row in rows.items()}
+    changed = {plant_id for plant_id, digest in hashes.items() if stored.get(plant_id) != digest}
+    removed = set(stored) - set(rows)
+
+    # A changed plant's old terms are in its stored lists' neighbours; its new ones are in the postings
+    terms = {plant_id: plant_terms(row) for plant_id, row in rows.items()}
+    sharers = _postings(set().union(*(terms[plant_id] for plant_id in changed))) - set(rows)
+    _load_terms(terms, sharers)
+    index = SimilarityIndex(terms)
+
+    touched = changed | removed
+    dirty = set(rows) | set(
+        SimilarPlant.objects.filter(neighbour_id__in=touched).order_by().values_list('plant_id', flat=True)
+    )
+    current = defaultdict(list)
+    for plant_id, score in SimilarPlant.objects.filter(plant_id__in=sharers).order_by().values_list('plant_id', 'score'):
+        current[plant_id].append(score)
+    for plant_id in changed:
+        for other, score in index.scores(plant_id).items():
+            if other not in dirty and (len(current[other]) < k or score > min(current[other])):
+                dirty.add(other)
+
+    # Scoring a plant needs every plant that shares a term with it
+    _load_terms(terms, dirty)
+    dirty &= set(terms)
+    _load_terms(terms, _postings(set().union(*(terms[plant_id] for plant_id in dirty))))
+    _write(SimilarityIndex(terms), k, dirty, changed, removed, hashes, {})
+    return len(dirty)
+
+
+def _write(index, k, dirty, changed, removed, hashes, embeddings):
+    """Replace the lists of the dirty plants and store the fingerprints of the changed ones"""
+    dirty_list = sorted(dirty)
+    with transaction.atomic():
+        SimilarPlant.objects.filter(plant_id__in=removed).delete()
+        SimilarPlant.objects.filter(neighbour_id__in=removed).delete()
+        PlantFeatures.objects.filter(plant_id__in=removed).delete()
+
+    for start in range(0, len(dirty_list), WRITE_BATCH):
+        batch = dirty_list[start:start + WRITE_BATCH]
+        with transaction.atomic():
+            SimilarPlant.objects.filter(plant_id__in=batch).delete()
+            SimilarPlant.objects.bulk_create([
+                SimilarPlant(plant_id=plant_id, neighbour_id=other, score=round(score, 6), rank=rank)
+                for plant_id in batch
+                for rank, (other, score) in enumerate(top_k(index.scores(plant_id), k), start=1)
+            ])
+
+    PlantFeatures.objects.bulk_create(
+        [
+            PlantFeatures(
+                plant_id=plant_id,
+                content_hash=hashes[plant_id],
+                embedding=embeddings[plant_id].tobytes() if plant_id in embeddings else None,
+            )
+            for plant_id in sorted(changed)
+        ],
+        update_conflicts=True,
+        unique_fields=['plant'],
+        update_fields=['content_hash', 'embedding', 'updated_at'],
+        batch_size=WRITE_BATCH,
+    )
+    if dirty or removed:
+        bump_generation()
+
+
+@register('similar_plants')
+def run_similar_plants(job, report):
+    """Background job: incremental refresh of the similar plants graph"""
+    report(rescored=refresh_similar_plants(full=job.params.get('full', False), plant_ids=job.params.get('plant_ids')))
+
+
+def queue_refresh(plant_ids=None):
+    """Queue an incremental refresh, coalescing with any refresh already pending
+
+    plant_ids scopes the refresh to those plants' neighbourhoods; a pending
+    scoped refresh takes on the new ids, and an unscoped one covers them
+    anyway. A refresh that is already running may have read the catalogue
+    before the latest change, so one follow-up is queued behind it.
+    """
+    params = {} if plant_ids is None else {'plant_ids': sorted(set(plant_ids))}
+    for dedupe_key in ('similar_plants', 'similar_plants:followup'):
+        job, created = submit_unique('similar_plants', dedupe_key, params)
+        if created or _merge_pending(job, params):
+            return job
+    return job
+
+
+def _merge_pending(job, params):
+    """Widen a still-queued refresh to cover params; False once it has started"""
+    with transaction.atomic():
+        job = Job.objects.select_for_update().filter(pk=job.pk, status=Job.QUEUED).first()
+        if job is None:
+            return False
+        if 'plant_ids' in job.params:
+            if 'plant_ids' in params:
+                job.params['plant_ids'] = sorted(set(job.params['plant_ids']) | set(params['plant_ids']))
+            else:
+                del job.params['plant_ids']
+            job.save(update_fields=['params'])
+    return True
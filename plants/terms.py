@@ -0,0 +1,184 @@
+"""Normalisation of the list fields that relate plants, and their inverted index
+
+PlantTerm keeps, per (field, normalized term), the ids of the verified plants
+listing it as a sorted uint32 array. Browse queries such as
+"Anti-inflammatory AND Antioxidant" are answered by intersecting and merging
+those arrays in memory, then loading only the plants on the requested page.
+"""
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import merge
+
+from django.db import transaction
+
+# List fields whose shared values make two plants related
+TERM_FIELDS = ['active_compounds', 'pharmacological_actions', 'traditional_systems']
+
+WRITE_BATCH = 500
+
+
+def normalize_term(value):
+    """Case-fold and collapse whitespace so 'Anti-Inflammatory ' == 'anti-inflammatory'"""
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+
+def term_labels(row, fields=TERM_FIELDS):
+    """{(field, normalized term): value as written} for a plant or a .values() row"""
+    labels = {}
+    for field in fields:
+        values = row[field] if isinstance(row, dict) else getattr(row, field)
+        for value in values or []:
+            term = normalize_term(value)
+            if term:
+                labels.setdefault((field, term), re.sub(r'\s+', ' ', str(value)).strip())
+    return labels
+
+
+def plant_terms(row, fields=TERM_FIELDS):
+    """Set of (field, normalized term) pairs for a plant or a .values() row"""
+    return set(term_labels(row, fields))
+
+
+def pack_ids(ids):
+    ids = array('I', ids)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids.tobytes()
+
+
+def unpack_ids(blob):
+    ids = array('I')
+    ids.frombytes(bytes(blob))
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+def intersect(a, b):
+    """Intersection of two sorted id arrays
+
+    Walks the shorter one and binary-searches forward in the longer, so
+    "rare AND common" costs O(rare * log common).
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = array('I')
+    lo = 0
+    for value in a:
+        lo = bisect_left(b, value, lo)
+        if lo == len(b):
+            break
+        if b[lo] == value:
+            result.append(value)
+    return result
+
+
+def union(*arrays):
+    """Union of sorted id arrays"""
+    result = array('I')
+    for value in merge(*arrays):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+
+def parse_query(query):
+    """'a AND b OR c' -> [['a', 'b'], ['c']]; AND binds tighter than OR
+
+    Operators are upper-case so terms like 'Bark and leaf extract' survive.
+    """
+    groups = []
+    for clause in re.split(r'\s+OR\s+', query.strip()):
+        terms = [normalize_term(term) for term in re.split(r'\s+AND\s+', clause)]
+        terms = [term for term in terms if term]
+        if terms:
+            groups.append(terms)
+    return groups
+
+
+def lookup(field, query):
+    """Sorted ids of the verified plants matching a parsed browse query"""
+    from .models import PlantTerm
+
+    groups = parse_query(query)
+    wanted = {term for group in groups for term in group}
+    postings = {
+        term: unpack_ids(blob)
+        for term, blob in PlantTerm.objects.filter(field=field, term__in=wanted).values_list('term', 'postings')
+    }
+    matches = []
+    for group in groups:
+        # Start from the rarest term; an unknown term empties the group
+        group = sorted(group, key=lambda term: len(postings.get(term, ())))
+        ids = postings.get(group[0], array('I'))
+        for term in group[1:]:
+            if not ids:
+                break
+            ids = intersect(ids, postings.get(term, array('I')))
+        matches.append(ids)
+    return union(*matches)
+
+
+def rebuild_term_index():
+    """Rebuild PlantTerm from the verified catalogue; returns the number of terms"""
+    from .models import Plant, PlantTerm
+
+    postings = defaultdict(list)
+    labels = defaultdict(Counter)
+    rows = Plant.objects.filter(is_verified=True).order_by('id').values('id', *TERM_FIELDS)
+    for row in rows.iterator(chunk_size=2000):
+        for key, label in term_labels(row).items():
+            postings[key].append(row['id'])
+            labels[key][label] += 1
+
+    with transaction.atomic():
+        PlantTerm.objects.all().delete()
+        PlantTerm.objects.bulk_create(
+            (
+                PlantTerm(
+                    field=field, term=term, label=labels[field, term].most_common(1)[0][0],
+                    plant_count=len(ids), postings=pack_ids(ids),
+                )
+                for (field, term), ids in postings.items()
+            ),
+            batch_size=WRITE_BATCH,
+        )
+    return len(postings)
+
+
+def update_plant_terms(plant_id, old_labels, new_labels):
+    """Move one plant between postings lists after an edit
+
+    Labels are {(field, term): label} as returned by term_labels(); pass an
+    empty dict for a plant that is (or was) unverified or deleted.
+    """
+    from .models import PlantTerm
+
+    removed = set(old_labels) - set(new_labels)
+    added = set(new_labels) - set(old_labels)
+    if not removed and not added:
+        return
+    touched = removed | added
+    with transaction.atomic():
+        entries = {
+            (entry.field, entry.term): entry
+            for entry in PlantTerm.objects.select_for_update().filter(
+                field__in={field for field, term in touched}, term__in={term for field, term in touched}
+            )
+            if (entry.field, entry.term) in touched
+        }
+        for key in touched:
+            entry = entries.get(key) or PlantTerm(field=key[0], term=key[1], label=new_labels.get(key, key[1]))
+            ids = [pid for pid in unpack_ids(entry.postings) if pid != plant_id]
+            if key in added:
+                ids.insert(bisect_left(ids, plant_id), plant_id)
+            if not ids:
+                if entry.pk:
+                    entry.delete()
+                continue
+            entry.postings = pack_ids(ids)
+            entry.plant_count = len(ids)
+            entry.save()
@@ -1,6 +1,30 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import math
+import os
+import shutil
+import socket
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+import requests
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
-from .models import Plant
+from django.utils import timezone
+from botaniq import metrics
+from jobs.models import Job
+from .interactions import Matcher, concepts_in
+from .models import Plant, PlantDailyViews, PlantImage, PlantInteraction, PlantTerm, SearchLog, SimilarPlant
+from .similarity import queue_refresh, refresh_similar_plants
+from . import catalogue, images, prerender, relevance, searchlog, trending
+from .terms import intersect, lookup, pack_ids, parse_query, rebuild_term_index, unpack_ids
 
 
 class PlantModelTest(TestCase):
@@ -74,8 +98,941 @@ class PlantViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Testus plantus")
 
+    def test_logged_in_search_fits_the_query_budget(self):
+        """Test that a logged-in search stays within plant_list's budget, with or without the snapshot"""
+        user = User.objects.create_user(username='researcher', password='testpass123')
+        self.client.force_login(user)
+        url = reverse('plants:plant_list')
+        self.addCleanup(searchlog._buffer.clear)
+        for search_type in ('basic', 'smart'):
+            with self.settings(CATALOGUE_SNAPSHOT=False):
+                cache.clear()
+                # session, user, matching ids, count and the plants themselves
+                with self.assertNumQueries(5):
+                    response = self.client.get(url, {'q': "test plant", 'search_type': search_type})
+                self.assertContains(response, "Testus plantus")
+            cache.clear()
+            self.client.get(url, {'q': "test plant", 'search_type': search_type})
+            response = self.client.get(url, {'q': "test plant", 'search_type': search_type})
+            self.assertContains(response, "Testus plantus")
+
     def test_plant_detail_view(self):
         """Test that plant detail view returns 200"""
         response = self.client.get(reverse('plants:plant_detail', args=[self.plant.scientific_name]))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Testus plantus")
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0, SERVER_TIMING_PUBLIC=False)
+    @mock.patch.dict(os.environ, {'MISTRAL_API_KEY': 'test-key'})
+    @mock.patch('plants.views.get_research_summary', return_value="Summary")
+    def test_server_timing(self, summary):
+        """Test that the detail page reports db, template and Mistral phases in Server-Timing (staff only) and the log"""
+        url = reverse('plants:plant_detail', args=[self.plant.scientific_name])
+        self.client.force_login(User.objects.create_user(username='curator', password='testpass123', is_staff=True))
+        with self.assertLogs('botaniq.timing', level='INFO') as logs:
+            response = self.client.get(url)
+        metrics = {metric.split(';')[0]: metric for metric in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(metrics), {'db', 'tpl', 'mistral', 'total'})
+        self.assertRegex(metrics['db'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+        self.client.logout()
+        with self.assertLogs('botaniq.timing', level='INFO'):
+            self.assertNotIn('Server-Timing', self.client.get(url))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'plants:plant_detail')
+        self.assertGreater(line['queries'], 0)
+        self.assertIn('mistral_ms', line)
+
+
+class ImportPlantsTest(TestCase):
+    def write(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_jsonl_upsert_and_validation(self):
+        """Test that JSON Lines rows are validated and upserted by scientific name"""
+        Plant.objects.create(
+            common_names=["Old"], scientific_name="Testus plantus", plant_family="Oldaceae", description="Old"
+        )
+        rows = [
+            {"common_names": ["Test Plant"], "scientific_name": "Testus plantus", "plant_family": "Testaceae",
+             "description": "Updated", "active_compounds": ["1,8-Cineole"], "is_verified": True},
+            {"common_names": ["Second"], "scientific_name": "Secundus plantus", "plant_family": "Testaceae",
+             "description": "New"},
+            {"common_names": [], "scientific_name": "Invalidus", "plant_family": "Testaceae", "description": "No names"},
+        ]
+        path = self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+        err = StringIO()
+        call_command('import_plants', path, '--chunk-size', '1', stdout=StringIO(), stderr=err)
+
+        plant = Plant.objects.get(scientific_name="Testus plantus")
+        self.assertEqual(plant.description, "Updated")
+        self.assertEqual(plant.active_compounds, ["1,8-Cineole"])
+        self.assertFalse(plant.is_verified)  # verification stays a staff decision
+        self.assertEqual(Plant.objects.count(), 2)
+        self.assertIn("line 3: common_names", err.getvalue())
+        self.assertIn("line 4: Invalid JSON", err.getvalue())
+
+    def test_csv_uses_form_separators(self):
+        """Test that CSV cells are split like the admin form fields"""
+        path = self.write('.csv', (
+            'scientific_name,common_names,plant_family,description,cultural_uses,is_verified\n'
+            'Testus plantus,"Test Plant, Tester",Testaceae,A plant,"Tea\nPoultice",false\n'
+        ))
+        call_command('import_plants', path, stdout=StringIO())
+        plant = Plant.objects.get(scientific_name="Testus plantus")
+        self.assertEqual(plant.common_names, ["Test Plant", "Tester"])
+        self.assertEqual(plant.cultural_uses, ["Tea", "Poultice"])
+        self.assertFalse(plant.is_verified)
+
+        path = self.write('.csv', (
+            'scientific_name,common_names,plant_family,description,is_verified\n'
+            'Alter plantus,Other,Testaceae,A plant,off\n'
+        ))
+        err = StringIO()
+        call_command('import_plants', path, stdout=StringIO(), stderr=err)
+        self.assertIn("line 2: is_verified", err.getvalue())
+        self.assertFalse(Plant.objects.filter(scientific_name="Alter plantus").exists())
+
+    def test_seed_plants_is_repeatable(self):
+        """Test that seeding twice leaves one row per seed plant and keeps staff edits"""
+        with self.settings(PRERENDER=True):
+            call_command('seed_plants', stdout=StringIO())
+        self.assertTrue(Job.objects.filter(kind='prerender_pages').exists())
+        plant = Plant.objects.order_by('scientific_name').first()
+        Plant.objects.filter(pk=plant.pk).update(description="Edited by staff", is_verified=False)
+        Job.objects.all().delete()
+        stdout = StringIO()
+        with mock.patch('plants.importer.rebuild_term_index') as rebuild:
+            call_command('seed_plants', stdout=stdout)
+        # Nothing new: no catalogue-wide rebuilds or background passes
+        rebuild.assert_not_called()
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Plant.objects.count(), 20)
+        self.assertEqual(Plant.objects.filter(is_verified=True).count(), 19)
+        self.assertEqual(Plant.objects.get(pk=plant.pk).description, "Edited by staff")
+
+
+class ExportPlantsTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='curator', password='testpass123', is_staff=True)
+        for name, regions, verified in [
+            ("Testus plantus", ["Kenya"], True),
+            ("Secundus plantus", ["Uganda"], True),
+            ("Hiddenus plantus", ["Kenya"], False),
+        ]:
+            Plant.objects.create(
+                common_names=[name.split()[0]], scientific_name=name, plant_family="Testaceae",
+                description="A test plant", regions=regions, active_compounds=["1,8-Cineole"], is_verified=verified
+            )
+
+    def test_export_requires_staff_or_token(self):
+        """Test that anonymous callers can't dump the catalogue"""
+        url = reverse('plants:export_plants')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with mock.patch.dict(os.environ, {'EXPORT_TOKEN': 'partner-secret'}):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer partner-secret')
+            self.assertEqual(response.status_code, 200)
+            # Never in the URL, where it would be logged
+            self.assertEqual(self.client.get(url, {'token': 'partner-secret'}).status_code, 403)
+
+    def test_ndjson_field_selection_and_filters(self):
+        """Test sparse fields plus verification and region filters"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('plants:export_plants'), {
+            'fields': 'scientific_name,regions', 'region': 'Kenya', 'verified': 'all'
+        })
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(
+            sorted(row['scientific_name'] for row in rows), ["Hiddenus plantus", "Testus plantus"]
+        )
+        self.assertEqual(set(rows[0]), {'scientific_name', 'regions'})
+        response = self.client.get(reverse('plants:export_plants'), {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('plants:export_plants'), {'verified': 'yes'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_gzip_and_updated_since(self):
+        """Test on-the-fly compression and incremental sync"""
+        self.client.force_login(self.staff)
+        since = timezone.now().isoformat()
+        Plant.objects.filter(scientific_name="Secundus plantus").update(updated_at=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(
+            reverse('plants:export_plants'), {'updated_since': since}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual([json.loads(line)['scientific_name'] for line in body.splitlines()], ["Secundus plantus"])
+        response = self.client.get(reverse('plants:export_plants'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_removed_plants_feed(self):
+        """Test that incremental syncs learn about deleted and un-verified plants"""
+        self.client.force_login(self.staff)
+        since = timezone.now() - timedelta(seconds=1)
+        Plant.objects.get(scientific_name="Testus plantus").delete()
+        plant = Plant.objects.get(scientific_name="Secundus plantus")
+        plant.is_verified = False
+        plant.save()
+        response = self.client.get(reverse('plants:export_plants'), {
+            'removed': 'true', 'updated_since': since.isoformat(), 'format': 'csv'
+        })
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(
+            [(row['scientific_name'], row['reason']) for row in rows],
+            [("Hiddenus plantus", 'unverified'), ("Testus plantus", 'deleted'), ("Secundus plantus", 'unverified')]
+        )
+
+    def test_csv_export_round_trips_through_import(self):
+        """Test that a CSV export can be re-imported without mangling list items"""
+        path = os.path.join(tempfile.mkdtemp(), 'plants.csv')
+        self.addCleanup(os.remove, path)
+        call_command('export_plants', '--format', 'csv', '--output', path)
+        Plant.objects.update(active_compounds=[])
+        call_command('import_plants', path, stdout=StringIO())
+        self.assertEqual(Plant.objects.get(scientific_name="Testus plantus").active_compounds, ["1,8-Cineole"])
+
+
+class PlantApiTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Testus plantus {i}", plant_family="Testaceae",
+                description="A digestive test plant" if i % 2 else "A test plant", is_verified=True
+            )
+        Plant.objects.create(
+            common_names=["Hidden"], scientific_name="Hiddenus plantus", plant_family="Testaceae",
+            description="Unverified", is_verified=False
+        )
+
+    def test_cursor_pagination_and_sparse_fields(self):
+        """Test that cursor pages cover the verified catalogue with only the requested fields"""
+        url = reverse('plants_api:plant_list')
+        data = self.client.get(url, {'limit': 2, 'fields': 'scientific_name'}).json()
+        names = [row['scientific_name'] for row in data['results']]
+        self.assertEqual(set(data['results'][0]), {'scientific_name'})
+        while data['next_cursor']:
+            data = self.client.get(url, {'limit': 2, 'fields': 'scientific_name', 'cursor': data['next_cursor']}).json()
+            names.extend(row['scientific_name'] for row in data['results'])
+        self.assertEqual(names, [f"Testus plantus {i}" for i in range(5)])
+
+    def test_detail_etag(self):
+        """Test that an unchanged plant answers If-None-Match with 304"""
+        url = reverse('plants_api:plant_detail', args=["Testus plantus 1"])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['scientific_name'], "Testus plantus 1")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('plants_api:plant_detail', args=["Hiddenus plantus"])).status_code, 404)
+
+    def test_basic_search(self):
+        """Test keyword search through the API"""
+        data = self.client.get(reverse('plants_api:plant_search'), {'q': 'digestive', 'fields': 'id,scientific_name'}).json()
+        self.assertEqual([row['scientific_name'] for row in data['results']], ["Testus plantus 1", "Testus plantus 3"])
+        self.assertEqual(self.client.get(reverse('plants_api:plant_search')).status_code, 400)
+
+    def test_smart_search_fallback_hides_unverified_plants(self):
+        """Test that smart search without the ML stack only returns verified plants"""
+        with mock.patch('plants.views.ML_AVAILABLE', False):
+            data = self.client.get(reverse('plants_api:plant_search'), {'q': 'plantus', 'mode': 'smart'}).json()
+        names = [row['scientific_name'] for row in data['results']]
+        self.assertEqual(len(names), 5)
+        self.assertNotIn("Hiddenus plantus", names)
+
+
+@mock.patch('plants.similarity._encoder', return_value=(None, None))
+class SimilarPlantsTest(TestCase):
+    def setUp(self):
+        compounds = [["Quinine", "Tannins"], ["quinine ", "Tannins"], ["Quinine"], ["Menthol"]]
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Similis plantus {i}", plant_family="Testaceae",
+                description="A test plant", active_compounds=names, is_verified=True
+            )
+            for i, names in enumerate(compounds)
+        ]
+
+    def neighbours(self, plant):
+        return list(SimilarPlant.objects.filter(plant=plant).values_list('neighbour__scientific_name', flat=True))
+
+    def test_neighbours_ranked_by_shared_terms(self, encoder):
+        """Test that plants sharing normalized compounds are linked, best match first"""
+        self.assertEqual(refresh_similar_plants(), 4)
+        self.assertEqual(self.neighbours(self.plants[0]), ["Similis plantus 1", "Similis plantus 2"])
+        self.assertEqual(self.neighbours(self.plants[3]), [])
+
+        response = self.client.get(reverse('plants:plant_detail', args=["Similis plantus 0"]))
+        self.assertContains(response, "Related Plants")
+        self.assertEqual([p.id for p in response.context['similar_plants']], [p.id for p in self.plants[1:3]])
+
+    def test_incremental_refresh(self, encoder):
+        """Test that only plants affected by an edit are re-scored"""
+        refresh_similar_plants()
+        self.assertEqual(refresh_similar_plants(), 0)
+
+        self.plants[3].active_compounds = ["Tannins"]
+        self.plants[3].save()
+        # The edited plant, and the two whose lists it now joins
+        self.assertEqual(refresh_similar_plants(), 3)
+        self.assertIn("Similis plantus 3", self.neighbours(self.plants[1]))
+
+        self.plants[1].is_verified = False
+        self.plants[1].save()
+        refresh_similar_plants()
+        self.assertEqual(self.neighbours(self.plants[0]), ["Similis plantus 2", "Similis plantus 3"])
+
+    def test_refresh_scoped_to_edited_plants(self, encoder):
+        """Test that a per-edit refresh only touches the edited plant's neighbourhood and matches a full one"""
+        refresh_similar_plants()
+        self.plants[3].active_compounds = ["Tannins"]
+        self.plants[3].save()
+        with self.assertNumQueries(15):
+            self.assertEqual(refresh_similar_plants(plant_ids=[self.plants[3].id]), 3)
+        self.assertIn("Similis plantus 3", self.neighbours(self.plants[1]))
+
+        self.plants[1].is_verified = False
+        self.plants[1].save()
+        refresh_similar_plants(plant_ids=[self.plants[1].id])
+        scoped = {plant.id: self.neighbours(plant) for plant in self.plants}
+        refresh_similar_plants(full=True)
+        self.assertEqual({plant.id: self.neighbours(plant) for plant in self.plants}, scoped)
+
+        # Deleting a plant queues a refresh of the plants that listed it
+        Job.objects.all().delete()
+        Plant.objects.filter(pk=self.plants[2].pk).delete()
+        listed_it = Job.objects.filter(kind='similar_plants').order_by('-created_at').first().params['plant_ids']
+        self.assertEqual(listed_it, [self.plants[0].id])
+        self.assertEqual(refresh_similar_plants(plant_ids=listed_it), 1)
+        self.assertEqual(self.neighbours(self.plants[0]), ["Similis plantus 3"])
+
+    def test_queued_refreshes_merge_plant_ids(self, encoder):
+        """Test that edits while a refresh is pending widen it instead of queueing another"""
+        Job.objects.all().delete()  # the refreshes queued by setUp's saves
+        with self.settings(JOBS_BACKEND='worker'):
+            first = queue_refresh([self.plants[0].id])
+            second = queue_refresh([self.plants[2].id])
+            self.assertEqual(second.pk, first.pk)
+            second.refresh_from_db()
+            self.assertEqual(second.params['plant_ids'], sorted([self.plants[0].id, self.plants[2].id]))
+            queue_refresh()
+            second.refresh_from_db()
+            self.assertNotIn('plant_ids', second.params)
+
+
+class TermIndexTest(TestCase):
+    def setUp(self):
+        actions = [["Anti-inflammatory", "Antioxidant"], ["anti-inflammatory"], ["Antioxidant", "Antimalarial"]]
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Indexus plantus {i}", plant_family="Testaceae",
+                description="A test plant", pharmacological_actions=names, is_verified=True
+            )
+            for i, names in enumerate(actions)
+        ]
+
+    def names(self, query, field='pharmacological_actions'):
+        return [Plant.objects.get(pk=pk).scientific_name[-1] for pk in lookup(field, query)]
+
+    def test_and_or_queries(self):
+        """Test that AND intersects and OR merges the postings lists"""
+        self.assertEqual(parse_query("Anti-inflammatory AND Antioxidant OR antimalarial"),
+                         [["anti-inflammatory", "antioxidant"], ["antimalarial"]])
+        self.assertEqual(self.names("Anti-inflammatory"), ["0", "1"])
+        self.assertEqual(self.names("Anti-inflammatory AND Antioxidant"), ["0"])
+        self.assertEqual(self.names("Anti-inflammatory OR Antimalarial"), ["0", "1", "2"])
+        self.assertEqual(self.names("Antioxidant AND Unknown"), [])
+        self.assertEqual(list(intersect(unpack_ids(pack_ids([1, 3, 5, 9])), unpack_ids(pack_ids([3, 4, 9])))), [3, 9])
+
+    def test_index_follows_edits(self):
+        """Test that saves and deletes keep the index in step, matching a full rebuild"""
+        plant = self.plants[1]
+        plant.pharmacological_actions = ["Antimalarial"]
+        plant.save()
+        self.assertEqual(self.names("Anti-inflammatory"), ["0"])
+        self.assertEqual(self.names("Antimalarial"), ["1", "2"])
+
+        self.plants[0].is_verified = False
+        self.plants[0].save()
+        self.plants[2].delete()
+        self.assertEqual(self.names("Antioxidant"), [])
+
+        before = set(PlantTerm.objects.values_list('field', 'term', 'plant_count', 'postings'))
+        rebuild_term_index()
+        after = set(PlantTerm.objects.values_list('field', 'term', 'plant_count', 'postings'))
+        self.assertEqual(before, after)
+
+    def test_browse_pages(self):
+        """Test the term listing and query results pages"""
+        url = reverse('plants:browse_terms', args=['actions'])
+        response = self.client.get(url)
+        self.assertContains(response, "Anti-inflammatory")
+        self.assertEqual(response.context['page'][0].plant_count, 2)
+
+        response = self.client.get(url, {'q': "Anti-inflammatory AND Antioxidant"})
+        self.assertEqual(list(response.context['plants']), [self.plants[0]])
+        self.assertEqual(self.client.get(reverse('plants:browse_terms', args=['colours'])).status_code, 404)
+
+        detail = self.client.get(reverse('plants:plant_detail', args=["Indexus plantus 0"]))
+        self.assertContains(detail, f"{url}?q=Antioxidant")
+
+
+class InteractionMatrixTest(TestCase):
+    def test_matcher(self):
+        """Test leftmost-longest, whole-word matching with plurals"""
+        matcher = Matcher([("he", 'a'), ("she", 'b'), ("hers", 'c'), ("diabetes", 'd'), ("diabetes medication", 'e')])
+        self.assertEqual([m[2] for m in matcher.find("she told hers about ushers")], ['b', 'c'])
+        self.assertEqual([m[2] for m in matcher.find("Diabetes medications; diabetes")], ['e', 'd'])
+        self.assertEqual(concepts_in("MAOIs, Antidepressants"), {'maois': "MAOIs", 'antidepressants': "Antidepressants"})
+        self.assertEqual(concepts_in("None documented"), {})
+
+    def test_matrix_follows_edits(self):
+        """Test that saving a plant re-extracts its interaction rows"""
+        plant = Plant.objects.create(
+            common_names=["Plant"], scientific_name="Testus plantus", plant_family="Testaceae",
+            description="A test plant", interactions="SSRIs", is_verified=True
+        )
+        rows = PlantInteraction.objects.filter(plant=plant)
+        self.assertEqual(list(rows.values_list('concept', 'source')), [('ssris', 'interactions')])
+        plant.interactions = "Blood thinners"
+        plant.save()
+        self.assertEqual(list(rows.values_list('concept', flat=True)), ['anticoagulants'])
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        trending._buffer.clear()
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Trendus plantus {i}", plant_family="Testaceae",
+                description="A test plant", is_verified=True
+            )
+            for i in range(3)
+        ]
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        """Test that detail views don't write until the flush, which batches by count"""
+        with self.assertNumQueries(0):
+            for plant, views in zip(self.plants, [3, 1, 1]):
+                for _ in range(views):
+                    trending.record_view(plant.id)
+        # existence check, savepoint, daily rows, one pair of UPDATEs per distinct count, release
+        with self.assertNumQueries(8):
+            self.assertEqual(trending.flush_views(), 5)
+        self.assertEqual([p.view_count for p in Plant.objects.order_by('id')], [3, 1, 1])
+        self.assertEqual(PlantDailyViews.objects.get(plant=self.plants[0]).views, 3)
+
+    def test_trending_decays_and_is_cached(self):
+        """Test that recent views outrank older, larger ones and the list is served from cache"""
+        today = timezone.localdate()
+        PlantDailyViews.objects.create(plant=self.plants[0], day=today - timedelta(days=6), views=10)
+        PlantDailyViews.objects.create(plant=self.plants[1], day=today, views=4)
+        Plant.objects.filter(pk=self.plants[0].pk).update(view_count=10)
+
+        # Requests only read the stored lists, and queue the computation when there are none
+        self.assertEqual(self.client.get(reverse('home')).context['trending'], trending.EMPTY)
+        self.assertTrue(Job.objects.filter(kind='trending', status=Job.QUEUED).exists())
+        call_command('compute_trending', stdout=StringIO())
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        names = [row['scientific_name'] for row in response.context['trending']['trending']]
+        self.assertEqual(names, ["Trendus plantus 1", "Trendus plantus 0"])
+        self.assertEqual(response.context['trending']['most_viewed'][0]['view_count'], 10)
+        self.assertContains(response, "Trending Plants")
+
+
+@override_settings(SEARCH_LOG_BATCH_SIZE=3, SEARCH_LOG_FLUSH_SECONDS=3600)
+class SearchAnalyticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        searchlog._buffer.clear()
+        for i in range(2):
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Searchus plantus {i}", plant_family="Testaceae",
+                description="A digestive aid", is_verified=True
+            )
+
+    def test_searches_are_logged_in_batches(self):
+        """Test that plant_list searches are buffered until a batch fills"""
+        url = reverse('plants:plant_list')
+        self.client.get(url, {'q': "Digestive"})
+        self.client.get(url, {'q': "digestive "})
+        self.assertEqual(SearchLog.objects.count(), 0)
+        self.client.get(url, {'q': "unknown herb"})
+        self.assertEqual(SearchLog.objects.count(), 3)
+
+        stats = searchlog.search_rollup()
+        self.assertEqual(stats['top_queries'][0], {'query': "digestive", 'searches': 2})
+        self.assertEqual(stats['zero_result_queries'], [{'query': "unknown herb", 'searches': 1}])
+        self.assertEqual(stats['modes'][0]['searches'], 3)
+        self.assertIsNotNone(stats['modes'][0]['p95_ms'])
+        # The repeated query came from the result cache and is left out of the latency percentiles
+        self.assertEqual(SearchLog.objects.filter(cached=True).count(), 1)
+        self.assertEqual(stats['modes'][0]['cache_rate'], 33.3)
+        SearchLog.objects.filter(cached=True).update(latency_ms=10000)
+        self.assertLess(searchlog.search_rollup()['modes'][0]['p95_ms'], 10000)
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile over a queryset"""
+        now = timezone.now()
+        SearchLog.objects.bulk_create([
+            SearchLog(query="q", mode='basic', latency_ms=ms, result_count=1, zero_results=False, created_at=now)
+            for ms in range(1, 101)
+        ])
+        self.assertEqual(searchlog.percentile(SearchLog.objects.all(), 'latency_ms', 0.95), 95)
+
+    def test_results_are_cached_and_warmed(self):
+        """Test that repeated searches hit the cache and warm_search_cache fills it"""
+        url = reverse('plants:plant_list')
+        self.client.get(url, {'q': "digestive"})
+        with self.assertNumQueries(0):  # results from the cache, plants from the catalogue snapshot
+            response = self.client.get(url, {'q': "digestive"})
+        self.assertEqual(len(response.context['plants']), 2)
+
+        searchlog.flush_search_log()
+        cache.clear()
+        call_command('warm_search_cache', stdout=StringIO())
+        self.assertEqual(cache.get(searchlog.search_cache_key("digestive", 'basic')), [
+            plant.id for plant in Plant.objects.order_by('scientific_name')
+        ])
+
+    def test_edits_invalidate_cached_results(self):
+        """Test that a newly verified plant shows up in a search that was already cached"""
+        url = reverse('plants:plant_list')
+        self.assertEqual(len(self.client.get(url, {'q': "digestive"}).context['plants']), 2)
+        Plant.objects.create(
+            common_names=["Plant 2"], scientific_name="Searchus plantus 2", plant_family="Testaceae",
+            description="A digestive aid", is_verified=True
+        )
+        self.assertEqual(len(self.client.get(url, {'q': "digestive"}).context['plants']), 3)
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        for metric in metrics._registry.values():
+            metric.values.clear()
+        Plant.objects.create(
+            common_names=["Plant"], scientific_name="Metricus plantus", plant_family="Testaceae",
+            description="A digestive aid", is_verified=True
+        )
+
+    def test_metrics_are_summed_across_workers(self):
+        """Test that /metrics merges every worker's file into Prometheus text format"""
+        with override_settings(METRICS_DIR=self.metrics_dir, METRICS_FLUSH_SECONDS=0):
+            for _ in range(2):
+                self.client.get(reverse('plants:plant_list'), {'q': "digestive"})
+            # Another gunicorn worker's snapshot
+            with open(os.path.join(self.metrics_dir, 'metrics-99999.json'), 'w') as f:
+                json.dump({'botaniq_searches_total': {'["basic"]': 5}}, f)
+
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            with mock.patch.dict(os.environ, {'METRICS_TOKEN': 'scrape'}):
+                response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+
+        text = response.content.decode()
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE botaniq_request_duration_seconds histogram', text)
+        self.assertIn('botaniq_searches_total{mode="basic"} 7', text)
+        self.assertIn('botaniq_cache_requests_total{cache="search",result="hit"} 1', text)
+        self.assertIn('botaniq_request_duration_seconds_bucket{view="plants:plant_list",method="GET",le="+Inf"} 2', text)
+        self.assertIn('botaniq_request_duration_seconds_count{view="plants:plant_list",method="GET"} 2', text)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='curator', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='researcher', password='testpass123')
+        Plant.objects.create(
+            common_names=["Plant"], scientific_name="Profilus plantus", plant_family="Testaceae",
+            description="A digestive aid", is_verified=True
+        )
+        self.addCleanup(searchlog.flush_search_log)
+
+    def test_staff_get_a_profile_report(self):
+        """Test that ?_profile=1 returns a CPU and allocation report for staff only"""
+        url = reverse('plants:plant_list')
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'q': 'digestive', '_profile': '1'})
+        self.assertContains(response, 'Profilus plantus')
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'q': 'digestive', '_profile': '1'})
+        text = response.content.decode()
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('-> plants:plant_list (200)', text)
+        self.assertIn('functions by cumulative time', text)
+        self.assertIn('(plant_list)', text)
+        self.assertIn('allocation sites', text)
+
+    def test_collapsed_stacks_are_saved(self):
+        """Test that ?_profile=collapsed returns flame-graph stacks and PROFILE_DIR keeps every format"""
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        self.client.force_login(self.staff)
+        with override_settings(PROFILE_DIR=profile_dir, PROFILE_SAMPLE_SECONDS=0.0001):
+            response = self.client.get(reverse('plants:plant_list'), HTTP_X_PROFILE='collapsed')
+        name = response['X-Profile-Saved']
+        self.assertEqual(
+            sorted(os.listdir(profile_dir)), [f'{name}.collapsed', f'{name}.prof', f'{name}.txt']
+        )
+        lines = response.content.decode().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertIn(';', stack)
+        self.assertGreater(int(count), 0)
+
+
+class SearchRelevanceTest(TestCase):
+    def test_metrics(self):
+        """Test recall@k, graded nDCG@k and reciprocal rank on a hand-checked ranking"""
+        relevant = {'A': 2, 'B': 1}
+        self.assertEqual(relevance.recall_at_k(['C', 'A', 'D'], relevant, 2), 0.5)
+        self.assertEqual(relevance.reciprocal_rank(['C', 'A', 'D'], relevant), 0.5)
+        self.assertEqual(relevance.ndcg_at_k(['A', 'B'], relevant, 10), 1.0)
+        self.assertAlmostEqual(relevance.ndcg_at_k(['B', 'A'], relevant, 10), (1 + 3 / math.log2(3)) / (3 + 1 / math.log2(3)))
+        self.assertEqual(relevance.ndcg_at_k(['C'], relevant, 10), 0.0)
+
+    def test_fake_encoder_drives_smart_search(self):
+        """Test that the offline encoder is deterministic and ranks the labelled plants above the rest"""
+        encoder = relevance.HashingEncoder()
+        self.assertEqual(encoder.encode('Digestive'), relevance.HashingEncoder().encode('digestion'))
+        call_command('seed_plants', stdout=StringIO())
+        queries = relevance.load_queries()
+        basic = relevance.evaluate(queries, relevance.searcher('basic'), repeat=1)
+        smart = relevance.evaluate(queries, relevance.searcher('smart', encoder, threshold=0.1), repeat=1)
+        self.assertGreater(smart['ndcg@10'], basic['ndcg@10'])
+        self.assertGreater(smart['mrr'], 0.8)
+        self.assertEqual(
+            relevance.evaluate(queries, relevance.searcher('smart', encoder, threshold=0.1), repeat=1)['queries'],
+            smart['queries'],
+        )
+
+        stdout = StringIO()
+        call_command('benchmark_search', encoder='fake', repeat=1, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['meta']['encoder'], 'hashing')
+        self.assertEqual(set(report['modes']), {'basic', 'smart'})
+
+
+class PlantImageTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        overrides = override_settings(THUMBNAIL_ROOT=self.root, THUMBNAIL_WIDTHS=[320, 640, 960])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.plant = Plant.objects.create(
+            common_names=["Aloe"], scientific_name="Aloe vera", plant_family="Asphodelaceae",
+            description="Succulent", is_verified=True
+        )
+
+    def image_bytes(self, size=(1200, 800), fmt='PNG', mode='RGBA'):
+        out = BytesIO()
+        Image.new(mode, size, (40, 160, 80, 255) if mode == 'RGBA' else (40, 160, 80)).save(out, fmt)
+        return out.getvalue()
+
+    def test_upload_is_thumbnailed_at_every_width(self):
+        """Test that an upload gets WebP and JPEG variants under its content hash, idempotently"""
+        upload = SimpleUploadedFile('aloe.png', self.image_bytes(), content_type='image/png')
+        images.save_upload(self.plant.pk, upload)
+        self.assertEqual(images.stale_plant_ids(), [self.plant.pk])
+        image = images.process_plant_image(self.plant.pk)
+
+        self.assertEqual((image.status, image.width, image.height), (PlantImage.READY, 1200, 800))
+        self.assertEqual(image.widths, [320, 640, 960])
+        self.assertEqual(images.stale_plant_ids(), [])
+        variant = os.path.join(self.root, images.thumbnail_name(image.source_hash, 640, 'webp'))
+        with Image.open(variant) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (640, 427)))
+        modified = os.path.getmtime(variant)
+        images.make_thumbnails(image.source_hash)
+        self.assertEqual(os.path.getmtime(variant), modified)
+
+        response = self.client.get(image.url(640, 'webp'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(b''.join(response.streaming_content), open(variant, 'rb').read())
+        self.assertEqual(self.client.get(f'/media/thumbs/originals/{image.source_hash}').status_code, 404)
+
+    def test_list_renders_lazy_responsive_images(self):
+        """Test that plant cards use srcset, lazy loading and no hotlinked image_url"""
+        self.plant.image_url = 'https://images.example.org/aloe.jpg'
+        self.plant.save()
+        with mock.patch('plants.images.fetch_source', return_value=self.image_bytes((500, 500), 'JPEG', 'RGB')):
+            image = images.process_plant_image(self.plant.pk)
+        self.assertEqual(image.widths, [320, 500])
+        Plant.objects.create(
+            common_names=["Neem"], scientific_name="Azadirachta indica", plant_family="Meliaceae",
+            description="Bitter", is_verified=True
+        )
+
+        response = self.client.get(reverse('plants:plant_list'))
+        self.assertContains(response, f'srcset="{image.url(320)} 320w, {image.url(500)} 500w"')
+        self.assertContains(response, f'<source type="image/webp" srcset="{image.webp_srcset()}"')
+        self.assertContains(response, 'loading="lazy"', count=1)
+        self.assertContains(response, 'width="320" height="320"')
+        self.assertNotContains(response, self.plant.image_url)
+        response = self.client.get(reverse('plants:plant_detail', args=[self.plant.scientific_name]))
+        self.assertContains(response, 'loading="eager"')
+
+    def test_changed_and_failed_urls(self):
+        """Test that a new image_url is refetched and a failed download is recorded"""
+        self.plant.image_url = 'https://images.example.org/aloe.jpg'
+        self.plant.save()
+        self.assertTrue(images.needs_processing(self.plant))
+        with mock.patch('plants.images.fetch_source', side_effect=requests.ConnectionError('refused')), \
+                self.assertLogs('plants.images', 'WARNING'):
+            image = images.process_plant_image(self.plant.pk)
+        self.assertEqual(image.status, PlantImage.FAILED)
+        self.assertIn('refused', image.error)
+        self.assertFalse(images.needs_processing(self.plant))
+
+        self.plant.image_url = 'https://images.example.org/aloe-2.jpg'
+        self.assertTrue(images.needs_processing(self.plant))
+        self.plant.save()
+        with mock.patch('plants.images.fetch_source', return_value=b'not an image'), \
+                self.assertLogs('plants.images', 'WARNING'):
+            image = images.process_plant_image(self.plant.pk)
+        self.assertEqual(image.status, PlantImage.FAILED)
+        self.assertTrue(image.error.startswith('Unreadable image'))
+
+    def test_fetch_refuses_internal_urls(self):
+        """Test that image URLs must be http(s) to public addresses, after every redirect too"""
+        def response(status=200, location=None, body=b''):
+            reply = mock.MagicMock(is_redirect=location is not None, status_code=status, headers={'Location': location})
+            reply.__enter__.return_value = reply
+            reply.iter_content.return_value = [body]
+            return reply
+
+        with mock.patch('plants.images.requests.get') as get:
+            for url in ['file:///etc/passwd', 'ftp://images.example.org/a.jpg', 'http://127.0.0.1/a.jpg',
+                        'http://10.1.2.3/a.jpg', 'http://169.254.169.254/latest/meta-data', 'http://[::1]/a.jpg',
+                        'http://[::ffff:127.0.0.1]/a.jpg', 'http://localhost:8000/a.jpg']:
+                with self.assertRaises(ValueError, msg=url):
+                    images.fetch_source(url)
+            get.assert_not_called()
+
+        public = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('93.184.216.34', 80))]
+        resolve = socket.getaddrinfo
+        with mock.patch('plants.images.socket.getaddrinfo', side_effect=lambda host, *args, **kwargs: (
+                public if host == 'images.example.org' else resolve(host, *args, **kwargs))), \
+                mock.patch('plants.images.requests.get') as get:
+            get.side_effect = [response(302, '/aloe-2.jpg'), response(body=b'image')]
+            self.assertEqual(images.fetch_source('https://images.example.org/aloe.jpg'), b'image')
+            self.assertEqual(get.call_args.args[0], 'https://images.example.org/aloe-2.jpg')
+            self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+            get.side_effect = [response(301, 'http://127.0.0.1:8000/admin/')]
+            with self.assertRaisesMessage(ValueError, 'non-public address'):
+                images.fetch_source('https://images.example.org/aloe.jpg')
+            get.side_effect = [response(302, '/again.jpg')] * (images.IMAGE_MAX_REDIRECTS + 1)
+            with self.assertRaisesMessage(ValueError, 'redirects'):
+                images.fetch_source('https://images.example.org/aloe.jpg')
+
+        self.plant.image_url = 'http://localhost/aloe.jpg'
+        self.plant.save()
+        with self.assertLogs('plants.images', 'WARNING'):
+            image = images.process_plant_image(self.plant.pk)
+        self.assertEqual(image.status, PlantImage.FAILED)
+        self.assertTrue(image.error.startswith('Download failed'))
+
+    def test_image_pass_bumps_the_generation_once(self):
+        """Test that the plant_images job moves the catalogue generation once, not per image"""
+        Plant.objects.filter(pk=self.plant.pk).update(image_url='https://images.example.org/aloe.jpg')
+        for i in range(3):
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Imagus plantus {i}", plant_family="Testaceae",
+                description="Succulent", image_url=f'https://images.example.org/{i}.jpg', is_verified=True
+            )
+        job = Job.objects.create(kind='plant_images', params={})
+        pool = mock.MagicMock()
+        pool.return_value.__enter__.return_value.map = map  # the test's transaction isn't visible to other threads
+        with mock.patch('plants.images.fetch_source', return_value=self.image_bytes((500, 500), 'JPEG', 'RGB')), \
+                mock.patch('plants.images.ThreadPoolExecutor', pool), \
+                mock.patch('plants.images._process_in_thread', images.process_plant_image), \
+                mock.patch('plants.images.bump_generation') as bump:
+            images.run_plant_images(job, lambda **progress: None)
+        self.assertEqual(PlantImage.objects.filter(status=PlantImage.READY).count(), 4)
+        bump.assert_called_once_with()
+
+    def test_regenerate_command_applies_new_widths(self):
+        """Test that regenerate_thumbnails rebuilds variants from originals for new THUMBNAIL_WIDTHS"""
+        images.save_upload(self.plant.pk, SimpleUploadedFile('aloe.png', self.image_bytes()))
+        images.process_plant_image(self.plant.pk)
+        with self.settings(THUMBNAIL_WIDTHS=[200, 400]):
+            stdout = StringIO()
+            call_command('regenerate_thumbnails', workers=1, stdout=stdout)
+        image = PlantImage.objects.get(plant=self.plant)
+        self.assertEqual(image.widths, [200, 400])
+        self.assertTrue(os.path.exists(os.path.join(self.root, images.thumbnail_name(image.source_hash, 200, 'jpeg'))))
+        self.assertIn('1 images thumbnailed, 0 failed', stdout.getvalue())
+
+
+@override_settings(VIEW_COUNT_FLUSH_SECONDS=3600, SEARCH_LOG_FLUSH_SECONDS=3600, SEARCH_LOG_BATCH_SIZE=100)
+class CatalogueSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Snapshot plantus {i}", plant_family="Testaceae",
+                description="A digestive aid", active_compounds=["Quinine"], is_verified=True
+            )
+            for i in range(3)
+        ]
+        refresh_similar_plants()
+        self.addCleanup(trending._buffer.clear)
+        self.addCleanup(searchlog._buffer.clear)
+
+    def test_public_reads_run_no_sql(self):
+        """Test that anonymous list, search and detail pages are served from the snapshot"""
+        self.client.get(reverse('plants:plant_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('plants:plant_list'))
+            self.assertEqual(response.context['total_plants'], 3)
+            response = self.client.get(reverse('plants:plant_list'), {'q': "DIGESTIVE"})
+            self.assertEqual(len(response.context['plants']), 3)
+            response = self.client.get(reverse('plants:plant_detail', args=["Snapshot plantus 0"]))
+            self.assertEqual(self.client.get(reverse('plants:plant_detail', args=["Unknown"])).status_code, 404)
+        self.assertContains(response, "Snapshot plantus 1")  # a similar plant
+        self.assertEqual(trending._buffer[self.plants[0].id], 1)
+
+    def test_edits_swap_in_a_new_snapshot(self):
+        """Test that saving a plant moves the generation on and readers holding the old snapshot keep it"""
+        before = catalogue.get_catalogue()
+        self.assertIs(catalogue.get_catalogue(), before)
+        self.plants[0].description = "A bitter tonic"
+        self.plants[0].save()
+        self.plants[1].is_verified = False
+        self.plants[1].save()
+
+        after = catalogue.get_catalogue()
+        self.assertIsNot(after, before)
+        self.assertEqual(after.by_id[self.plants[0].id].description, "A bitter tonic")
+        self.assertEqual(before.by_id[self.plants[0].id].description, "A digestive aid")
+        self.assertEqual(after.search("digestive"), [self.plants[2].id])
+        self.assertNotContains(self.client.get(reverse('plants:plant_list')), "Snapshot plantus 1")
+        with self.settings(CATALOGUE_MAX_AGE_SECONDS=-1):
+            self.assertIsNot(catalogue.get_catalogue(), after)
+
+    def test_stale_snapshots_are_rebuilt_off_the_request_path(self):
+        """Test that a request holding a usable snapshot serves it while a thread builds the next one"""
+        before = catalogue.get_catalogue()
+        next_snapshot = catalogue.Catalogue('next', [])
+        catalogue.bump_generation()
+        with self.settings(CATALOGUE_BACKGROUND_REBUILD=True), \
+                mock.patch('plants.catalogue.build', return_value=next_snapshot), \
+                mock.patch('plants.catalogue.connections'):
+            self.assertIs(catalogue.get_catalogue(), before)
+            self.assertTrue(catalogue._build_lock.acquire(timeout=5))  # held until the thread finishes
+            catalogue._build_lock.release()
+        self.assertIs(catalogue._catalogue, next_snapshot)
+
+    def test_records_are_immutable_and_measured(self):
+        """Test that snapshot records can't be changed, their size is reported and the setting turns it off"""
+        plant = catalogue.get_catalogue().by_id[self.plants[0].id]
+        with self.assertRaises(AttributeError):
+            plant.description = "Changed"
+        self.assertEqual(plant.common_names, ("Plant 0",))
+        self.assertIs(plant.active_compounds, catalogue.get_catalogue().by_id[self.plants[1].id].active_compounds)
+
+        stdout = StringIO()
+        call_command('catalogue_snapshot', json=True, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['plants'], 3)
+        self.assertGreater(report['deep_size_bytes'], 0)
+
+        with self.settings(CATALOGUE_SNAPSHOT=False):
+            self.assertIsNone(catalogue.get_catalogue())
+            response = self.client.get(reverse('plants:plant_detail', args=["Snapshot plantus 0"]))
+            self.assertEqual([p.scientific_name for p in response.context['similar_plants']][:1],
+                             ["Snapshot plantus 1"])
+
+
+class PrerenderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = self.settings(PRERENDER=True, PRERENDER_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(prerender._queued.clear)
+        self.addCleanup(trending._buffer.clear)
+        self.addCleanup(searchlog._buffer.clear)
+        self.plants = [
+            Plant.objects.create(
+                common_names=[f"Plant {i}"], scientific_name=f"Static plantus {i}", plant_family="Testaceae",
+                description="A digestive aid", is_verified=True
+            )
+            for i in range(3)
+        ]
+        self.detail_url = reverse('plants:plant_detail', args=["Static plantus 0"])
+
+    def test_anonymous_pages_are_served_from_disk(self):
+        """Test that prerendered pages are served compressed, with no SQL, and revalidate by ETag"""
+        rendered, unchanged, removed = prerender.prerender()
+        self.assertEqual((rendered, unchanged, removed), (4, 0, 0))
+
+        trending._buffer.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['X-Prerendered'], '1')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn("Static plantus 0", gzip.decompress(b''.join(response.streaming_content)).decode())
+        # Pre-rendered hits still count as views
+        trending.flush_views()
+        self.plants[0].refresh_from_db()
+        self.assertEqual(self.plants[0].view_count, 1)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('plants:plant_list'))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn("Static plantus 2", b''.join(response.streaming_content).decode())
+        # Searches and unknown query strings render dynamically
+        self.assertNotIn('X-Prerendered', self.client.get(reverse('plants:plant_list'), {'q': "digestive"}))
+
+    def test_edits_fall_back_and_regenerate_incrementally(self):
+        """Test that a stale manifest is bypassed and the next run only renders the pages that changed"""
+        prerender.prerender()
+        self.plants[0].description = "A bitter tonic"
+        self.plants[0].save()
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('X-Prerendered', response)
+        self.assertContains(response, "A bitter tonic")
+
+        # The plant's detail page and the list page that shows it
+        rendered, unchanged, removed = prerender.prerender()
+        self.assertEqual((rendered, unchanged, removed), (2, 2, 2))
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Prerendered'], '1')
+        self.assertIn("A bitter tonic", b''.join(response.streaming_content).decode())
+
+    def test_logged_in_users_and_pages_get_dynamic_views(self):
+        """Test that session holders always get the dynamic view and list pages follow the paginator"""
+        with mock.patch('plants.views.PLANT_LIST_PAGE_SIZE', 2):
+            prerender.prerender()
+            response = self.client.get(reverse('plants:plant_list'), {'page': '2'})
+            self.assertEqual(response['X-Prerendered'], '1')
+            self.assertIn("Static plantus 2", b''.join(response.streaming_content).decode())
+
+        User.objects.create_user(username="reader", password="testpass123")
+        self.client.login(username="reader", password="testpass123")
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('X-Prerendered', response)
+        self.assertContains(response, "reader")
+
+        stdout = StringIO()
+        with self.settings(PRERENDER=False):
+            call_command('prerender_pages', stdout=stdout)
+        self.assertIn("nothing to pre-render", stdout.getvalue())
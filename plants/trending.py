@@ -0,0 +1,196 @@
+"""Buffered view counting and time-decayed trending plants
+
+plant_detail only bumps an in-process Counter. A background thread in each
+process writes the buffer every VIEW_COUNT_FLUSH_SECONDS as a few batched
+`UPDATE ... SET views = views + n` statements, one per distinct n. Trending
+scores blend those daily views with save velocity, halving every
+HALF_LIFE_DAYS.
+
+Requests never compute trending. The compute_trending command or the
+'trending' job stores the lists in TrendingSnapshot, and get_trending()
+reads that row at most every TRENDING_CACHE_SECONDS per process. A missing
+or outdated snapshot queues the job, which runs once however many
+processes notice.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from botaniq import metrics
+from botaniq.querybudget import unbudgeted
+from jobs.runner import register, submit_unique
+from .models import Plant, PlantDailyViews, TrendingSnapshot
+
+logger = logging.getLogger(__name__)
+
+TRENDING_DAYS = 14
+HALF_LIFE_DAYS = 2
+# A save says more about interest than a page view
+SAVE_WEIGHT = 5
+TRENDING_SIZE = 8
+CACHE_KEY = 'plants:trending'
+EMPTY = {'trending': [], 'most_viewed': []}
+# How soon a process looks again when there was no up-to-date snapshot to read
+RETRY_SECONDS = 60
+
+_buffer = Counter()
+_lock = threading.Lock()
+_flusher = None
+
+
+def record_view(plant_id):
+    """Count a detail page view; the flusher thread writes it"""
+    with _lock:
+        _buffer[plant_id] += 1
+    if _flusher is None or not _flusher.is_alive():
+        _start_flusher()
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        # A forked worker inherits the object but not the thread
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_periodically, name='botaniq-view-flush', daemon=True)
+            _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.VIEW_COUNT_FLUSH_SECONDS)
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("View flush failed")
+        finally:
+            connection.close()
+
+
+def flush_views():
+    """Write buffered views to the database; returns the number of views written"""
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+
+    try:
+        # Plants deleted since they were viewed would violate the foreign key
+        existing = set(Plant.objects.filter(pk__in=pending).order_by().values_list('pk', flat=True))
+        by_count = defaultdict(list)
+        for plant_id, views in pending.items():
+            if plant_id in existing:
+                by_count[views].append(plant_id)
+        today = timezone.localdate()
+        with transaction.atomic():
+            PlantDailyViews.objects.bulk_create(
+                [PlantDailyViews(plant_id=plant_id, day=today) for plant_id in sorted(existing)],
+                ignore_conflicts=True,
+            )
+            for views, plant_ids in by_count.items():
+                Plant.objects.filter(pk__in=plant_ids).update(view_count=F('view_count') + views)
+                PlantDailyViews.objects.filter(plant_id__in=plant_ids, day=today).update(views=F('views') + views)
+    except DatabaseError:
+        logger.exception("Could not flush %d plant views; keeping them for the next flush", sum(pending.values()))
+        with _lock:
+            _buffer.update(pending)
+        return 0
+    return sum(views * len(plant_ids) for views, plant_ids in by_count.items())
+
+
+def _flush_at_exit():
+    try:
+        flush_views()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _decay(age_days):
+    return 0.5 ** (age_days / HALF_LIFE_DAYS)
+
+
+def _plant_rows(plant_ids):
+    plants = {
+        row['id']: row
+        for row in Plant.objects.filter(pk__in=plant_ids, is_verified=True).values(
+            'id', 'scientific_name', 'common_names', 'view_count'
+        )
+    }
+    return [
+        {**plants[plant_id], 'name': (plants[plant_id]['common_names'] or [plants[plant_id]['scientific_name']])[0]}
+        for plant_id in plant_ids if plant_id in plants
+    ]
+
+
+def compute_trending(size=TRENDING_SIZE):
+    """{'trending': [...], 'most_viewed': [...]} as lists of plant dicts"""
+    from dashboard.models import SavedPlant
+
+    today = timezone.localdate()
+    start = today - timedelta(days=TRENDING_DAYS - 1)
+    scores = defaultdict(float)
+    for plant_id, day, views in PlantDailyViews.objects.filter(day__gte=start).values_list('plant_id', 'day', 'views'):
+        scores[plant_id] += views * _decay((today - day).days)
+    saves = (
+        SavedPlant.objects.filter(date_saved__date__gte=start)
+        .annotate(day=TruncDate('date_saved'))
+        .values_list('plant_id', 'day')
+        .annotate(saves=Count('id'))
+        .order_by()
+    )
+    for plant_id, day, count in saves:
+        scores[plant_id] += SAVE_WEIGHT * count * _decay((today - day).days)
+
+    # Over-fetch in case some leaders are unverified
+    leaders = sorted(scores, key=lambda plant_id: (-scores[plant_id], plant_id))[:size * 2]
+    most_viewed = Plant.objects.filter(is_verified=True, view_count__gt=0).order_by('-view_count', 'id')
+    return {
+        'trending': _plant_rows(leaders)[:size],
+        'most_viewed': _plant_rows(list(most_viewed.values_list('id', flat=True)[:size])),
+    }
+
+
+def refresh_trending():
+    """Compute the lists and store them for every process to read"""
+    trending = compute_trending()
+    TrendingSnapshot.objects.update_or_create(pk=1, defaults={'data': trending, 'computed_at': timezone.now()})
+    cache.set(CACHE_KEY, trending, settings.TRENDING_CACHE_SECONDS)
+    return trending
+
+
+@register('trending')
+def run_refresh_trending(job, report):
+    """Background job: recompute the trending and most viewed lists"""
+    trending = refresh_trending()
+    report(trending=len(trending['trending']), most_viewed=len(trending['most_viewed']))
+
+
+def get_trending():
+    """The stored trending and most viewed lists, empty until the first computation"""
+    trending = cache.get(CACHE_KEY)
+    metrics.CACHE_REQUESTS.inc(cache='trending', result='miss' if trending is None else 'hit')
+    if trending is not None:
+        return trending
+    with unbudgeted():
+        snapshot = TrendingSnapshot.objects.filter(pk=1).first()
+        fresh = snapshot is not None and (
+            timezone.now() - snapshot.computed_at < timedelta(seconds=settings.TRENDING_CACHE_SECONDS)
+        )
+        if not fresh:
+            submit_unique('trending', 'trending')
+    trending = snapshot.data if snapshot is not None else EMPTY
+    cache.set(CACHE_KEY, trending, settings.TRENDING_CACHE_SECONDS if fresh else RETRY_SECONDS)
+    return trending
@@ -5,5 +5,7 @@ app_name = 'plants'
 
 urlpatterns = [
     path('', views.plant_list, name='plant_list'),
+    path('export/', views.export_plants, name='export_plants'),
+    path('browse/<slug:kind>/', views.browse_terms, name='browse_terms'),
     path('<str:scientific_name>/', views.plant_detail, name='plant_detail'),
 ]
@@ -1,18 +1,33 @@
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Q
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import static
+from django.views.decorators.http import require_GET
 import requests
+import math
 import os
-from .models import Plant
+import time
+from botaniq import metrics
+from botaniq.encoding import accepted_encoding
+from botaniq.querybudget import query_budget
+from botaniq.timing import span
+from .catalogue import get_catalogue
+from .models import Plant, PlantTerm
+from . import exporter, terms
+from .searchlog import cached_search_ids, log_search
+from .trending import get_trending, record_view
 
 # Optional ML imports - will be None if not available
 try:
-    from sentence_transformers import SentenceTransformer, util
+    from sentence_transformers import SentenceTransformer
     import numpy as np
     ML_AVAILABLE = True
 except ImportError:
     SentenceTransformer = None
-    util = None
     np = None
     ML_AVAILABLE = False
 
@@ -47,6 +62,7 @@ def get_research_summary(plant):
     Provide a concise 2-3 sentence summary of the most important research findings, focusing on efficacy and mechanisms of action.
     """
 
+    started = time.perf_counter()
     try:
         response = requests.post(
             'https://api.mistral.ai/v1/chat/completions',
@@ -62,19 +78,25 @@ def get_research_summary(plant):
             },
             timeout=10
         )
+        metrics.LLM_LATENCY.observe(time.perf_counter() - started, provider='mistral')
 
         if response.status_code == 200:
             data = response.json()
+            metrics.LLM_REQUESTS.inc(provider='mistral', outcome='ok')
             return data['choices'][0]['message']['content'].strip()
         else:
+            metrics.LLM_REQUESTS.inc(provider='mistral', outcome='http_error')
             print(f"Mistral API error: {response.status_code}")
             return None
 
     except Exception as e:
+        metrics.LLM_REQUESTS.inc(provider='mistral', outcome='error')
         print(f"Error calling Mistral API: {e}")
         return None
 
 
+SUMMARY_CACHE_SECONDS = 60 * 60 * 24
+
 # Global model cache to avoid reloading
 _model = None
 
@@ -83,31 +105,65 @@ def get_sentence_model():
     global _model
     if _model is None and ML_AVAILABLE:
         try:
-            _model = SentenceTransformer('all-MiniLM-L6-v2')
+            started = time.perf_counter()
+            with span('model_load'):
+                _model = SentenceTransformer('all-MiniLM-L6-v2')
+            metrics.MODEL_LOAD.observe(time.perf_counter() - started)
         except Exception as e:
             print(f"Warning: Could not load AI model: {e}")
             _model = None
     return _model
 
 
-def smart_search_plants(query, limit=20):
-    """AI-powered semantic search for plants"""
+def plant_search_text(plant):
+    """Text the sentence encoder sees for a plant"""
+    text = f"{plant.get_primary_common_name()} {plant.scientific_name} {plant.description}"
+    if plant.cultural_uses:
+        text += " " + " ".join(plant.cultural_uses)
+    if plant.traditional_systems:
+        text += " " + " ".join(plant.traditional_systems)
+    return text
+
+
+SMART_SEARCH_THRESHOLD = 0.3  # Minimum cosine similarity for a semantic match
+
+
+def rank_by_similarity(query_embedding, text_embeddings):
+    """[(index, cosine similarity)] of the texts, most similar first"""
+    if np is not None:
+        matrix = np.asarray(text_embeddings, dtype=np.float32)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = matrix @ query_vector / np.maximum(norms, 1e-12)
+        return [(int(i), float(similarities[i])) for i in np.argsort(-similarities, kind='stable')]
+
+    # Pure Python for encoders used without numpy (the search benchmark's fake encoder)
+    query_norm = math.sqrt(sum(x * x for x in query_embedding))
+    similarities = []
+    for vector in text_embeddings:
+        norm = math.sqrt(sum(x * x for x in vector)) * query_norm
+        similarities.append(sum(a * b for a, b in zip(query_embedding, vector)) / norm if norm else 0.0)
+    return sorted(enumerate(similarities), key=lambda item: -item[1])
+
+
+def smart_search_plants(query, limit=20, model=None, threshold=SMART_SEARCH_THRESHOLD):
+    """AI-powered semantic search for plants; `model` overrides the sentence encoder"""
     if not query.strip():
         return Plant.objects.filter(is_verified=True)[:limit]
 
     # Check if ML dependencies are available
-    if not ML_AVAILABLE:
+    if model is None and not ML_AVAILABLE:
         # Fallback to basic search
-        return Plant.objects.filter(
+        return Plant.objects.filter(is_verified=True).filter(
             Q(scientific_name__icontains=query) |
             Q(common_names__icontains=query) |
             Q(description__icontains=query)
         )[:limit]
 
-    model = get_sentence_model()
+    model = model or get_sentence_model()
     if not model:
         # Fallback to basic search
-        return Plant.objects.filter(
+        return Plant.objects.filter(is_verified=True).filter(
             Q(scientific_name__icontains=query) |
             Q(common_names__icontains=query) |
             Q(description__icontains=query)
@@ -119,86 +175,233 @@ def smart_search_plants(query, limit=20):
         return Plant.objects.none()
 
     # Create search texts combining multiple fields
-    search_texts = []
-    for plant in plants:
-        text = f"{plant.get_primary_common_name()} {plant.scientific_name} {plant.description}"
-        if plant.cultural_uses:
-            text += " " + " ".join(plant.cultural_uses)
-        if plant.traditional_systems:
-            text += " " + " ".join(plant.traditional_systems)
-        search_texts.append(text)
+    search_texts = [plant_search_text(plant) for plant in plants]
 
     try:
         # Encode query and texts
-        query_embedding = model.encode(query, convert_to_tensor=True)
-        text_embeddings = model.encode(search_texts, convert_to_tensor=True)
-
-        # Calculate similarities
-        similarities = util.pytorch_cos_sim(query_embedding, text_embeddings)[0]
-
-        # Get top matches
-        top_indices = np.argsort(similarities.cpu().numpy())[::-1][:limit]
-        top_plants = [plants[i] for i in top_indices]
-        top_scores = [float(similarities[i]) for i in top_indices]
+        metrics.ENCODER_BATCH.observe(len(search_texts), caller='search')
+        with span('encode'):
+            query_embedding = model.encode(query)
+            text_embeddings = model.encode(search_texts)
 
-        # Filter by reasonable similarity threshold
+        # Get top matches, filtered by a reasonable similarity threshold
         results = []
-        for plant, score in zip(top_plants, top_scores):
-            if score > 0.3:  # Minimum similarity threshold
-                results.append(plant)
+        for i, score in rank_by_similarity(query_embedding, text_embeddings)[:limit]:
+            if score > threshold:
+                results.append(plants[i])
 
         return results
     except Exception as e:
         print(f"AI search failed, falling back to basic search: {e}")
         # Fallback to basic search on any error
-        return Plant.objects.filter(
+        return Plant.objects.filter(is_verified=True).filter(
             Q(scientific_name__icontains=query) |
             Q(common_names__icontains=query) |
             Q(description__icontains=query)
         )[:limit]
 
 
+def search_plant_ids(query, mode):
+    """Ranked ids of the plants matching a basic (keyword) or smart (semantic) search"""
+    if mode == 'smart':
+        return [plant.id for plant in smart_search_plants(query)]
+    return list(Plant.objects.filter(is_verified=True).filter(
+        Q(scientific_name__icontains=query) |
+        Q(common_names__icontains=query) |
+        Q(description__icontains=query)
+    ).values_list('id', flat=True))
+
+
+PLANT_LIST_PAGE_SIZE = 48
+
+
+def plant_list_context(plants, page_number, total_plants=None, query='', search_type='basic'):
+    """Template context for one page of plant_list; also used by the pre-renderer"""
+    page = Paginator(plants, PLANT_LIST_PAGE_SIZE).get_page(page_number)
+    return {
+        'page': page,
+        'plants': page.object_list,
+        'query': query,
+        'search_type': search_type,
+        'total_plants': page.paginator.count if total_plants is None else total_plants,
+        'trending': get_trending() if not query else None,
+        'ai_available': ML_AVAILABLE and get_sentence_model() is not None,
+    }
+
+
+@query_budget(5)
 def plant_list(request):
     """Display list of all verified plants"""
     query = request.GET.get('q', '')
     search_type = request.GET.get('search_type', 'basic')  # 'basic' or 'smart'
 
-    plants = Plant.objects.filter(is_verified=True)
+    catalogue = get_catalogue()
+    if catalogue is not None:
+        plants = catalogue.plants
+        total_plants = len(catalogue)
+    else:
+        plants = Plant.objects.filter(is_verified=True).select_related('image')
+        total_plants = plants.count() if query else None  # otherwise the paginator counts them
 
     if query:
-        if search_type == 'smart':
-            # Use AI-powered semantic search
-            plants = smart_search_plants(query)
+        mode = 'smart' if search_type == 'smart' else 'basic'
+        started = time.perf_counter()
+        if catalogue is not None:
+            def search(query, mode):
+                return catalogue.search(query) if mode == 'basic' else search_plant_ids(query, mode)
+            ids, cached = cached_search_ids(query, mode, search)
+            plants = catalogue.in_order(ids)
         else:
-            # Basic keyword search
-            plants = plants.filter(
-                Q(scientific_name__icontains=query) |
-                Q(common_names__icontains=query) |
-                Q(description__icontains=query)
-            )
-
-    context = {
-        'plants': plants,
-        'query': query,
-        'search_type': search_type,
-        'total_plants': Plant.objects.filter(is_verified=True).count(),
-        'ai_available': ML_AVAILABLE and get_sentence_model() is not None,
-    }
-    return render(request, 'plants/plant_list.html', context)
+            ids, cached = cached_search_ids(query, mode, search_plant_ids)
+            found = plants.in_bulk(ids)
+            plants = [found[plant_id] for plant_id in ids if plant_id in found]
+        log_search(query, mode, time.perf_counter() - started, len(plants), cached=cached)
+        metrics.SEARCHES.inc(mode=mode)
 
+    context = plant_list_context(plants, request.GET.get('page'), total_plants, query, search_type)
+    return render(request, 'plants/plant_list.html', context)
 
-def plant_detail(request, scientific_name):
-    """Display detailed information about a specific plant"""
-    plant = get_object_or_404(Plant, scientific_name=scientific_name, is_verified=True)
 
+def find_plant(scientific_name):
+    """(plant, similar plants) from the catalogue snapshot, or the database when it is off"""
+    catalogue = get_catalogue()
+    if catalogue is not None:
+        plant = catalogue.by_name.get(scientific_name)
+        if plant is None:
+            raise Http404("No verified plant with that name")
+        return plant, catalogue.similar(plant)
+    plant = get_object_or_404(
+        Plant.objects.select_related('image'), scientific_name=scientific_name, is_verified=True
+    )
+    similar_plants = [
+        similar.neighbour
+        for similar in plant.similar.select_related('neighbour').filter(neighbour__is_verified=True)
+    ]
+    return plant, similar_plants
+
+
+def plant_detail_context(plant, similar_plants, summarize=True):
+    """Template context for plant_detail; with summarize=False only an already cached summary is used"""
     # Generate AI research summary (cached to avoid repeated API calls)
     research_summary = None
     if os.environ.get('MISTRAL_API_KEY'):
-        research_summary = get_research_summary(plant)
-
-    context = {
+        key = f'plants:summary:{plant.id}:{plant.updated_at.timestamp()}'
+        research_summary = cache.get(key)
+        metrics.CACHE_REQUESTS.inc(cache='summary', result='miss' if research_summary is None else 'hit')
+        if research_summary is None and summarize:
+            with span('mistral'):
+                research_summary = get_research_summary(plant)
+            if research_summary:
+                cache.set(key, research_summary, SUMMARY_CACHE_SECONDS)
+
+    return {
         'plant': plant,
+        'similar_plants': similar_plants,
         'research_summary': research_summary,
         'ai_available': bool(os.environ.get('MISTRAL_API_KEY')),
     }
+
+
+@query_budget(4)
+def plant_detail(request, scientific_name):
+    """Display detailed information about a specific plant"""
+    plant, similar_plants = find_plant(scientific_name)
+    record_view(plant.id)
+    context = plant_detail_context(plant, similar_plants)
     return render(request, 'plants/plant_detail.html', context)
+
+
+@query_budget(0)
+@require_GET
+def serve_thumbnail(request, name):
+    """A generated plant thumbnail; names are content hashes, so browsers may keep them forever"""
+    response = static.serve(request, name, document_root=settings.THUMBNAIL_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# URL slug -> (Plant list field, page heading)
+BROWSE_KINDS = {
+    'compounds': ('active_compounds', 'Active Compounds'),
+    'actions': ('pharmacological_actions', 'Pharmacological Actions'),
+    'systems': ('traditional_systems', 'Traditional Medicine Systems'),
+}
+BROWSE_PAGE_SIZE = 24
+TERMS_PAGE_SIZE = 100
+
+
+@query_budget(4)
+def browse_terms(request, kind):
+    """Plants sharing a compound, action or system; ?q= accepts AND / OR, e.g. "Anti-inflammatory AND Antioxidant"
+
+    Without a query, lists the kind's terms by how many plants share them.
+    """
+    if kind not in BROWSE_KINDS:
+        raise Http404("Unknown browse category")
+    field, heading = BROWSE_KINDS[kind]
+    query = request.GET.get('q', '').strip()
+
+    context = {'kind': kind, 'heading': heading, 'query': query, 'browse_kinds': BROWSE_KINDS}
+    if query:
+        ids = terms.lookup(field, query)
+        page = Paginator(ids, BROWSE_PAGE_SIZE).get_page(request.GET.get('page'))
+        plants = Plant.objects.filter(id__in=list(page.object_list), is_verified=True).order_by('id')
+        context.update(page=page, plants=plants, groups=terms.parse_query(query))
+    else:
+        entries = PlantTerm.objects.filter(field=field).order_by('-plant_count', 'term').only('label', 'plant_count')
+        context['page'] = Paginator(entries, TERMS_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'plants/browse_terms.html', context)
+
+
+def _export_allowed(request):
+    """Staff, or partners presenting the EXPORT_TOKEN env var as a bearer token
+
+    Only the Authorization header is accepted; a token in the URL would end up in access logs.
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    secret = os.environ.get('EXPORT_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    return bool(secret) and auth.startswith('Bearer ') and constant_time_compare(auth[len('Bearer '):], secret)
+
+
+@query_budget(2)
+@require_GET
+def export_plants(request):
+    """Stream the catalogue as NDJSON or CSV, gzip-compressed when the client accepts it
+
+    Query parameters: format (ndjson|csv), fields (comma-separated),
+    verified (true|false|all, default true), region, updated_since (ISO date/time).
+    removed=true returns the plants deleted or un-verified since updated_since
+    instead, with the columns in exporter.REMOVED_FIELDS.
+    """
+    if not _export_allowed(request):
+        return HttpResponseForbidden('Forbidden')
+
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in exporter.FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(exporter.FORMATS)}")
+    verified = request.GET.get('verified', 'true')
+    if verified not in exporter.VERIFIED:
+        return HttpResponseBadRequest(f"verified must be one of: {', '.join(exporter.VERIFIED)}")
+    verified = exporter.VERIFIED[verified]
+    try:
+        fields = exporter.parse_fields(request.GET.get('fields'))
+        since = exporter.parse_since(request.GET.get('updated_since'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    if request.GET.get('removed') == 'true':
+        plants, fields = exporter.removed_rows(since), exporter.REMOVED_FIELDS
+    else:
+        plants = exporter.export_queryset(verified, request.GET.get('region'), since)
+    compress = accepted_encoding(request, ['gzip']) is not None
+    response = StreamingHttpResponse(
+        exporter.encode_stream(exporter.export_lines(plants, fields, fmt), compress=compress),
+        content_type=f'{exporter.FORMATS[fmt]}; charset=utf-8',
+    )
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = f'attachment; filename="botaniq-plants.{fmt}"'
+    return response